@@ -0,0 +1,182 @@
+"""
+Admission control for the detection API.
+A WSGI middleware in front of Flask that bounds how many detection
+requests run at once and how many may wait for a slot. Everything beyond
+that is answered right away with 429 (or 503 while draining for shutdown)
+and a Retry-After header, before its body is read, so a burst of large
+images cannot pile up in memory ahead of inference.
+"""
+
+import json
+import signal
+import threading
+import time
+
+from werkzeug.wsgi import ClosingIterator
+
+
+class AdmissionController:
+    """In-flight budget with a bounded wait queue and shed counters."""
+
+    def __init__(self, max_in_flight=16, max_queued=32, queue_timeout_s=2.0):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout_s = queue_timeout_s
+        self.in_flight = 0
+        self.queued = 0
+        self.draining = False
+        self.admitted = 0
+        self.admitted_after_wait = 0
+        self.shed = {'queue_full': 0, 'queue_timeout': 0, 'draining': 0, 'too_large': 0}
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Take an in-flight slot, waiting up to queue_timeout_s in the queue.
+        Returns None once admitted, or the reason the request is shed.
+        """
+        with self._condition:
+            if self.draining:
+                return self._reject('draining')
+            if self.in_flight < self.max_in_flight:
+                return self._admit()
+            if self.queued >= self.max_queued:
+                return self._reject('queue_full')
+
+            self.queued += 1
+            try:
+                admitted = self._condition.wait_for(
+                    lambda: self.draining or self.in_flight < self.max_in_flight, timeout=self.queue_timeout_s)
+            finally:
+                self.queued -= 1
+
+            if self.draining:
+                return self._reject('draining')
+            if not admitted:
+                return self._reject('queue_timeout')
+            self.admitted_after_wait += 1
+            return self._admit()
+
+    def _admit(self):
+        self.in_flight += 1
+        self.admitted += 1
+        return None
+
+    def _reject(self, reason):
+        self.shed[reason] += 1
+        return reason
+
+    def reject_too_large(self):
+        with self._condition:
+            self._reject('too_large')
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def drain(self, timeout=30.0):
+        """Stop admitting, release queued requests and wait for in-flight ones to finish."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self.draining = True
+            self._condition.notify_all()
+            self._condition.wait_for(lambda: self.in_flight == 0, timeout=max(0.0, deadline - time.monotonic()))
+            return self.in_flight == 0
+
+    def stats(self):
+        with self._condition:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'max_queued': self.max_queued,
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'draining': self.draining,
+                'admitted': self.admitted,
+                'admitted_after_wait': self.admitted_after_wait,
+                'shed': dict(self.shed),
+                'shed_total': sum(self.shed.values())
+            }
+
+
+class AdmissionMiddleware:
+    """
+    Wraps a WSGI app; requests to the guarded paths go through the
+    controller, everything else (health checks, metrics) passes straight through.
+    """
+
+    def __init__(self, wsgi_app, controller, paths=('/detect',), max_body_bytes=None,
+                 retry_after_s=1, drain_retry_after_s=5):
+        self.wsgi_app = wsgi_app
+        self.controller = controller
+        self.paths = tuple(paths)
+        self.max_body_bytes = max_body_bytes
+        self.retry_after_s = retry_after_s
+        self.drain_retry_after_s = drain_retry_after_s
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO') not in self.paths:
+            return self.wsgi_app(environ, start_response)
+
+        # Declared sizes are refused before any body byte is read; chunked
+        # bodies are still capped by Flask's MAX_CONTENT_LENGTH
+        length = environ.get('CONTENT_LENGTH')
+        if self.max_body_bytes is not None and length and length.isdigit() and int(length) > self.max_body_bytes:
+            self.controller.reject_too_large()
+            return self._reject(start_response, '413 Request Entity Too Large',
+                                f'Request body over {self.max_body_bytes} bytes', None)
+
+        reason = self.controller.acquire()
+        if reason == 'draining':
+            return self._reject(start_response, '503 Service Unavailable',
+                                'Server is shutting down', self.drain_retry_after_s)
+        if reason is not None:
+            return self._reject(start_response, '429 Too Many Requests',
+                                f'Server busy ({reason.replace("_", " ")})', self.retry_after_s)
+
+        try:
+            app_iter = self.wsgi_app(environ, start_response)
+        except BaseException:
+            self.controller.release()
+            raise
+        # The slot is held until the server has sent the whole response
+        return ClosingIterator(app_iter, self.controller.release)
+
+    def _reject(self, start_response, status, error, retry_after_s):
+        body = json.dumps({'success': False, 'error': error, 'detections': []}).encode('utf-8')
+        headers = [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Access-Control-Allow-Origin', '*'),  # Rejected before flask-cors could add it
+            ('Access-Control-Expose-Headers', 'Retry-After'),
+            ('Connection', 'close')
+        ]
+        if retry_after_s is not None:
+            headers.append(('Retry-After', str(retry_after_s)))
+        start_response(status, headers)
+        return [body]
+
+
+def install_drain_handler(controller, timeout=30.0, signals=(signal.SIGTERM, signal.SIGINT)):
+    """
+    On SIGTERM/SIGINT, stop admitting and wait for in-flight detections
+    before handing the signal to the previous handler (e.g. the WSGI
+    server's own graceful shutdown). Main thread only.
+    """
+    def handler(signum, frame):
+        if not controller.draining:
+            print("🛑 Draining: waiting for in-flight detections...")
+            drained = controller.drain(timeout)
+            print("✅ Drained" if drained else f"⚠️ Still {controller.in_flight} request(s) in flight after {timeout}s")
+
+        previous = previous_handlers[signum]
+        if callable(previous):
+            previous(signum, frame)
+        elif previous == signal.SIG_DFL:
+            signal.signal(signum, signal.SIG_DFL)
+            signal.raise_signal(signum)
+
+    previous_handlers = {}
+    for signum in signals:
+        previous_handlers[signum] = signal.getsignal(signum)
+        signal.signal(signum, handler)
@@ -3,29 +3,226 @@ Nut & Bolt Detection Backend API
 Flask server that loads a YOLOv8 model and provides detection endpoints.
 """
 
+import time
+IMPORT_START = time.perf_counter()  # Startup report: time spent importing the modules below
+
 import os
 import io
+import atexit
 import base64
-import time
-from flask import Flask, request, jsonify
+import threading
+from concurrent.futures import Future
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 import numpy as np
-from PIL import Image
 import cv2
 
+from admission import AdmissionController, AdmissionMiddleware, install_drain_handler
+from batching import MicroBatcher
+from workers import WorkerPool
+from streaming import serve_stream
+from tracking import TrackerRegistry, detections_to_arrays
+from tiling import MERGE_METHODS, interior_edge_mask, merge_boxes, tile_grid
+from counting import CounterRegistry
+from metrics import MetricsRegistry
+from model_registry import ModelRegistry
+from qos import QosController
+from motion import ChangeGateRegistry, thumbnail
+from rendering import BOUNDARY, RendererRegistry
+from result_cache import ResultCache, cache_key
+from response_format import BOX_ENCODINGS, compact_detections, negotiate, pack
+from roi import RegionRegistry
+from shadow import ShadowRunner
+from runtimes import export_model, file_sha256, tune_threads
+from startup import StartupTimer
+
+# torch and ultralytics, which dominate cold start, are imported by
+# load_model() and timed as their own phase; PIL on the first decode
+# that needs it. numpy, cv2 and Flask stay eager: module-level code uses them
+startup_timer = StartupTimer(started=IMPORT_START)
+startup_timer.record('imports', time.perf_counter() - IMPORT_START)
+
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
+# WebSocket streaming is optional - /detect keeps working without flask-sock
+try:
+    from flask_sock import Sock
+    sock = Sock(app)
+except ImportError:
+    sock = None
+
 # Global variables
 model = None
+model_version = None  # name@runtime:hash of the serving model, set by publish_model()
+model_device = None   # 'cuda:0' or 'cpu', set by load_model()
+ready = False         # Set by startup() once the model (or the worker pool) is warm and inference is running
 MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'model', 'best.pt')
+
+# Model registry - versioned models in model/registry/<version>/best.pt.
+# POST /models/load swaps a version in without a restart; the model it
+# replaces stays loaded for POST /models/rollback.
+MODEL_REGISTRY_DIR = os.path.join(os.path.dirname(__file__), '..', 'model', 'registry')
+MODEL_VERSION = os.environ.get('MODEL_VERSION')  # Registry version served at startup (None: MODEL_PATH)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')      # If set, /models/* POSTs need a matching X-Admin-Token
+model_registry = ModelRegistry(MODEL_REGISTRY_DIR)
+previous_model = None  # (model, device, version) replaced by the last swap
+model_lock = threading.Lock()
+model_swap = {'state': 'idle', 'version': None, 'error': None, 'started': None, 'finished': None}
+
+# Shadow inference - a sampled fraction of /detect frames also runs through a
+# candidate registry version on a background thread (POST /shadow to start),
+# and the disagreement with the serving model is reported on GET /shadow
+SHADOW_SAMPLE_RATE = 0.1    # Fraction of frames sent to the candidate
+SHADOW_QUEUE_SIZE = 16      # Frames waiting for the candidate; more are dropped
+SHADOW_IOU_THRESHOLD = 0.5  # Boxes of the two models are matched at this IoU
+SHADOW_THREADS = 1          # Inference threads of the candidate's own process
+SHADOW_NICE = 10            # ... which runs at lower CPU priority than the server
+shadow = None               # ShadowRunner while a candidate is evaluated
 CONFIDENCE_THRESHOLD = 0.5  # Balanced threshold
 IOU_THRESHOLD = 0.45
 INPUT_SIZE = 640
 USE_GPU = True  # Set to False to force CPU
 USE_HALF = False  # FP16 disabled - causes dtype issues with this model
 
+# Inference runtime: 'pytorch' (best.pt), 'onnx' or 'openvino' (exported and cached on first run),
+# or 'onnx_int8' (built by quantize_model.py, only loaded if it passed its accuracy gate)
+INFERENCE_RUNTIME = os.environ.get('INFERENCE_RUNTIME', 'pytorch').lower()
+INFERENCE_THREADS = int(os.environ.get('INFERENCE_THREADS', os.cpu_count() or 1))
+
+# Micro-batching - concurrent /detect requests share one forward pass
+USE_BATCHING = True
+BATCH_MAX_SIZE = 8      # Max frames per forward pass
+BATCH_WINDOW_MS = 10    # Max time the first frame waits for others to join
+batcher = None
+
+# Quality of service - under load (queue depth or p90 detection latency too high)
+# INPUT_SIZE steps down a level and clients are told to send smaller frames less
+# often; levels step back up once the pressure is gone. Decisions are on /health.
+QOS_ENABLED = True
+QOS_LEVELS = [          # (input_size, client interval_ms, client max frame width)
+    (640, 100, 640),    # 100ms is the frontend's fastest interval, i.e. no throttling
+    (480, 500, 480),
+    (320, 800, 320)
+]
+QOS_QUEUE_HIGH = 2 * BATCH_MAX_SIZE  # Frames waiting before stepping down
+QOS_QUEUE_LOW = 1                    # ... and at most this many before stepping up
+QOS_LATENCY_HIGH_MS = 500            # p90 detection latency before stepping down
+QOS_LATENCY_LOW_MS = 200             # ... and below this before stepping up
+qos = QosController(QOS_LEVELS, queue_high=QOS_QUEUE_HIGH, queue_low=QOS_QUEUE_LOW,
+                    latency_high_ms=QOS_LATENCY_HIGH_MS, latency_low_ms=QOS_LATENCY_LOW_MS)
+
+# Admission control - at most ADMISSION_MAX_IN_FLIGHT /detect requests are handled
+# at once and ADMISSION_MAX_QUEUED wait for a slot; the rest get an immediate 429
+# with Retry-After, before their body is read (503 while draining for shutdown)
+ADMISSION_MAX_IN_FLIGHT = 4 * BATCH_MAX_SIZE
+ADMISSION_MAX_QUEUED = 4 * BATCH_MAX_SIZE
+ADMISSION_QUEUE_TIMEOUT_S = 2.0   # Longest wait for a slot before a 429
+ADMISSION_RETRY_AFTER_S = 1
+MAX_REQUEST_BYTES = 32 * 1024 * 1024  # Larger bodies get a 413 (base64 adds a third)
+DRAIN_TIMEOUT_S = 25              # Wait for in-flight detections on SIGTERM (below gunicorn's graceful_timeout)
+admission = AdmissionController(ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUED, ADMISSION_QUEUE_TIMEOUT_S)
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+app.wsgi_app = AdmissionMiddleware(app.wsgi_app, admission, paths=('/detect',),
+                                   max_body_bytes=MAX_REQUEST_BYTES, retry_after_s=ADMISSION_RETRY_AFTER_S)
+
+# `python app.py` runs without Flask's debugger and reloader unless FLASK_DEBUG=1
+DEBUG = os.environ.get('FLASK_DEBUG', '0') == '1'
+
+# Warmup - every INPUT_SIZE/batch shape is run through a freshly loaded model
+# (on GPU or CPU) before it serves, so the first real frames skip graph setup,
+# allocator growth and Ultralytics lazy initialization
+WARMUP_ENABLED = True
+WARMUP_INPUT_SIZES = ()                   # Input sizes warmed besides INPUT_SIZE
+WARMUP_BATCH_SIZES = (1, BATCH_MAX_SIZE)  # Smallest and largest micro-batch
+WARMUP_ITERATIONS = 2
+WARMUP_FRAME_SHAPE = (360, 640, 3)        # 16:9 frame at the frontend's MAX_CANVAS_WIDTH
+STARTUP_IN_BACKGROUND = True              # Serve /health while the model loads and warms up
+
+# Multi-process inference - N worker processes, each with its own model and core set.
+# Frames reach them through shared memory; 0 keeps inference in this process.
+NUM_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 0))
+WORKER_SLOTS = 4                    # Shared-memory frame slots per worker
+WORKER_MAX_FRAME = (1080, 1920, 3)  # Largest decoded frame a slot holds
+worker_pool = None
+
+# Result cache for byte-identical /detect images (keyed by image hash + settings)
+RESULT_CACHE_SIZE = 256   # Max cached results, least recently used evicted first
+RESULT_CACHE_TTL_S = 60   # Seconds a cached result stays valid
+result_cache = ResultCache(max_entries=RESULT_CACHE_SIZE, ttl_s=RESULT_CACHE_TTL_S)
+
+# Tiled inference - opt-in per request ("tiled": true, ?tiled=1 or a form field)
+# for high-resolution inspection images where small parts vanish at INPUT_SIZE
+TILE_SIZE = 640           # Tile edge in full-resolution pixels
+TILE_OVERLAP = 0.2        # Fraction of a tile shared with its neighbour
+TILE_MAX = 16             # Tiles grow beyond TILE_SIZE to stay under this count
+TILE_FULL_FRAME = True    # Also detect on the whole frame to catch large objects
+TILE_MERGE = 'wbf'        # Cross-tile merge: 'nms' or 'wbf' (weighted box fusion)
+TILE_MERGE_IOU = 0.5
+
+# Content types accepted as a raw image body on POST /detect
+RAW_IMAGE_MIMETYPES = ('image/jpeg', 'image/png', 'application/octet-stream')
+
+# Decode JPEGs at 1/2, 1/4 or 1/8 scale when they are much larger than INPUT_SIZE.
+# EXIF orientation is ignored, like the PIL/base64 path does, so the pixels
+# always match the header size that boxes are scaled to.
+REDUCED_DECODE = True
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION,
+    2: cv2.IMREAD_REDUCED_COLOR_2 | cv2.IMREAD_IGNORE_ORIENTATION,
+    4: cv2.IMREAD_REDUCED_COLOR_4 | cv2.IMREAD_IGNORE_ORIENTATION,
+    8: cv2.IMREAD_REDUCED_COLOR_8 | cv2.IMREAD_IGNORE_ORIENTATION,
+}
+
+# Server-side tracking - applies to requests that carry a stream id
+# (JSON "stream_id", ?stream_id= or X-Stream-Id header)
+TRACKING_ENABLED = True
+TRACK_MIN_HITS = 2            # Frames a track needs before it is reported (MIN_DETECTION_FRAMES)
+TRACK_MAX_AGE = 5             # Frames a track survives without a match (DETECTION_MEMORY)
+TRACK_IOU_THRESHOLD = 0.3
+TRACK_HIGH_CONFIDENCE = 0.5   # Boxes that can start tracks (and match first); keep at CONFIDENCE_THRESHOLD
+TRACK_LOW_CONFIDENCE = 0.25   # With tracking on, inference keeps boxes down to this; they only extend
+                              # existing tracks and never reach a response on their own
+trackers = TrackerRegistry(
+    min_hits=TRACK_MIN_HITS,
+    max_age=TRACK_MAX_AGE,
+    iou_threshold=TRACK_IOU_THRESHOLD,
+    high_confidence=TRACK_HIGH_CONFIDENCE,
+    # Track ids restart with a new tracker, so the counter must not treat them as already counted
+    on_reset=lambda stream_id: counters.forget_tracks(stream_id)
+)
+
+# Conveyor counting - per-stream line/zone crossing totals (configured via POST /counts/config)
+counters = CounterRegistry()
+
+# Regions of interest - per-stream rects/polygons (configured via POST /roi/config).
+# Frames of such a stream are decoded at full resolution, cropped to the regions
+# and batched through the model; boxes centered outside every region are dropped.
+ROI_MASK = True       # Default: gray out crop pixels outside a polygon region
+ROI_PADDING = 16      # Default: context pixels kept around each region's bounding box
+ROI_MERGE_IOU = 0.5   # Same-class boxes from overlapping regions are merged at this IoU
+region_sets = RegionRegistry()
+
+# Motion gating - streams whose frame barely changed since the last inferred
+# frame get its detections back instead of a new forward pass (0 disables)
+MOTION_THRESHOLD = 0.005      # Fraction of thumbnail pixels that must change
+MOTION_MAX_REUSE_S = 5.0      # Re-infer at least this often on a static scene
+motion_gates = ChangeGateRegistry(max_reuse_s=MOTION_MAX_REUSE_S)
+
+# Metrics - Prometheus text format on GET /metrics. Stage timings use
+# time.perf_counter(); add "debug": true (or ?debug=1) to /detect to get the
+# per-stage breakdown back in the response.
+metrics = MetricsRegistry()
+request_counter = metrics.counter('detection_requests_total', 'Requests and stream frames by endpoint and status code', ('endpoint', 'code'))
+error_counter = metrics.counter('detection_errors_total', 'Failed requests by endpoint and failing stage', ('endpoint', 'stage'))
+in_flight = metrics.gauge('detection_in_flight', 'Requests and stream frames currently being handled', ('endpoint',))
+request_latency = metrics.histogram('detection_request_seconds', 'End-to-end handling time', ('endpoint',))
+stage_latency = metrics.histogram('detection_stage_seconds', 'Time spent per stage: decode, queue, inference, postprocess, tracking, response', ('endpoint', 'stage'))
+queue_depth = metrics.gauge('detection_queue_depth', 'Frames waiting for the micro-batcher or inference workers')
+model_loaded_gauge = metrics.gauge('detection_model_loaded', 'Whether a model is loaded (1) or not (0)')
+model_info = metrics.gauge('detection_model_info', 'Serving model, always 1', ('version', 'runtime', 'input_size'))
+
 # Size filters disabled - using model confidence only
 MAX_BOX_RATIO = 1.0  # No limit
 MIN_BOX_SIZE = 5     # Very small minimum
@@ -38,50 +235,212 @@ CLASS_COLORS = {
     'Nut': (255, 165, 0),      # Orange
 }
 
+# Annotated output - GET /mjpeg/<stream_id> serves a stream's frames with boxes
+# and labels drawn by the server, for wall displays and recorders. Frames are
+# only rendered (once, on a per-stream thread) while someone is watching.
+MJPEG_JPEG_QUALITY = 80
+MJPEG_MAX_VIEWERS = 16     # Across all streams; more get a 503
+MJPEG_MAX_SEND_S = 2.0     # A viewer whose socket takes longer to accept a frame is dropped
+MJPEG_IDLE_TIMEOUT_S = 60  # Streams without frames for this long can't be watched, and their viewers are ended
+renderers = RendererRegistry(CLASS_COLORS, jpeg_quality=MJPEG_JPEG_QUALITY, idle_timeout_s=MJPEG_IDLE_TIMEOUT_S)
 
-def load_model():
-    """Load the YOLOv8 model from the model directory and move to GPU."""
-    global model
-    try:
-        import torch
-        from ultralytics import YOLO
-
-        if os.path.exists(MODEL_PATH):
-            print(f"Loading model from: {MODEL_PATH}")
-            model = YOLO(MODEL_PATH)
-
-            # Move model to GPU if available
-            if USE_GPU and torch.cuda.is_available():
-                model.to('cuda:0')
-                print(f"✅ Model loaded on GPU: {torch.cuda.get_device_name(0)}")
-
-                # Warmup the model for consistent performance
-                print("🔥 Warming up GPU...")
-                import numpy as np
-                dummy = np.zeros((INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8)
-                for _ in range(3):
-                    model(dummy, verbose=False)
-                print("✅ GPU warmup complete!")
-            else:
-                print("⚠️ GPU not available, using CPU (slower)")
-                print("Model device:", model.device)
 
+def load_model(path=None, name=None):
+    """
+    Load a YOLOv8 model, move it to GPU, warm it up and make it the serving
+    model. Defaults to MODEL_VERSION from the registry, or MODEL_PATH.
+    """
+    if path is None:
+        path, name = (model_registry.path(MODEL_VERSION), MODEL_VERSION) if MODEL_VERSION else (MODEL_PATH, 'default')
+
+    try:
+        # Timed on its own, importing torch dominates cold start
+        with startup_timer.phase('import_torch'):
+            import torch
+            import ultralytics
+
+        if os.path.exists(path):
+            candidate, device = build_model(path)
+            publish_model(candidate, device, model_version_for(path, name))
             return True
         else:
-            print(f"⚠️ Model file not found at: {MODEL_PATH}")
+            print(f"⚠️ Model file not found at: {path}")
             print("Please place your 'best.pt' file in the 'model' folder.")
             return False
-    except ImportError:
-        print("❌ Error: ultralytics package not installed.")
-        print("Run: pip install ultralytics")
+    except ImportError as e:
+        print(f"❌ Error: {e}")
+        print("Run: pip install ultralytics (plus onnxruntime or openvino for those runtimes)")
         return False
     except Exception as e:
         print(f"❌ Error loading model: {e}")
         return False
 
 
-def decode_image(image_data):
-    """Decode base64 image data to numpy array."""
+def build_model(path):
+    """Load, place and warm up a model without touching the serving one. Returns (model, device)."""
+    import torch
+    from ultralytics import YOLO
+
+    if INFERENCE_RUNTIME != 'pytorch':
+        return build_exported_model(path)
+
+    print(f"Loading model from: {path}")
+    with startup_timer.phase('model_load'):
+        candidate = YOLO(path)
+
+        # Move model to GPU if available
+        if USE_GPU and torch.cuda.is_available():
+            device = 'cuda:0'
+            candidate.to(device)
+            print(f"✅ Model loaded on GPU: {torch.cuda.get_device_name(0)}")
+        else:
+            device = 'cpu'
+            print("⚠️ GPU not available, using CPU (slower)")
+            print("Model device:", candidate.device)
+            tune_threads(candidate, 'pytorch', path, INFERENCE_THREADS)
+            print(f"🧵 PyTorch intra-op threads: {INFERENCE_THREADS}")
+
+    with startup_timer.phase('warmup'):
+        warm_up_model(candidate, device)
+    return candidate, device
+
+
+def build_exported_model(path):
+    """Load a best.pt through an ONNX Runtime or OpenVINO export on CPU."""
+    from ultralytics import YOLO
+
+    with startup_timer.phase('export'):
+        model_file = export_model(path, INFERENCE_RUNTIME, INPUT_SIZE)
+    print(f"Loading {INFERENCE_RUNTIME} model from: {model_file}")
+    with startup_timer.phase('model_load'):
+        candidate = YOLO(model_file, task='detect')
+
+        # The first call builds the runtime session, which is then re-created
+        # with the tuned thread count
+        dummy = np.zeros((INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8)
+        candidate(dummy, imgsz=INPUT_SIZE, verbose=False)
+        tune_threads(candidate, INFERENCE_RUNTIME, model_file, INFERENCE_THREADS)
+
+    with startup_timer.phase('warmup'):
+        warm_up_model(candidate, 'cpu')
+    print(f"✅ Model loaded with {INFERENCE_RUNTIME} on CPU ({INFERENCE_THREADS} threads)")
+    return candidate, 'cpu'
+
+
+def warm_up_model(candidate, device):
+    """
+    Run every configured INPUT_SIZE/batch shape through a freshly loaded model
+    so one-time setup happens before it serves real frames.
+    """
+    if not WARMUP_ENABLED:
+        return
+
+    frame = np.full(WARMUP_FRAME_SHAPE, 114, dtype=np.uint8)  # Letterbox gray
+    half = USE_HALF and device == 'cuda:0'
+    print(f"🔥 Warming up on {device}...")
+    sizes = {INPUT_SIZE, *WARMUP_INPUT_SIZES}
+    if QOS_ENABLED:
+        sizes.update(size for size, _, _ in QOS_LEVELS)  # QoS may switch to any of them under load
+    for size in sorted(sizes, reverse=True):
+        for batch_size in WARMUP_BATCH_SIZES:
+            start = time.perf_counter()
+            for _ in range(WARMUP_ITERATIONS):
+                candidate([frame] * batch_size, conf=CONFIDENCE_THRESHOLD, iou=IOU_THRESHOLD,
+                          imgsz=size, half=half, verbose=False)
+            elapsed_ms = (time.perf_counter() - start) * 1000 / WARMUP_ITERATIONS
+            print(f"   {size}px x{batch_size}: {elapsed_ms:.0f}ms")
+    print("✅ Warmup complete!")
+
+
+def model_version_for(path, name):
+    """Version string of a model file: registry version, runtime and content hash."""
+    return f"{name}@{INFERENCE_RUNTIME}:{file_sha256(path)[:12]}"
+
+
+def set_model_version(version):
+    """Record which model is serving and drop results cached for the previous one."""
+    global model_version
+    model_version = version
+    result_cache.clear()
+    motion_gates.reset()
+
+
+def publish_model(candidate, device, version):
+    """
+    Make a warmed-up model the serving one. Requests that already picked up
+    the old model finish on it; it is kept as previous_model for rollback.
+    With the worker pool the models live in the workers and candidate is
+    None; only the version is tracked here.
+    """
+    global model, model_device, previous_model
+    with model_lock:
+        if model_version is not None:
+            previous_model = (model, model_device, model_version)
+        model, model_device = candidate, device
+        set_model_version(version)
+
+
+def rollback_model():
+    """Swap the previous model back in (the current one becomes previous). False if there is none."""
+    global model, model_device, previous_model
+    with model_lock:
+        if previous_model is None:
+            return False
+        current = (model, model_device, model_version)
+        model, model_device, version = previous_model
+        previous_model = current
+        set_model_version(version)
+    return True
+
+
+def swap_model(path, name):
+    """
+    Background model swap for POST /models/load: build and warm the new
+    version while the current one keeps serving, load it in the worker
+    processes, then switch everything over.
+    """
+    try:
+        # The parent only needs its own copy when it runs inference itself
+        candidate, device = build_model(path) if worker_pool is None else (None, None)
+        version = model_version_for(path, name)
+
+        if worker_pool is not None:
+            # Workers load one at a time next to their serving model, then all switch together
+            failed = [w for w, ok, _ in worker_pool.run_command({'command': 'load', 'path': path, 'name': name}) if not ok]
+            if failed:
+                worker_pool.run_command({'command': 'discard'})
+                raise RuntimeError(f"worker(s) {failed} could not load {name}")
+            worker_pool.run_command({'command': 'commit'})
+
+        publish_model(candidate, device, version)
+        model_swap.update(state='idle', error=None, finished=time.time())
+        print(f"🔄 Now serving model {version}")
+    except Exception as e:
+        model_swap.update(state='failed', error=str(e), finished=time.time())
+        print(f"❌ Model swap to {name} failed: {e}")
+
+
+def pick_reduction_factor(width, height):
+    """
+    Pick the largest JPEG DCT scaling factor (1, 2, 4 or 8) that still leaves
+    the long side at least INPUT_SIZE, so the model input loses no detail.
+    """
+    for factor in (8, 4, 2):
+        if max(width, height) // factor >= INPUT_SIZE:
+            return factor
+    return 1
+
+
+def decode_image(image_data, reduced=None):
+    """
+    Decode base64 image data to numpy array.
+    Returns (image, original_size) where original_size is (width, height)
+    of the encoded image, which differs from the array when reduced decoding
+    is used.
+    """
+    if reduced is None:
+        reduced = REDUCED_DECODE
+
     try:
         # Handle data URL format (data:image/jpeg;base64,...)
         if ',' in image_data:
@@ -90,8 +449,17 @@ def decode_image(image_data):
         # Decode base64
         image_bytes = base64.b64decode(image_data)
 
-        # Convert to PIL Image
+        # Convert to PIL Image (imported on first use, not at startup)
+        from PIL import Image
         image = Image.open(io.BytesIO(image_bytes))
+        original_size = image.size
+
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when the frame is
+        # much larger than the model input
+        if reduced and image.format == 'JPEG':
+            factor = pick_reduction_factor(*original_size)
+            if factor > 1:
+                image.draft('RGB', (original_size[0] // factor, original_size[1] // factor))
 
         # Convert to RGB if necessary
         if image.mode != 'RGB':
@@ -101,100 +469,689 @@ def decode_image(image_data):
         img_array = np.array(image)
         img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
 
-        return img_array
+        return img_array, original_size
     except Exception as e:
         print(f"Error decoding image: {e}")
-        return None
+        return None, None
 
 
-def run_detection(image):
-    """Run object detection on the image."""
-    global model
+def decode_image_bytes(image_bytes, reduced=None):
+    """
+    Decode raw encoded image bytes (JPEG/PNG) straight to a BGR numpy array.
+    Returns (image, original_size) like decode_image().
+    """
+    if reduced is None:
+        reduced = REDUCED_DECODE
+
+    try:
+        # Wrap the request buffer without copying and let OpenCV decode to BGR
+        buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+        flags = REDUCED_DECODE_FLAGS[1]
+        original_size = None
+
+        if reduced:
+            # PIL only parses the header here, the pixels are decoded by OpenCV
+            from PIL import Image
+            header = Image.open(io.BytesIO(image_bytes))
+            original_size = header.size
+            if header.format == 'JPEG':
+                flags = REDUCED_DECODE_FLAGS[pick_reduction_factor(*original_size)]
+
+        img_array = cv2.imdecode(buffer, flags)
+
+        if img_array is None:
+            print("Error decoding image: unsupported or corrupt image data")
+            return None, None
+
+        if original_size is None:
+            original_size = (img_array.shape[1], img_array.shape[0])
+
+        return img_array, original_size
+    except Exception as e:
+        print(f"Error decoding image: {e}")
+        return None, None
+
+
+def get_stream_id():
+    """Stream/session id of the current request, if the client sent one."""
+    stream_id = request.args.get('stream_id') or request.headers.get('X-Stream-Id') or request.form.get('stream_id')
+    if not stream_id:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            stream_id = data.get('stream_id')
+    return str(stream_id) if stream_id else None
+
+
+def apply_stream_stages(stream_id, detections, original_size):
+    """
+    Run the per-stream tracker and conveyor counter when a stream id is present.
+    Returns (detections, extra response fields).
+    """
+    extras = {}
+    if not TRACKING_ENABLED or not stream_id:
+        return confident(detections), extras
+
+    # Boxes below CONFIDENCE_THRESHOLD come back only if they continued a track
+    detections, extras['tracking'] = trackers.update(stream_id, detections)
+
+    line_counts = counters.update(stream_id, detections, original_size)
+    if line_counts is not None:
+        extras['line_counts'] = line_counts
+
+    return detections, extras
+
+
+def request_option(name):
+    """An option from the query string, form fields or JSON body of the current request."""
+    value = request.args.get(name) or request.form.get(name)
+    if value is None:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            value = data.get(name)
+    return value
+
+
+def request_flag(name):
+    """Whether the current request set an opt-in flag (?name=1, form field or JSON true)."""
+    return str(request_option(name)).lower() in ('1', 'true', 'yes')
+
+
+def compact_response(response, box_encoding=None, binary=False):
+    """
+    Swap a response's verbose detection list for the columnar form, in place.
+    Raw float32 bytes are only used for binary (MessagePack) bodies; JSON
+    falls back to a plain array for any encoding it cannot carry.
+    """
+    if binary:
+        box_encoding = 'bytes'
+    elif box_encoding not in BOX_ENCODINGS:
+        box_encoding = 'array'
+    response['format'] = 'compact'
+    response['detections'] = compact_detections(response['detections'], CLASS_NAMES, CLASS_COLORS, box_encoding)
+    return response
+
+
+def encode_detection_response(response):
+    """
+    Serialize a /detect response in the negotiated format: verbose JSON by
+    default, compact JSON with "format": "compact" (?format=compact), or
+    compact MessagePack with Accept: application/msgpack.
+    """
+    response_format, use_msgpack = negotiate(request.headers.get('Accept'), request_option('format'))
+    if response_format == 'compact':
+        compact_response(response, request_option('boxes'), binary=use_msgpack)
+
+    body = Response(pack(response), mimetype='application/msgpack') if use_msgpack else jsonify(response)
+    body.vary.add('Accept')
+    return body
+
+
+def read_request_payload():
+    """
+    Extract the still-encoded image from the current /detect request.
+    Supports multipart form files, raw image/jpeg or application/octet-stream
+    bodies, and JSON with a base64 "image" field.
+    Returns (payload, source, error_message); payload is bytes, or the
+    base64 string for JSON requests.
+    """
+    # Multipart form upload (field "image", or the first file sent)
+    if request.files:
+        upload = request.files.get('image') or next(iter(request.files.values()))
+        return upload.read(), 'upload', None
+
+    # Raw binary body
+    if request.mimetype in RAW_IMAGE_MIMETYPES:
+        return request.get_data(cache=False), 'body', None
 
-    if model is None:
-        return None, "Model not loaded"
+    # JSON with base64 data
+    data = request.get_json(silent=True)
+
+    if not isinstance(data, dict) or 'image' not in data:
+        return None, None, 'No image data provided. Send JSON with "image" field containing base64 data, a raw image/jpeg body, or a multipart "image" file.'
+
+    # Anything but a string would only fail later, in the cache key or the decoder
+    if not isinstance(data['image'], str):
+        return None, None, '"image" must be a base64 string.'
+
+    return data['image'], 'base64', None
+
+
+def decode_request_payload(payload, source, reduced=None):
+    """Decode a payload from read_request_payload(); returns (image, original_size, error_message)."""
+    if source == 'base64':
+        image, original_size = decode_image(payload, reduced)
+    else:
+        image, original_size = decode_image_bytes(payload, reduced)
+
+    if image is None:
+        return None, None, {
+            'upload': 'Failed to decode uploaded image file.',
+            'body': 'Failed to decode image body.',
+            'base64': 'Failed to decode image. Ensure valid base64 format.'
+        }[source]
+
+    return image, original_size, None
+
+
+def class_name_for(class_id):
+    """Map a model class index to its display name."""
+    if class_id < len(CLASS_NAMES):
+        return CLASS_NAMES[class_id]
+
+    # Use model's class names if available
+    names = model.names if model is not None else {}
+    return names.get(class_id, f'class_{class_id}')
+
+
+def filter_detections(xyxy, conf, cls, image_size, scale=(1.0, 1.0)):
+    """
+    Apply the size filters and class/color lookup to whole box arrays.
+    xyxy is (N, 4), conf and cls are (N,) in model-input image coordinates;
+    scale maps them to image_size (width, height) before filtering.
+    """
+    if len(conf) == 0:
+        return []
+
+    # float64 keeps the arithmetic identical to the old per-box Python floats
+    xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+    xyxy = xyxy * np.array([scale[0], scale[1], scale[0], scale[1]])
+
+    box_width = xyxy[:, 2] - xyxy[:, 0]
+    box_height = xyxy[:, 3] - xyxy[:, 1]
+    box_ratio = (box_width * box_height) / (image_size[0] * image_size[1])
+
+    keep = (
+        # Filter 1: too large (like a cup or large object)
+        (box_width <= MAX_BOX_SIZE) & (box_height <= MAX_BOX_SIZE)
+        # Filter 2: too small (noise)
+        & (box_width >= MIN_BOX_SIZE) & (box_height >= MIN_BOX_SIZE)
+        # Filter 3: takes up too much of the image
+        & (box_ratio <= MAX_BOX_RATIO)
+    )
+
+    skipped = len(keep) - int(keep.sum())
+    if skipped:
+        print(f"⚠️ Skipped {skipped} box(es) outside size/ratio limits")
+
+    class_ids = np.asarray(cls)[keep].astype(np.int64)
+
+    # Look up names and colors once per distinct class, not once per box
+    unique_ids, inverse = np.unique(class_ids, return_inverse=True)
+    unique_names = [class_name_for(int(class_id)) for class_id in unique_ids]
+    unique_colors = [CLASS_COLORS.get(name, (0, 255, 0)) for name in unique_names]
+
+    coords = xyxy[keep].tolist()
+    confidences = np.asarray(conf)[keep].tolist()
+
+    return [
+        {
+            'class': unique_names[index],
+            'confidence': round(confidence, 3),
+            'bbox': {
+                'x1': round(x1, 2),
+                'y1': round(y1, 2),
+                'x2': round(x2, 2),
+                'y2': round(y2, 2)
+            },
+            'color': unique_colors[index]
+        }
+        for (x1, y1, x2, y2), confidence, index in zip(coords, confidences, inverse.tolist())
+    ]
+
+
+def process_result(result, image, original_size=None):
+    """
+    Convert one Ultralytics result into the API detection list.
+    When the image was decoded at reduced resolution, original_size
+    (width, height) rescales boxes back to original-image coordinates.
+    """
+    boxes = result.boxes
+
+    if boxes is None or len(boxes) == 0:
+        return []
+
+    img_height, img_width = image.shape[:2]
+    scale = (1.0, 1.0)
+    if original_size is not None:
+        scale = (original_size[0] / img_width, original_size[1] / img_height)
+        img_width, img_height = original_size
+
+    # Debug: print number of raw detections
+    print(f"🔍 Found {len(boxes)} raw detection(s)")
+
+    return filter_detections(
+        boxes.xyxy.cpu().numpy(),
+        boxes.conf.cpu().numpy(),
+        boxes.cls.cpu().numpy(),
+        (img_width, img_height),
+        scale
+    )
+
+
+def record_timing(timings, stage, seconds):
+    """Add a stage duration to a request's timing dict, if it has one."""
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def run_detection_batch(images, original_sizes=None, timings=None, use_model=None, input_size=None, conf=None):
+    """
+    Run object detection on a list of images in one forward pass.
+    Returns a list of (detections, error) tuples, one per image.
+    timings is an optional list of per-image dicts (or None entries) that
+    receive the 'inference' and 'postprocess' durations in seconds.
+    use_model is a (model, device) pair to run instead of the serving model.
+    input_size and conf override INPUT_SIZE and CONFIDENCE_THRESHOLD for this pass.
+    """
+    # Read once: a model swap mid-batch must not split the batch across models
+    active_model, device = use_model or (model, model_device)
+
+    if original_sizes is None:
+        original_sizes = [None] * len(images)
+
+    if active_model is None:
+        return [(None, "Model not loaded")] * len(images)
 
     try:
-        import torch
+        if timings is None:
+            timings = [None] * len(images)
 
         # Run inference (model is already on GPU from load_model)
-        results = model(
-            image,
-            conf=CONFIDENCE_THRESHOLD,
+        inference_start = time.perf_counter()
+        results = active_model(
+            list(images),
+            conf=conf or CONFIDENCE_THRESHOLD,
             iou=IOU_THRESHOLD,
-            imgsz=INPUT_SIZE,
-            half=USE_HALF and torch.cuda.is_available(),  # Use FP16 for GPU
+            imgsz=input_size or INPUT_SIZE,
+            half=USE_HALF and device == 'cuda:0',  # Use FP16 for GPU
             verbose=False
         )
+        inference_s = time.perf_counter() - inference_start
 
-        detections = []
-
-        # Process results
-        for result in results:
-            boxes = result.boxes
-
-            # Debug: print number of raw detections
-            if boxes is not None and len(boxes) > 0:
-                print(f"🔍 Found {len(boxes)} detection(s) with conf >= {CONFIDENCE_THRESHOLD}")
-
-            if boxes is not None:
-                for box in boxes:
-                    # Get bounding box coordinates
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-
-                    # Calculate box dimensions
-                    box_width = x2 - x1
-                    box_height = y2 - y1
-                    box_area = box_width * box_height
-                    img_height, img_width = image.shape[:2]
-                    img_area = img_width * img_height
-
-                    # Filter 1: Skip if box is too large (like a cup or large object)
-                    if box_width > MAX_BOX_SIZE or box_height > MAX_BOX_SIZE:
-                        print(f"⚠️ Skipping: Box too large ({box_width:.0f}x{box_height:.0f} > {MAX_BOX_SIZE})")
-                        continue
-
-                    # Filter 2: Skip if box is too small (noise)
-                    if box_width < MIN_BOX_SIZE or box_height < MIN_BOX_SIZE:
-                        print(f"⚠️ Skipping: Box too small ({box_width:.0f}x{box_height:.0f} < {MIN_BOX_SIZE})")
-                        continue
-
-                    # Filter 3: Skip if box takes up too much of the image
-                    box_ratio = box_area / img_area
-                    if box_ratio > MAX_BOX_RATIO:
-                        print(f"⚠️ Skipping: Box ratio too large ({box_ratio:.2f} > {MAX_BOX_RATIO})")
-                        continue
-
-                    # Get confidence and class
-                    confidence = float(box.conf[0])
-                    class_id = int(box.cls[0])
-
-                    # Get class name
-                    if class_id < len(CLASS_NAMES):
-                        class_name = CLASS_NAMES[class_id]
-                    else:
-                        # Use model's class names if available
-                        class_name = model.names.get(class_id, f'class_{class_id}')
-
-                    # Get color for this class
-                    color = CLASS_COLORS.get(class_name, (0, 255, 0))
-
-                    detections.append({
-                        'class': class_name,
-                        'confidence': round(confidence, 3),
-                        'bbox': {
-                            'x1': round(x1, 2),
-                            'y1': round(y1, 2),
-                            'x2': round(x2, 2),
-                            'y2': round(y2, 2)
-                        },
-                        'color': color
-                    })
-
-        return detections, None
+        # Frames of one request (e.g. tiles) share the forward pass, count it once
+        for request_timings in {id(t): t for t in timings if t is not None}.values():
+            record_timing(request_timings, 'inference', inference_s)
+
+        outputs = []
+        for result, image, original_size, frame_timings in zip(results, images, original_sizes, timings):
+            postprocess_start = time.perf_counter()
+            outputs.append((process_result(result, image, original_size), None))
+            record_timing(frame_timings, 'postprocess', time.perf_counter() - postprocess_start)
+        return outputs
 
     except Exception as e:
-        return None, str(e)
+        return [(None, str(e))] * len(images)
+
+
+def run_detection(image, original_size=None, timings=None, input_size=None, conf=None):
+    """Run object detection on the image."""
+    return run_detection_batch([image], [original_size], [timings], input_size=input_size, conf=conf)[0]
+
+
+def inference_confidence():
+    """
+    Confidence the server runs the model at. With tracking on it is lowered
+    to TRACK_LOW_CONFIDENCE so the tracker's second stage gets the weak boxes;
+    confident() drops them again wherever no tracker looks at them.
+    """
+    return min(CONFIDENCE_THRESHOLD, TRACK_LOW_CONFIDENCE) if TRACKING_ENABLED else CONFIDENCE_THRESHOLD
+
+
+def confident(detections):
+    """Detections at or above CONFIDENCE_THRESHOLD."""
+    return [det for det in detections if det['confidence'] >= CONFIDENCE_THRESHOLD]
+
+
+def run_detection_frames(frames):
+    """
+    Batch entry point for the micro-batcher: frames are (image,
+    original_size, timings, input_size). Frames queued at different input
+    sizes (tiles next to QoS-reduced frames) run as separate passes.
+    """
+    results = [None] * len(frames)
+    for input_size in dict.fromkeys(frame[3] for frame in frames):
+        indices = [i for i, frame in enumerate(frames) if frame[3] == input_size]
+        images, original_sizes, timings, _ = zip(*(frames[i] for i in indices))
+        results_for_size = run_detection_batch(images, original_sizes, timings, input_size=input_size,
+                                               conf=inference_confidence())
+        for i, result in zip(indices, results_for_size):
+            results[i] = result
+    return results
+
+
+def full_input_size():
+    """INPUT_SIZE before any QoS reduction."""
+    return QOS_LEVELS[0][0] if QOS_ENABLED else INPUT_SIZE
+
+
+def fit_worker_slot(image, original_size):
+    """
+    Scale a frame down to fit a worker's shared-memory slot; boxes still come
+    back in original_size pixels.
+    """
+    height, width = image.shape[:2]
+    scale = (worker_pool.slot_bytes / image.nbytes) ** 0.5
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA), original_size or (width, height)
+
+
+def submit_frame(image, original_size=None, timings=None, input_size=None):
+    """
+    Queue one decoded frame on the worker pool or the micro-batcher, or run
+    it inline when neither is active. Returns a Future of (detections, error).
+    input_size defaults to the current INPUT_SIZE.
+    """
+    input_size = input_size or INPUT_SIZE
+
+    if worker_pool is not None:
+        # The parent has no model of its own, so oversized frames are shrunk rather than run here
+        if not worker_pool.fits(image):
+            image, original_size = fit_worker_slot(image, original_size)
+        settings = (inference_confidence(), IOU_THRESHOLD, input_size)
+        return worker_pool.submit(image, original_size, settings, timings)
+
+    if batcher is not None:
+        return batcher.submit((image, original_size, timings, input_size))
+
+    future = Future()
+    future.set_result(run_detection(image, original_size, timings, input_size, inference_confidence()))
+    return future
+
+
+def detect_frame(image, original_size=None, timings=None):
+    """
+    Run detection on one decoded frame through the worker pool, the
+    micro-batcher or inline, whichever is active.
+    """
+    return submit_frame(image, original_size, timings).result()
+
+
+def detect_frames(frames, timings=None, input_size=None):
+    """
+    Run detection on several (image, original_size) frames at once.
+    All frames are queued before waiting, so the batcher or worker pool
+    batches them instead of running them one after another.
+    """
+    if worker_pool is None and batcher is None:
+        images, original_sizes = zip(*frames)
+        return run_detection_batch(images, original_sizes, [timings] * len(frames), input_size=input_size,
+                                   conf=inference_confidence())
+
+    futures = [submit_frame(image, original_size, timings, input_size) for image, original_size in frames]
+    return [future.result() for future in futures]
+
+
+def run_tiled_detection(image, tiles, timings=None):
+    """
+    Detect on overlapping (x, y, w, h) tiles of a full-resolution frame in
+    one batch and merge the results in frame coordinates. Tiles always run
+    at the full input size: QoS shrinking them would lose the small parts
+    tiling is for.
+    """
+    height, width = image.shape[:2]
+    frames = [(image[y:y + h, x:x + w], None) for x, y, w, h in tiles]
+    if TILE_FULL_FRAME:
+        frames.append((image, None))
+
+    results = detect_frames(frames, timings, full_input_size())
+    errors = [error for _, error in results if error]
+    if errors:
+        return None, errors[0]
+
+    candidates, boxes = [], []
+    for tile, (detections, _) in zip(tiles + [(0, 0, width, height)], results):
+        if not detections:
+            continue
+        tile_boxes, tile_conf, _ = detections_to_arrays(detections)
+        # Boxes under CONFIDENCE_THRESHOLD (kept for tracking) would drag fused confidences down
+        keep = ~interior_edge_mask(tile_boxes, tile, (width, height)) & (tile_conf >= CONFIDENCE_THRESHOLD)
+        candidates += [det for det, kept in zip(detections, keep) if kept]
+        boxes.append(tile_boxes[keep] + np.array([tile[0], tile[1], tile[0], tile[1]]))
+
+    if not candidates:
+        return [], None
+
+    boxes = np.vstack(boxes)
+    scores = np.array([det['confidence'] for det in candidates])
+    labels = np.array([det['class'] for det in candidates], dtype=object)
+    keep, merged = merge_boxes(boxes, scores, labels, TILE_MERGE_IOU, TILE_MERGE)
+
+    return [
+        {
+            **candidates[index],
+            'bbox': {
+                'x1': round(x1, 2),
+                'y1': round(y1, 2),
+                'x2': round(x2, 2),
+                'y2': round(y2, 2)
+            }
+        }
+        for index, (x1, y1, x2, y2) in zip(keep.tolist(), merged.tolist())
+    ], None
+
+
+def run_roi_detection(image, original_size, regions, timings=None):
+    """
+    Detect on a stream's regions of interest in one batch, map the boxes back
+    to frame coordinates and drop those centered outside every region.
+    Like tiles, crops run at the full input size whatever QoS picked.
+    """
+    original_size = original_size or (image.shape[1], image.shape[0])
+    crops = regions.crops(image, original_size)
+    if not crops:
+        return [], None
+
+    results = detect_frames([(crop, crop_size) for crop, crop_size, _ in crops], timings, full_input_size())
+    errors = [error for _, error in results if error]
+    if errors:
+        return None, errors[0]
+
+    candidates, boxes = [], []
+    for (_, _, (offset_x, offset_y)), (detections, _) in zip(crops, results):
+        if detections:
+            candidates += detections
+            boxes.append(detections_to_arrays(detections)[0] + [offset_x, offset_y, offset_x, offset_y])
+    if not candidates:
+        return [], None
+
+    boxes = np.vstack(boxes)
+    keep = np.flatnonzero(regions.inside(boxes, original_size))
+    if len(crops) > 1 and len(keep):
+        # Overlapping regions can report the same part twice
+        scores = np.array([candidates[i]['confidence'] for i in keep])
+        labels = np.array([candidates[i]['class'] for i in keep], dtype=object)
+        merged, _ = merge_boxes(boxes[keep], scores, labels, ROI_MERGE_IOU, 'nms')
+        keep = keep[merged]
+
+    return [
+        {
+            **candidates[index],
+            'bbox': {
+                'x1': round(x1, 2),
+                'y1': round(y1, 2),
+                'x2': round(x2, 2),
+                'y2': round(y2, 2)
+            }
+        }
+        for index, (x1, y1, x2, y2) in zip(keep.tolist(), boxes[keep].tolist())
+    ], None
+
+
+def detect_stream_frame(image, original_size, stream_id, tiles=None, timings=None):
+    """
+    detect_frame() (or run_tiled_detection() when tiles are given, or
+    run_roi_detection() when the stream has regions of interest) behind
+    the per-stream change gate.
+    Returns (detections, error, motion) where motion describes the gating
+    decision, or is None when the request has no stream id.
+    """
+    regions = region_sets.get(stream_id)
+
+    def detect():
+        if tiles:
+            return run_tiled_detection(image, tiles, timings)
+        if regions is not None:
+            return run_roi_detection(image, original_size, regions, timings)
+        return detect_frame(image, original_size, timings)
+
+    if not stream_id or MOTION_THRESHOLD <= 0:
+        detections, error = detect()
+        return detections, error, None
+
+    gate = motion_gates.get(stream_id)
+    thumb = thumbnail(image)
+    cached, change = gate.check(thumb, MOTION_THRESHOLD)
+
+    if cached is None:
+        inference_start = time.perf_counter()
+        detections, error = detect()
+        if error:
+            return None, error, None
+        gate.store(thumb, detections, (time.perf_counter() - inference_start) * 1000)
+    else:
+        detections = cached
+
+    return detections, None, {
+        'reused': cached is not None,
+        'change': round(change, 4),
+        **gate.stats()
+    }
+
+
+def observe_stages(endpoint, timings):
+    """Feed a request's stage durations (seconds) into the stage histogram."""
+    for stage, seconds in timings.items():
+        stage_latency.observe(seconds, endpoint, stage)
+
+
+def timings_ms(timings):
+    return {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+
+
+def primary_queue_depth():
+    """Frames waiting for the micro-batcher or the inference workers."""
+    depth = batcher.queue_depth() if batcher is not None else 0
+    if worker_pool is not None:
+        depth += worker_pool.status()['queue_depth']
+    return depth
+
+
+def apply_qos():
+    """Let the QoS controller pick INPUT_SIZE for the next frame from the current load."""
+    global INPUT_SIZE
+    if QOS_ENABLED:
+        INPUT_SIZE = qos.update(primary_queue_depth())
+
+
+def start_worker_pool():
+    """Start the inference worker processes used by /detect."""
+    global worker_pool
+
+    if NUM_WORKERS <= 0:
+        return None
+
+    print(f"👷 Starting {NUM_WORKERS} inference worker process(es)...")
+    worker_pool = WorkerPool(
+        NUM_WORKERS,
+        slots_per_worker=WORKER_SLOTS,
+        max_frame_shape=WORKER_MAX_FRAME,
+        max_batch_size=BATCH_MAX_SIZE
+    )
+    ready = worker_pool.start()
+    atexit.register(worker_pool.stop)
+    print(f"✅ {ready}/{NUM_WORKERS} worker(s) ready")
+    return worker_pool
+
+
+def inference_ready():
+    """Whether frames can be detected: a worker has its model loaded, or the in-process model is."""
+    if worker_pool is not None:
+        return worker_pool.ready_count() > 0
+    return model is not None
+
+
+def start_batcher():
+    """Start the micro-batching scheduler used by /detect."""
+    global batcher
+
+    if not USE_BATCHING:
+        return None
+
+    batcher = MicroBatcher(
+        run_detection_frames,
+        max_batch_size=BATCH_MAX_SIZE,
+        window_ms=BATCH_WINDOW_MS
+    )
+    batcher.start()
+    print(f"📦 Micro-batching enabled (max batch {BATCH_MAX_SIZE}, window {BATCH_WINDOW_MS}ms)")
+    return batcher
+
+
+def startup():
+    """
+    Bring the server to ready: start the inference workers, which load and
+    warm their own models, or load and warm the model here and start the
+    micro-batcher. /health reports ready afterwards.
+    """
+    global ready
+
+    if NUM_WORKERS > 0:
+        # Workers batch the frames queued to them on their own; this process only routes frames
+        with startup_timer.phase('workers'):
+            start_worker_pool()
+        versions = [w['model_version'] for w in worker_pool.status()['workers'] if w['ready']]
+        if versions:
+            publish_model(None, None, versions[0])
+    else:
+        load_model()
+        with startup_timer.phase('batcher'):
+            start_batcher()
+
+    model_loaded = inference_ready()
+    if not model_loaded:
+        print("\n⚠️ WARNING: Model not loaded!")
+        print("The server will start but detections will fail.")
+        print(f"Please place your model file at: {MODEL_PATH}\n")
+
+    startup_timer.finish()
+    ready = model_loaded
+    startup_timer.print_report()
+    return model_loaded
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.metered = request.endpoint not in (None, 'prometheus_metrics')
+    if g.metered:
+        in_flight.inc(request.endpoint)
+
+
+@app.after_request
+def record_request_metrics(response):
+    if g.get('metered'):
+        request_counter.inc(request.endpoint, response.status_code)
+        request_latency.observe(time.perf_counter() - g.request_start, request.endpoint)
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if g.get('metered'):
+        in_flight.dec(request.endpoint)
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    queue_depth.set(primary_queue_depth())
+
+    model_loaded_gauge.set(1 if inference_ready() else 0)
+    model_info.clear()
+    if inference_ready():
+        model_info.set(1, model_version, INFERENCE_RUNTIME, INPUT_SIZE)
+
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/health', methods=['GET'])
@@ -202,63 +1159,185 @@ def health_check():
     """Health check endpoint to verify API and model status."""
     return jsonify({
         'status': 'online',
-        'model_loaded': model is not None,
+        'ready': ready and inference_ready(),
+        'startup': startup_timer.report(),
+        'model_loaded': inference_ready(),
+        'model_version': model_version,
+        'previous_model_version': previous_model[2] if previous_model is not None else None,
+        'model_swap': model_swap,
+        'device': model_device,
         'model_path': MODEL_PATH,
+        'runtime': INFERENCE_RUNTIME,
+        'inference_threads': INFERENCE_THREADS,
         'class_names': CLASS_NAMES,
         'confidence_threshold': CONFIDENCE_THRESHOLD,
-        'input_size': INPUT_SIZE
+        'input_size': INPUT_SIZE,
+        'streaming': sock is not None,
+        'tracked_streams': trackers.stream_count(),
+        'motion_gating': motion_gates.stats(),
+        'shadow': shadow.version if shadow is not None else None,
+        'qos': qos.stats() if QOS_ENABLED else None,
+        'admission': admission.stats(),
+        'mjpeg': renderers.stats(),
+        'result_cache': result_cache.stats(),
+        'batching': batcher.stats() if batcher is not None else None,
+        'workers': worker_pool.status() if worker_pool is not None else None
     })
 
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness probe: 200 once the model (or at least one inference worker) is
+    warm and serving, 503 before that, after the last worker died and while draining.
+    """
+    serving = ready and inference_ready() and not admission.draining
+    return jsonify({'ready': serving, 'startup': startup_timer.report()}), 200 if serving else 503
+
+
 @app.route('/detect', methods=['POST'])
 def detect():
     """
     Main detection endpoint.
-    Accepts: JSON with base64 encoded image
-    Returns: JSON with detection results
+    Accepts: JSON with base64 encoded image, a raw image/jpeg or
+             application/octet-stream body, or a multipart "image" file.
+             An optional stream_id adds persistent track IDs and lets
+             static frames reuse the previous detections; "tiled": true
+             detects on overlapping full-resolution tiles.
+             "debug": true adds a per-stage timing breakdown.
+    Returns: JSON with detection results; "format": "compact" (or
+             Accept: application/msgpack) returns them as columns
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
+    timings = {}
 
     # Check if model is loaded
-    if model is None:
+    if not inference_ready():
+        error_counter.inc('detect', 'model')
         return jsonify({
             'success': False,
             'error': 'Model not loaded. Please check server logs.',
             'detections': []
         }), 503
 
-    # Get JSON data
-    data = request.get_json()
+    # Pick the input size for the current load before it goes into the cache key
+    apply_qos()
 
-    if not data or 'image' not in data:
-        return jsonify({
-            'success': False,
-            'error': 'No image data provided. Send JSON with "image" field containing base64 data.',
-            'detections': []
-        }), 400
+    # Read the encoded image (JSON/base64, raw binary or multipart)
+    payload, source, error = read_request_payload()
 
-    # Decode image
-    image = decode_image(data['image'])
-
-    if image is None:
+    if payload is None:
+        error_counter.inc('detect', 'decode')
         return jsonify({
             'success': False,
-            'error': 'Failed to decode image. Ensure valid base64 format.',
+            'error': error,
             'detections': []
         }), 400
 
-    # Run detection
-    detections, error = run_detection(image)
-
-    if error:
-        return jsonify({
-            'success': False,
-            'error': f'Detection failed: {error}',
-            'detections': []
-        }), 500
-
+    stream_id = get_stream_id()
+    tiled = request_flag('tiled')
+    regions = None if tiled else region_sets.get(stream_id)
+    tiles = None
+    motion = None
+    image = None
+
+    # Byte-identical images with the same settings skip decode and inference
+    settings = (CONFIDENCE_THRESHOLD, IOU_THRESHOLD, INPUT_SIZE, REDUCED_DECODE, model_version)
+    if tiled:
+        settings += (TILE_SIZE, TILE_OVERLAP, TILE_MAX, TILE_FULL_FRAME, TILE_MERGE, TILE_MERGE_IOU)
+    if regions is not None:
+        settings += (regions.signature, ROI_MERGE_IOU)
+    key = cache_key(payload, *settings)
+    use_cache = 'no-cache' not in request.headers.get('Cache-Control', '')
+    cached = result_cache.get(key) if use_cache else None
+
+    if cached is not None:
+        detections, original_size, tiles = cached
+    else:
+        # Tiles and regions of interest are cut from the full-resolution frame
+        decode_start = time.perf_counter()
+        full_resolution = tiled or regions is not None
+        image, original_size, error = decode_request_payload(payload, source, reduced=False if full_resolution else None)
+        record_timing(timings, 'decode', time.perf_counter() - decode_start)
+
+        if image is None:
+            error_counter.inc('detect', 'decode')
+            return jsonify({
+                'success': False,
+                'error': error,
+                'detections': []
+            }), 400
+
+        if tiled:
+            tiles = tile_grid(image.shape[1], image.shape[0], TILE_SIZE, TILE_OVERLAP, TILE_MAX)
+
+        # Run detection (worker pool, micro-batcher or inline), skipped when the
+        # stream's scene has not changed
+        detect_start = time.perf_counter()
+        detections, error, motion = detect_stream_frame(image, original_size, stream_id, tiles, timings)
+        detect_s = time.perf_counter() - detect_start
+
+        if error:
+            error_counter.inc('detect', 'inference')
+            return jsonify({
+                'success': False,
+                'error': f'Detection failed: {error}',
+                'detections': []
+            }), 500
+
+        # Whatever detection time is not inference or post-processing was
+        # spent waiting for the batcher or a worker
+        record_timing(timings, 'queue', max(0.0, detect_s - timings.get('inference', 0.0) - timings.get('postprocess', 0.0)))
+
+        # Only single-frame forward passes tell the QoS controller how loaded
+        # the model is; tiled and ROI requests are several passes in one
+        if not tiled and regions is None and (motion is None or not motion['reused']):
+            qos.observe(detect_s * 1000)
+
+        # Results reused by the motion gate belong to an earlier image
+        if use_cache and (motion is None or not motion['reused']):
+            result_cache.put(key, (detections, original_size, tiles))
+
+        # Sampled frames also go to the shadow candidate, off the response path
+        if shadow is not None and not tiled and regions is None and (motion is None or not motion['reused']):
+            shadow.offer(image, original_size, confident(detections))
+
+    # Assign persistent track IDs and count line crossings for identified streams
+    tracking_start = time.perf_counter()
+    detections, extras = apply_stream_stages(stream_id, detections, original_size)
+    record_timing(timings, 'tracking', time.perf_counter() - tracking_start)
+
+    # Cached results have no decoded frame; viewers keep the last one
+    if image is not None:
+        renderers.offer(stream_id, image, original_size, detections)
+
+    response_start = time.perf_counter()
+    response = build_detection_response(detections, original_size, start_time)
+    response.update(extras)
+    response['cached'] = cached is not None
+    if tiled:
+        response['tiles'] = len(tiles)
+    if motion is not None:
+        response['motion'] = motion
+
+    # The body can only carry the stages before serialization; the
+    # Server-Timing header also has the response stage
+    debug = request_flag('debug')
+    if debug:
+        response['timings_ms'] = timings_ms(timings)
+    body = encode_detection_response(response)
+    record_timing(timings, 'response', time.perf_counter() - response_start)
+
+    observe_stages('detect', timings)
+    if debug:
+        body.headers['Server-Timing'] = ', '.join(f'{stage};dur={ms}' for stage, ms in timings_ms(timings).items())
+    return body
+
+
+def build_detection_response(detections, original_size, start_time):
+    """Build the /detect success payload (shared with the WebSocket stream)."""
     # Calculate processing time
-    processing_time = round((time.time() - start_time) * 1000, 2)  # in milliseconds
+    processing_time = round((time.perf_counter() - start_time) * 1000, 2)  # in milliseconds
 
     # Count by class
     counts = {}
@@ -266,16 +1345,416 @@ def detect():
         class_name = det['class']
         counts[class_name] = counts.get(class_name, 0) + 1
 
-    return jsonify({
+    response = {
         'success': True,
         'detections': detections,
         'counts': counts,
         'total': len(detections),
+        'model_version': model_version,
         'processing_time_ms': processing_time,
         'image_size': {
-            'width': image.shape[1],
-            'height': image.shape[0]
+            'width': original_size[0],
+            'height': original_size[1]
         }
+    }
+    # Clients should wait interval_ms before the next frame and send it at most max_width wide
+    if QOS_ENABLED:
+        response['hints'] = qos.hints()
+    return response
+
+
+def process_stream_frame(frame_id, payload, stream_id=None):
+    """Detect on one WebSocket frame and build the message sent back."""
+    start_time = time.perf_counter()
+    in_flight.inc('stream_frame')
+    try:
+        message, code, timings = stream_frame_message(frame_id, payload, stream_id, start_time)
+    finally:
+        in_flight.dec('stream_frame')
+
+    request_counter.inc('stream_frame', code)
+    request_latency.observe(time.perf_counter() - start_time, 'stream_frame')
+    observe_stages('stream_frame', timings)
+    return message
+
+
+def stream_frame_message(frame_id, payload, stream_id, start_time):
+    """Returns (message, status code, stage timings) for one stream frame."""
+    timings = {}
+
+    if not inference_ready():
+        error_counter.inc('stream_frame', 'model')
+        return {'type': 'detections', 'frame_id': frame_id, 'success': False,
+                'error': 'Model not loaded. Please check server logs.', 'detections': []}, 503, timings
+
+    apply_qos()
+    regions = region_sets.get(stream_id)
+    decode_start = time.perf_counter()
+    image, original_size = decode_image_bytes(payload, reduced=False if regions is not None else None)
+    record_timing(timings, 'decode', time.perf_counter() - decode_start)
+    if image is None:
+        error_counter.inc('stream_frame', 'decode')
+        return {'type': 'detections', 'frame_id': frame_id, 'success': False,
+                'error': 'Failed to decode frame.', 'detections': []}, 400, timings
+
+    detect_start = time.perf_counter()
+    detections, error, motion = detect_stream_frame(image, original_size, stream_id, timings=timings)
+    detect_s = time.perf_counter() - detect_start
+    if error:
+        error_counter.inc('stream_frame', 'inference')
+        return {'type': 'detections', 'frame_id': frame_id, 'success': False,
+                'error': f'Detection failed: {error}', 'detections': []}, 500, timings
+    record_timing(timings, 'queue', max(0.0, detect_s - timings.get('inference', 0.0) - timings.get('postprocess', 0.0)))
+    if regions is None and (motion is None or not motion['reused']):
+        qos.observe(detect_s * 1000)
+
+    tracking_start = time.perf_counter()
+    detections, extras = apply_stream_stages(stream_id, detections, original_size)
+    record_timing(timings, 'tracking', time.perf_counter() - tracking_start)
+    if motion is not None:
+        extras['motion'] = motion
+    renderers.offer(stream_id, image, original_size, detections)
+
+    return {
+        'type': 'detections',
+        'frame_id': frame_id,
+        **build_detection_response(detections, original_size, start_time),
+        **extras
+    }, 200, timings
+
+
+if sock is not None:
+    @sock.route('/stream')
+    def stream(ws):
+        """
+        WebSocket detection stream.
+        Client sends: binary messages of 4-byte big-endian frame id + JPEG bytes
+        Server sends: JSON detection messages tagged with the frame id
+        Stale frames are dropped when inference falls behind.
+        Connect with ?stream_id=<id> to get persistent track IDs, and with
+        ?format=compact (plus &boxes=base64) for columnar detections.
+        """
+        stream_id = request.args.get('stream_id')
+        compact = request.args.get('format') == 'compact'
+        box_encoding = request.args.get('boxes')
+
+        def process_frame(frame_id, payload):
+            message = process_stream_frame(frame_id, payload, stream_id)
+            if compact and message.get('success'):
+                compact_response(message, box_encoding)
+            return message
+
+        serve_stream(ws, process_frame)
+
+
+@app.route('/mjpeg/<stream_id>', methods=['GET'])
+def mjpeg_stream(stream_id):
+    """
+    Annotated frames of a stream as MJPEG (multipart/x-mixed-replace), e.g.
+    for an <img> tag or a recorder. Frames arrive as the stream's /detect or
+    /stream frames are processed; a slow viewer skips to the newest frame.
+    """
+    if renderers.viewer_count() >= MJPEG_MAX_VIEWERS:
+        return jsonify({
+            'success': False,
+            'error': f'Too many viewers (max {MJPEG_MAX_VIEWERS})'
+        }), 503
+
+    renderer = renderers.watch(stream_id)
+    if renderer is None:
+        return jsonify({
+            'success': False,
+            'error': f'Stream {stream_id} is not sending frames'
+        }), 404
+
+    frames = renderer.frames(max_send_s=MJPEG_MAX_SEND_S)
+    response = Response(frames, mimetype=f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+    response.headers['Cache-Control'] = 'no-cache, no-store'
+    return response
+
+
+@app.route('/tracking/reset', methods=['POST'])
+def reset_tracking():
+    """Forget the tracks of one stream (JSON "stream_id") or of every stream."""
+    data = request.get_json(silent=True) or {}
+    trackers.reset(data.get('stream_id'))
+    return jsonify({
+        'success': True,
+        'stream_id': data.get('stream_id'),
+        'tracked_streams': trackers.stream_count()
+    })
+
+
+@app.route('/counts', methods=['GET'])
+def get_counts():
+    """
+    Conveyor crossing totals and per-minute/per-hour buckets.
+    Query: stream_id (optional, default all streams), limit (max buckets).
+    """
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        'streams': counters.snapshot(request.args.get('stream_id'), limit)
+    })
+
+
+@app.route('/counts/config', methods=['POST'])
+def configure_counts():
+    """
+    Set the counting line or zone for a stream.
+    JSON: {"stream_id": "cam1", "line": [[x1, y1], [x2, y2]]}
+       or {"stream_id": "cam1", "zone": [[x, y], ...]}
+    Add "normalized": true for 0-1 fractions of the frame size,
+    or "remove": true to stop counting the stream.
+    """
+    data = request.get_json(silent=True) or {}
+    stream_id = data.get('stream_id')
+
+    if not stream_id:
+        return jsonify({
+            'success': False,
+            'error': 'stream_id is required'
+        }), 400
+
+    if data.get('remove'):
+        return jsonify({
+            'success': counters.remove(stream_id),
+            'stream_id': stream_id
+        })
+
+    try:
+        counter = counters.configure(
+            stream_id,
+            line=data.get('line'),
+            zone=data.get('zone'),
+            normalized=bool(data.get('normalized', False))
+        )
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+    return jsonify({
+        'success': True,
+        'stream_id': stream_id,
+        'counter': counter.snapshot()
+    })
+
+
+@app.route('/roi', methods=['GET'])
+def get_regions():
+    """Regions of interest per stream. Query: stream_id (optional, default all streams)."""
+    return jsonify({
+        'success': True,
+        'streams': region_sets.snapshot(request.args.get('stream_id'))
+    })
+
+
+@app.route('/roi/config', methods=['POST'])
+def configure_regions():
+    """
+    Set the regions of interest for a stream.
+    JSON: {"stream_id": "cam1", "regions": [{"rect": [x1, y1, x2, y2]},
+                                             {"polygon": [[x, y], ...]}]}
+    Add "normalized": true for 0-1 fractions of the frame size, "mask" and
+    "padding" to override ROI_MASK and ROI_PADDING, or "remove": true to
+    detect on whole frames again.
+    """
+    data = request.get_json(silent=True) or {}
+    stream_id = data.get('stream_id')
+
+    if not stream_id:
+        return jsonify({
+            'success': False,
+            'error': 'stream_id is required'
+        }), 400
+
+    if data.get('remove'):
+        removed = region_sets.remove(stream_id)
+        motion_gates.reset(stream_id)
+        return jsonify({
+            'success': removed,
+            'stream_id': stream_id
+        })
+
+    try:
+        regions = region_sets.configure(
+            stream_id,
+            regions=data.get('regions'),
+            normalized=bool(data.get('normalized', False)),
+            mask=bool(data.get('mask', ROI_MASK)),
+            padding=int(data.get('padding', ROI_PADDING))
+        )
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+    # Detections the change gate holds were made without these regions
+    motion_gates.reset(stream_id)
+    return jsonify({
+        'success': True,
+        'stream_id': stream_id,
+        'roi': regions.describe()
+    })
+
+
+@app.route('/counts/reset', methods=['POST'])
+def reset_counts():
+    """Reset totals for one stream (JSON "stream_id") or every stream."""
+    data = request.get_json(silent=True) or {}
+    counters.reset(data.get('stream_id'))
+    return jsonify({
+        'success': True,
+        'stream_id': data.get('stream_id')
+    })
+
+
+def admin_denied():
+    """403 response if ADMIN_TOKEN is set and the request does not carry it, else None."""
+    if ADMIN_TOKEN and request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'success': False, 'error': 'Missing or wrong X-Admin-Token'}), 403
+    return None
+
+
+@app.route('/models', methods=['GET'])
+def list_models():
+    """Registry versions plus the serving, previous and in-progress model."""
+    return jsonify({
+        'active': model_version,
+        'previous': previous_model[2] if previous_model is not None else None,
+        'swap': model_swap,
+        'registry': MODEL_REGISTRY_DIR,
+        'versions': model_registry.versions()
+    })
+
+
+@app.route('/models/load', methods=['POST'])
+def load_model_version():
+    """
+    Load a registry version in the background and swap it in once warm.
+    JSON: {"version": "2024-06-01"}. Poll GET /models for the outcome.
+    """
+    denied = admin_denied()
+    if denied:
+        return denied
+
+    version = (request.get_json(silent=True) or {}).get('version')
+    try:
+        path = model_registry.path(version)
+    except KeyError:
+        return jsonify({'success': False, 'error': f"Unknown model version: {version}"}), 404
+
+    with model_lock:
+        if model_swap['state'] == 'loading':
+            return jsonify({'success': False, 'error': f"Already loading {model_swap['version']}"}), 409
+        model_swap.update(state='loading', version=version, error=None, started=time.time(), finished=None)
+
+    threading.Thread(target=swap_model, args=(path, version), name='model-swap', daemon=True).start()
+    return jsonify({'success': True, 'swap': model_swap}), 202
+
+
+@app.route('/models/rollback', methods=['POST'])
+def rollback_model_version():
+    """Swap the previously serving model back in; it is still loaded, so this is instant."""
+    denied = admin_denied()
+    if denied:
+        return denied
+
+    if model_swap['state'] == 'loading':
+        return jsonify({'success': False, 'error': f"Loading {model_swap['version']}, try again later"}), 409
+    if previous_model is None:
+        return jsonify({'success': False, 'error': 'No previous model to roll back to'}), 409
+
+    if worker_pool is not None:
+        failed = [w for w, ok, _ in worker_pool.run_command({'command': 'rollback'}) if not ok]
+        if failed:
+            return jsonify({'success': False, 'error': f"Worker(s) {failed} could not roll back"}), 500
+    rollback_model()
+    print(f"↩️ Rolled back to model {model_version}")
+    return jsonify({'success': True, 'active': model_version, 'previous': previous_model[2]})
+
+
+@app.route('/shadow', methods=['GET'])
+def shadow_stats():
+    """Disagreement between the serving model and the shadow candidate."""
+    if shadow is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, 'primary_version': model_version, **shadow.stats()})
+
+
+@app.route('/shadow', methods=['POST'])
+def start_shadow():
+    """
+    Start shadowing a registry version (replacing any running candidate).
+    JSON: {"version": "2024-06-01", "sample_rate": 0.1}
+    The candidate loads in the background (202); GET /shadow shows its state.
+    """
+    global shadow
+
+    denied = admin_denied()
+    if denied:
+        return denied
+
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    try:
+        path = model_registry.path(version)
+        sample_rate = float(data.get('sample_rate', SHADOW_SAMPLE_RATE))
+    except KeyError:
+        return jsonify({'success': False, 'error': f"Unknown model version: {version}"}), 404
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'sample_rate must be a number'}), 400
+    if not 0 < sample_rate <= 1:
+        return jsonify({'success': False, 'error': 'sample_rate must be in (0, 1]'}), 400
+
+    runner = ShadowRunner(
+        path,
+        version,
+        sample_rate=sample_rate,
+        queue_size=SHADOW_QUEUE_SIZE,
+        iou_threshold=SHADOW_IOU_THRESHOLD,
+        busy=lambda: primary_queue_depth() > 0,
+        settings=lambda: (CONFIDENCE_THRESHOLD, IOU_THRESHOLD, INPUT_SIZE),
+        threads=SHADOW_THREADS,
+        nice=SHADOW_NICE
+    )
+    runner.start()
+    previous, shadow = shadow, runner
+    if previous is not None:
+        threading.Thread(target=previous.stop, name='shadow-stop', daemon=True).start()
+    print(f"👥 Loading shadow candidate {version}...")
+    return jsonify({'success': True, 'state': runner.state, 'candidate_version': version, 'sample_rate': sample_rate}), 202
+
+
+@app.route('/shadow/stop', methods=['POST'])
+def stop_shadow():
+    """Stop shadow inference and return its final statistics."""
+    global shadow
+
+    denied = admin_denied()
+    if denied:
+        return denied
+
+    runner, shadow = shadow, None
+    if runner is None:
+        return jsonify({'success': False, 'error': 'Shadow inference is not running'}), 409
+    runner.stop()
+    return jsonify({'success': True, **runner.stats()})
+
+
+@app.route('/batching', methods=['GET'])
+def batching_stats():
+    """Per-batch size and queue wait metrics for tuning the batching window."""
+    if batcher is None:
+        return jsonify({
+            'enabled': False
+        })
+
+    return jsonify({
+        'enabled': True,
+        **batcher.stats()
     })
 
 
@@ -287,14 +1766,26 @@ def get_config():
         'iou_threshold': IOU_THRESHOLD,
         'input_size': INPUT_SIZE,
         'class_names': CLASS_NAMES,
-        'class_colors': CLASS_COLORS
+        'class_colors': CLASS_COLORS,
+        'batch_max_size': BATCH_MAX_SIZE,
+        'batch_window_ms': BATCH_WINDOW_MS,
+        'reduced_decode': REDUCED_DECODE,
+        'motion_threshold': MOTION_THRESHOLD,
+        'qos_enabled': QOS_ENABLED,
+        'tile_size': TILE_SIZE,
+        'tile_overlap': TILE_OVERLAP,
+        'tile_max': TILE_MAX,
+        'tile_full_frame': TILE_FULL_FRAME,
+        'tile_merge': TILE_MERGE
     })
 
 
 @app.route('/config', methods=['POST'])
 def update_config():
     """Update detection configuration."""
-    global CONFIDENCE_THRESHOLD, IOU_THRESHOLD
+    global CONFIDENCE_THRESHOLD, IOU_THRESHOLD, BATCH_MAX_SIZE, BATCH_WINDOW_MS, REDUCED_DECODE
+    global MOTION_THRESHOLD, TILE_SIZE, TILE_OVERLAP, TILE_MAX, TILE_FULL_FRAME, TILE_MERGE
+    global QOS_ENABLED, INPUT_SIZE
 
     data = request.get_json()
 
@@ -304,10 +1795,64 @@ def update_config():
     if 'iou_threshold' in data:
         IOU_THRESHOLD = float(data['iou_threshold'])
 
+    if 'reduced_decode' in data:
+        REDUCED_DECODE = bool(data['reduced_decode'])
+
+    if 'batch_max_size' in data:
+        BATCH_MAX_SIZE = max(1, int(data['batch_max_size']))
+
+    if 'batch_window_ms' in data:
+        BATCH_WINDOW_MS = max(0.0, float(data['batch_window_ms']))
+
+    if 'motion_threshold' in data:
+        MOTION_THRESHOLD = min(1.0, max(0.0, float(data['motion_threshold'])))
+
+    if 'tile_size' in data:
+        TILE_SIZE = max(32, int(data['tile_size']))
+
+    if 'tile_overlap' in data:
+        TILE_OVERLAP = min(0.9, max(0.0, float(data['tile_overlap'])))
+
+    if 'tile_max' in data:
+        TILE_MAX = max(1, int(data['tile_max']))
+
+    if 'tile_full_frame' in data:
+        TILE_FULL_FRAME = bool(data['tile_full_frame'])
+
+    if data.get('tile_merge') in MERGE_METHODS:
+        TILE_MERGE = data['tile_merge']
+
+    if 'qos_enabled' in data:
+        QOS_ENABLED = bool(data['qos_enabled'])
+        if not QOS_ENABLED:
+            # Back to full quality
+            qos.reset()
+            INPUT_SIZE = QOS_LEVELS[0][0]
+
+    # Cached detections were produced with the old settings
+    if data.keys() & {'confidence_threshold', 'iou_threshold', 'reduced_decode'}:
+        motion_gates.reset()
+        result_cache.clear()
+
+    # The batcher reads its limits on every batch, so changes apply immediately
+    if batcher is not None:
+        batcher.max_batch_size = BATCH_MAX_SIZE
+        batcher.window_ms = BATCH_WINDOW_MS
+
     return jsonify({
         'success': True,
         'confidence_threshold': CONFIDENCE_THRESHOLD,
-        'iou_threshold': IOU_THRESHOLD
+        'iou_threshold': IOU_THRESHOLD,
+        'batch_max_size': BATCH_MAX_SIZE,
+        'batch_window_ms': BATCH_WINDOW_MS,
+        'reduced_decode': REDUCED_DECODE,
+        'motion_threshold': MOTION_THRESHOLD,
+        'qos_enabled': QOS_ENABLED,
+        'tile_size': TILE_SIZE,
+        'tile_overlap': TILE_OVERLAP,
+        'tile_max': TILE_MAX,
+        'tile_full_frame': TILE_FULL_FRAME,
+        'tile_merge': TILE_MERGE
     })
 
 
@@ -318,7 +1863,24 @@ def not_found(e):
         'error': 'Endpoint not found',
         'available_endpoints': [
             'GET /health - Check API status',
+            'GET /ready - Readiness probe',
+            'GET /metrics - Prometheus metrics',
             'POST /detect - Run detection on image',
+            'GET /batching - Micro-batching metrics',
+            'GET /models - Model registry versions',
+            'POST /models/load - Swap in a registry version',
+            'POST /models/rollback - Swap the previous model back in',
+            'GET /shadow - Shadow candidate disagreement stats',
+            'POST /shadow - Shadow a registry version on sampled frames',
+            'POST /shadow/stop - Stop shadow inference',
+            'WS /stream - Streaming detection (binary JPEG frames)',
+            'POST /tracking/reset - Reset per-stream tracks',
+            'GET /counts - Conveyor crossing totals',
+            'POST /counts/config - Set counting line/zone for a stream',
+            'POST /counts/reset - Reset crossing totals',
+            'GET /roi - Regions of interest per stream',
+            'POST /roi/config - Set regions of interest for a stream',
+            'GET /mjpeg/<stream_id> - Annotated MJPEG stream of an active stream',
             'GET /config - Get configuration',
             'POST /config - Update configuration'
         ]
@@ -338,27 +1900,41 @@ if __name__ == '__main__':
     print("🔩 NUT & BOLT DETECTION API SERVER")
     print("="*60 + "\n")
 
-    # Load the model on startup
-    model_loaded = load_model()
+    # Ctrl-C finishes the detections in flight first
+    install_drain_handler(admission, DRAIN_TIMEOUT_S)
 
-    if not model_loaded:
-        print("\n⚠️ WARNING: Model not loaded!")
-        print("The server will start but detections will fail.")
-        print(f"Please place your model file at: {MODEL_PATH}\n")
+    # Load and warm the model; in the background, /health answers (ready: false) meanwhile
+    if STARTUP_IN_BACKGROUND:
+        threading.Thread(target=startup, name='startup', daemon=True).start()
+    else:
+        startup()
 
     print("\n📡 Starting server...")
     print("🌐 API will be available at: http://localhost:5000")
     print("📋 Endpoints:")
     print("   - GET  /health  - Check API status")
+    print("   - GET  /ready   - Readiness probe (503 until warmed up)")
+    print("   - GET  /metrics - Prometheus metrics")
     print("   - POST /detect  - Run detection")
+    print("   - GET  /batching - Micro-batching metrics")
+    print("   - GET  /models  - Model registry (POST /models/load, /models/rollback)")
+    print("   - GET  /shadow  - Shadow candidate stats (POST /shadow, /shadow/stop)")
+    if sock is not None:
+        print("   - WS   /stream  - Streaming detection")
+    print("   - POST /tracking/reset - Reset per-stream tracks")
+    print("   - GET  /counts  - Conveyor crossing totals")
+    print("   - GET  /roi     - Regions of interest (POST /roi/config)")
+    print("   - GET  /mjpeg/<stream_id> - Annotated MJPEG stream")
     print("   - GET  /config  - Get configuration")
     print("   - POST /config  - Update configuration")
     print("\n" + "="*60 + "\n")
+    print("ℹ️  Development server - for production run: cd backend && gunicorn -c gunicorn.conf.py wsgi:app\n")
 
     # Run Flask app
     app.run(
         host='0.0.0.0',
         port=5000,
-        debug=True,
-        threaded=True
+        debug=DEBUG,
+        threaded=True,
+        use_reloader=DEBUG and NUM_WORKERS <= 0  # The reloader would spawn a second set of workers
     )
@@ -0,0 +1,155 @@
+"""
+Micro-batching scheduler for the detection API.
+Collects frames from concurrent /detect requests and runs them as one batch.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Group submitted items into batches bounded by size and wait window.
+
+    `process_batch` receives a list of items and must return a list of
+    results in the same order. Each caller gets its own result back through
+    the Future returned by `submit()`.
+    """
+
+    def __init__(self, process_batch, max_batch_size=8, window_ms=10, history=1000):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.window_ms = window_ms
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._batch_sizes = deque(maxlen=history)
+        self._wait_times_ms = deque(maxlen=history)
+        self._run_times_ms = deque(maxlen=history)
+        self._size_histogram = {}
+        self._total_batches = 0
+        self._total_items = 0
+
+    def start(self):
+        """Start the background batching thread."""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop the batching thread after the current batch finishes."""
+        self._running = False
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, item):
+        """Queue an item for the next batch and return a Future for its result."""
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def queue_depth(self):
+        """Number of items waiting for a batch."""
+        return self._queue.qsize()
+
+    def _collect(self):
+        """Block for the first item, then gather more until the window closes."""
+        first = self._queue.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        deadline = first[2] + self.window_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            # Once the window has closed, only take frames that are already
+            # waiting (a backlog built up while the previous batch ran)
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    entry = self._queue.get(timeout=remaining)
+                else:
+                    entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                self._running = False
+                break
+            batch.append(entry)
+
+        return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            items = [entry[0] for entry in batch]
+
+            try:
+                results = self.process_batch(items)
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+
+            finished = time.perf_counter()
+            self._record(batch, started, finished)
+
+    def _record(self, batch, started, finished):
+        size = len(batch)
+        with self._lock:
+            self._total_batches += 1
+            self._total_items += size
+            self._batch_sizes.append(size)
+            self._size_histogram[size] = self._size_histogram.get(size, 0) + 1
+            self._run_times_ms.append((finished - started) * 1000)
+            for _, _, enqueued in batch:
+                self._wait_times_ms.append((started - enqueued) * 1000)
+
+    def stats(self):
+        """Return batch size and queue wait metrics for tuning the window."""
+        with self._lock:
+            sizes = list(self._batch_sizes)
+            waits = sorted(self._wait_times_ms)
+            runs = list(self._run_times_ms)
+            histogram = dict(sorted(self._size_histogram.items()))
+            total_batches = self._total_batches
+            total_items = self._total_items
+
+        def percentile(values, pct):
+            if not values:
+                return 0.0
+            index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+            return round(values[index], 2)
+
+        return {
+            'running': self._running,
+            'max_batch_size': self.max_batch_size,
+            'window_ms': self.window_ms,
+            'queue_depth': self.queue_depth(),
+            'total_batches': total_batches,
+            'total_items': total_items,
+            'avg_batch_size': round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+            'batch_size_histogram': histogram,
+            'wait_ms': {
+                'avg': round(sum(waits) / len(waits), 2) if waits else 0.0,
+                'p50': percentile(waits, 50),
+                'p95': percentile(waits, 95),
+                'max': round(waits[-1], 2) if waits else 0.0
+            },
+            'batch_run_ms_avg': round(sum(runs) / len(runs), 2) if runs else 0.0
+        }
@@ -0,0 +1,218 @@
+"""
+Conveyor counting for tracked detections.
+Counts each track once when its center crosses a virtual line (or enters a
+zone) and keeps per-class running totals plus per-minute and per-hour
+buckets in fixed-size rings.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from geometry import box_centers, points_in_polygon, segment_crossings
+
+
+class TimeBuckets:
+    """Fixed-size ring of per-class counts, one slot per time bucket."""
+
+    def __init__(self, width_s, capacity):
+        self.width_s = width_s
+        self.capacity = capacity
+        self._slots = [None] * capacity
+
+    def add(self, timestamp, class_name, count=1):
+        index = int(timestamp // self.width_s)
+        slot = index % self.capacity
+        entry = self._slots[slot]
+        if entry is None or entry[0] != index:
+            entry = (index, {})
+            self._slots[slot] = entry
+        entry[1][class_name] = entry[1].get(class_name, 0) + count
+
+    def series(self, now, limit=None):
+        """Non-empty buckets still inside the ring window, oldest first."""
+        current = int(now // self.width_s)
+        entries = sorted(
+            (e for e in self._slots if e is not None and current - e[0] < self.capacity),
+            key=lambda e: e[0]
+        )
+        if limit:
+            entries = entries[-limit:]
+        return [
+            {
+                'start': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(index * self.width_s)),
+                'counts': dict(counts)
+            }
+            for index, counts in entries
+        ]
+
+
+class CrossingCounter:
+    """Counts unique tracks crossing a line or entering a zone on one stream."""
+
+    def __init__(self, line=None, zone=None, normalized=False, track_memory=2048):
+        if (line is None) == (zone is None):
+            raise ValueError("Configure exactly one of 'line' or 'zone'")
+        if line is not None and len(line) != 2:
+            raise ValueError("'line' must be two points [[x1, y1], [x2, y2]]")
+        if zone is not None and len(zone) < 3:
+            raise ValueError("'zone' must have at least three points")
+
+        self.line = np.asarray(line, dtype=np.float64) if line is not None else None
+        self.zone = np.asarray(zone, dtype=np.float64) if zone is not None else None
+        self.normalized = normalized
+        self.track_memory = track_memory
+
+        self.totals = {}
+        self.directions = {'forward': {}, 'reverse': {}}
+        self.minutes = TimeBuckets(60, 24 * 60)   # Last 24 hours
+        self.hours = TimeBuckets(3600, 7 * 24)    # Last 7 days
+        self._last_center = {}                    # track_id -> (x, y), insertion ordered
+        self._counted = set()
+        self.started = time.time()
+
+    def _scaled(self, points, image_size):
+        if not self.normalized:
+            return points
+        return points * np.array(image_size, dtype=np.float64)
+
+    def update(self, detections, image_size, now=None):
+        """Count newly crossing tracks; detections must carry 'track_id'."""
+        now = time.time() if now is None else now
+        tracked = [d for d in detections if 'track_id' in d]
+        if not tracked:
+            return
+
+        ids = [d['track_id'] for d in tracked]
+        centers = box_centers([[d['bbox']['x1'], d['bbox']['y1'], d['bbox']['x2'], d['bbox']['y2']] for d in tracked])
+
+        has_prev = np.array([track_id in self._last_center for track_id in ids])
+        previous = np.array([self._last_center[t] for t in ids if t in self._last_center]).reshape(-1, 2)
+
+        if self.line is not None:
+            a, b = self._scaled(self.line, image_size)
+            crossed = np.zeros(len(ids), dtype=bool)
+            direction = np.zeros(len(ids), dtype=np.int64)
+            if len(previous):
+                hit, sign = segment_crossings(previous, centers[has_prev], a, b)
+                crossed[has_prev] = hit
+                direction[has_prev] = sign
+        else:
+            # Entering the zone: inside now and not inside on the previous frame
+            zone = self._scaled(self.zone, image_size)
+            was_inside = np.zeros(len(ids), dtype=bool)
+            if len(previous):
+                was_inside[has_prev] = points_in_polygon(previous, zone)
+            crossed = points_in_polygon(centers, zone) & ~was_inside
+            direction = np.ones(len(ids), dtype=np.int64)
+
+        for index in np.flatnonzero(crossed):
+            track_id = ids[index]
+            if track_id in self._counted:
+                continue
+            self._counted.add(track_id)
+            class_name = tracked[index]['class']
+            self.totals[class_name] = self.totals.get(class_name, 0) + 1
+            bucket = self.directions['forward' if direction[index] >= 0 else 'reverse']
+            bucket[class_name] = bucket.get(class_name, 0) + 1
+            self.minutes.add(now, class_name)
+            self.hours.add(now, class_name)
+
+        for track_id, center in zip(ids, centers.tolist()):
+            self._last_center.pop(track_id, None)
+            self._last_center[track_id] = center
+
+        # Bound memory: forget the least recently seen tracks
+        while len(self._last_center) > self.track_memory:
+            oldest = next(iter(self._last_center))
+            del self._last_center[oldest]
+            self._counted.discard(oldest)
+
+    def snapshot(self, now=None, limit=None):
+        now = time.time() if now is None else now
+        return {
+            'mode': 'line' if self.line is not None else 'zone',
+            'line': self.line.tolist() if self.line is not None else None,
+            'zone': self.zone.tolist() if self.zone is not None else None,
+            'normalized': self.normalized,
+            'since': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'totals': dict(self.totals),
+            'total': sum(self.totals.values()),
+            'directions': {k: dict(v) for k, v in self.directions.items()},
+            'per_minute': self.minutes.series(now, limit),
+            'per_hour': self.hours.series(now, limit)
+        }
+
+    def forget_tracks(self):
+        """
+        Forget which track ids were seen and counted, keeping the totals.
+        Needed when the stream's tracker restarts, since it reuses ids from 1.
+        """
+        self._last_center.clear()
+        self._counted.clear()
+
+    def reset(self):
+        """Clear totals and buckets, keeping the line/zone definition."""
+        self.__init__(
+            line=self.line.tolist() if self.line is not None else None,
+            zone=self.zone.tolist() if self.zone is not None else None,
+            normalized=self.normalized,
+            track_memory=self.track_memory
+        )
+
+
+class CounterRegistry:
+    """One CrossingCounter per configured stream."""
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def configure(self, stream_id, **options):
+        counter = CrossingCounter(**options)
+        with self._lock:
+            self._counters[stream_id] = (counter, threading.Lock())
+        return counter
+
+    def remove(self, stream_id):
+        with self._lock:
+            return self._counters.pop(stream_id, None) is not None
+
+    def update(self, stream_id, detections, image_size):
+        """Update a stream's counter; returns its running totals or None."""
+        entry = self._counters.get(stream_id)
+        if entry is None:
+            return None
+        counter, lock = entry
+        with lock:
+            counter.update(detections, image_size)
+            return dict(counter.totals)
+
+    def forget_tracks(self, stream_id):
+        """The stream's tracker was reset or evicted; its track ids start over."""
+        entry = self._counters.get(stream_id)
+        if entry is None:
+            return
+        counter, lock = entry
+        with lock:
+            counter.forget_tracks()
+
+    def snapshot(self, stream_id=None, limit=None):
+        with self._lock:
+            entries = dict(self._counters)
+        if stream_id is not None:
+            entries = {stream_id: entries[stream_id]} if stream_id in entries else {}
+        result = {}
+        for sid, (counter, lock) in entries.items():
+            with lock:
+                result[sid] = counter.snapshot(limit=limit)
+        return result
+
+    def reset(self, stream_id=None):
+        with self._lock:
+            entries = dict(self._counters)
+        for sid, (counter, lock) in entries.items():
+            if stream_id is None or sid == stream_id:
+                with lock:
+                    counter.reset()
@@ -0,0 +1,56 @@
+"""
+Vectorized geometry helpers shared by counting and region filters.
+"""
+
+import numpy as np
+
+
+def box_centers(boxes):
+    """Centers of (N, 4) xyxy boxes as (N, 2)."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return np.column_stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2])
+
+
+def side_of_line(points, a, b):
+    """Signed cross product of each point against line a->b (>0 left, <0 right)."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return (b[0] - a[0]) * (points[:, 1] - a[1]) - (b[1] - a[1]) * (points[:, 0] - a[0])
+
+
+def segment_crossings(starts, ends, a, b):
+    """
+    For N movements starts[i] -> ends[i], which ones cross segment a-b.
+    Returns (crossed mask, direction) where direction is +1 when moving to
+    the left side of a->b and -1 when moving to the right side.
+    """
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+
+    side_start = side_of_line(starts, a, b)
+    side_end = side_of_line(ends, a, b)
+    changes_side = (side_start * side_end < 0) | ((side_start == 0) & (side_end != 0))
+
+    # The movement must also pass between the segment's end points
+    move = ends - starts
+    cross_a = move[:, 0] * (a[1] - starts[:, 1]) - move[:, 1] * (a[0] - starts[:, 0])
+    cross_b = move[:, 0] * (b[1] - starts[:, 1]) - move[:, 1] * (b[0] - starts[:, 0])
+    within_segment = cross_a * cross_b <= 0
+
+    return changes_side & within_segment, np.sign(side_end).astype(np.int64)
+
+
+def points_in_polygon(points, polygon):
+    """Even-odd ray casting for (N, 2) points against an (M, 2) polygon."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+
+    x = points[:, 0][:, None]
+    y = points[:, 1][:, None]
+    x1, y1 = polygon[:, 0][None, :], polygon[:, 1][None, :]
+    x2, y2 = np.roll(polygon[:, 0], -1)[None, :], np.roll(polygon[:, 1], -1)[None, :]
+
+    straddles = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_at_y = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    crossings = straddles & (x < x_at_y)
+    return (crossings.sum(axis=1) % 2) == 1
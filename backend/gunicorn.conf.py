@@ -0,0 +1,29 @@
+"""
+Gunicorn settings for the detection API: cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+
+One process holds the model and serves every request from a bounded thread
+pool; use INFERENCE_WORKERS for more inference processes. On SIGTERM the
+worker stops admitting /detect requests (503, /ready turns 503 too), waits
+for in-flight detections and then shuts down.
+"""
+
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = 1                # Each gunicorn worker would load its own model
+worker_class = 'gthread'
+# Enough for ADMISSION_MAX_IN_FLIGHT + ADMISSION_MAX_QUEUED (32 + 32) plus
+# MJPEG viewers, WebSocket streams and health checks, which hold a thread each
+threads = int(os.environ.get('GUNICORN_THREADS', 96))
+timeout = 120              # Model load and warmup happen in the background, but exports can be slow
+graceful_timeout = 30      # Longer than DRAIN_TIMEOUT_S in app.py
+keepalive = 5
+preload_app = False        # Load the model after the fork, in the worker that serves it
+limit_request_field_size = 16384
+
+
+def post_worker_init(worker):
+    """Drain in-flight detections before gunicorn's own graceful shutdown."""
+    from admission import install_drain_handler
+    from app import DRAIN_TIMEOUT_S, admission
+    install_drain_handler(admission, DRAIN_TIMEOUT_S)
@@ -0,0 +1,50 @@
+"""
+Versioned model registry for the detection API.
+Each version is a sub-directory holding its own best.pt; runtime exports
+are cached next to it, so every version exports once:
+
+    model/registry/2024-06-01/best.pt
+    model/registry/line3-v2/best.pt
+"""
+
+import os
+import re
+import time
+
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')  # Directory names only, no paths
+
+
+class ModelRegistry:
+    """Lists and resolves model versions under a registry directory."""
+
+    def __init__(self, root, filename='best.pt'):
+        self.root = root
+        self.filename = filename
+
+    def path(self, version):
+        """Model file for a version; raises KeyError if there is no such version."""
+        if not isinstance(version, str) or not VERSION_PATTERN.match(version):
+            raise KeyError(version)
+        path = os.path.join(self.root, version, self.filename)
+        if not os.path.isfile(path):
+            raise KeyError(version)
+        return path
+
+    def versions(self):
+        """Available versions, newest first."""
+        if not os.path.isdir(self.root):
+            return []
+
+        entries = []
+        for version in os.listdir(self.root):
+            try:
+                path = self.path(version)
+            except KeyError:
+                continue
+            stat = os.stat(path)
+            entries.append({
+                'version': version,
+                'size_mb': round(stat.st_size / 1e6, 2),
+                'modified': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(stat.st_mtime))
+            })
+        return sorted(entries, key=lambda e: e['modified'], reverse=True)
@@ -0,0 +1,111 @@
+"""
+Change gating for static scenes.
+Compares a small grayscale thumbnail of each frame with the last frame that
+was actually inferred; when the scene has barely changed, that frame's
+detections are reused instead of running the model again.
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from stream_registry import StreamRegistry
+
+THUMBNAIL_WIDTH = 64
+PIXEL_DELTA = 20  # Gray-level difference that counts a thumbnail pixel as changed
+
+
+def thumbnail(image):
+    """Downscaled grayscale copy of a BGR frame used for differencing."""
+    height, width = image.shape[:2]
+    size = (THUMBNAIL_WIDTH, max(1, round(THUMBNAIL_WIDTH * height / width)))
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def frame_change(thumb_a, thumb_b):
+    """
+    Fraction of thumbnail pixels that changed by more than PIXEL_DELTA,
+    0 (same) to 1. A fraction rather than a mean difference keeps a small
+    part moving across a static background from being averaged away.
+    """
+    if thumb_a is None or thumb_b is None or thumb_a.shape != thumb_b.shape:
+        return 1.0
+    return float((np.abs(thumb_a - thumb_b) > PIXEL_DELTA).mean())
+
+
+class ChangeGate:
+    """Last inferred frame and its detections for one stream."""
+
+    def __init__(self, max_reuse_s=5.0):
+        self.max_reuse_s = max_reuse_s
+        self._lock = threading.Lock()
+        self._thumb = None
+        self._detections = None
+        self._inferred_at = 0.0
+        self.frames = 0
+        self.skipped = 0
+        self.inference_ms = 0.0  # Moving average over inferred frames
+
+    def check(self, thumb, threshold):
+        """
+        Returns (cached detections or None, change score).
+        Detections are only reused below the threshold and for at most
+        max_reuse_s, so a slow drift still gets re-inferred eventually.
+        """
+        with self._lock:
+            self.frames += 1
+            change = frame_change(thumb, self._thumb)
+            fresh = time.monotonic() - self._inferred_at < self.max_reuse_s
+            if change < threshold and fresh:
+                self.skipped += 1
+                return self._detections, change
+            return None, change
+
+    def store(self, thumb, detections, inference_ms):
+        """Remember an inferred frame and fold its cost into the average."""
+        with self._lock:
+            self._thumb = thumb
+            self._detections = detections
+            self._inferred_at = time.monotonic()
+            if self.inference_ms:
+                self.inference_ms = 0.9 * self.inference_ms + 0.1 * inference_ms
+            else:
+                self.inference_ms = inference_ms
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'skip_ratio': round(self.skipped / self.frames, 3) if self.frames else 0.0,
+            'time_saved_ms': round(self.skipped * self.inference_ms, 1)
+        }
+
+
+class ChangeGateRegistry:
+    """One ChangeGate per stream id, evicting streams that go idle."""
+
+    def __init__(self, idle_timeout_s=300, max_streams=256, **gate_options):
+        self._streams = StreamRegistry(lambda stream_id: ChangeGate(**gate_options), idle_timeout_s, max_streams)
+
+    def get(self, stream_id):
+        return self._streams.get(stream_id)
+
+    def reset(self, stream_id=None):
+        """Forget cached frames so the next frame is always inferred."""
+        self._streams.remove(stream_id)
+
+    def stats(self):
+        """Skip statistics summed over every stream."""
+        gates = [gate for _, gate in self._streams.items()]
+        frames = sum(g.frames for g in gates)
+        skipped = sum(g.skipped for g in gates)
+        return {
+            'streams': len(gates),
+            'frames': frames,
+            'skipped': skipped,
+            'skip_ratio': round(skipped / frames, 3) if frames else 0.0,
+            'time_saved_ms': round(sum(g.skipped * g.inference_ms for g in gates), 1)
+        }
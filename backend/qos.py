@@ -0,0 +1,133 @@
+"""
+Load-adaptive quality of service for the detection API.
+Watches the inference queue depth and recent detection latency, steps the
+model input size down a level (e.g. 640 -> 480 -> 320) when frames pile up
+and back up once the pressure is gone. Each level also carries hints for
+clients: how long to wait before the next frame and how wide it should be.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class QosController:
+    """Picks the serving level from queue depth and p90 detection latency."""
+
+    def __init__(self, levels, queue_high=8, queue_low=1, latency_high_ms=500.0, latency_low_ms=200.0,
+                 window=30, cooldown_s=3.0, recover_s=10.0, max_interval_ms=3000, history=20):
+        self.levels = list(levels)            # [(input_size, interval_ms, max_width)], best quality first
+        self.queue_high = queue_high
+        self.queue_low = queue_low
+        self.latency_high_ms = latency_high_ms
+        self.latency_low_ms = latency_low_ms
+        self.cooldown_s = cooldown_s          # Min time between two step-downs
+        self.recover_s = recover_s            # Calm time needed before a step-up
+        self.max_interval_ms = max_interval_ms
+        self.level = 0
+        self.backoff = 1                      # Interval multiplier when overloaded at the lowest level
+        self.decisions = deque(maxlen=history)
+        self._latencies_ms = deque(maxlen=window)
+        self._last_change = 0.0
+        self._calm_since = None
+        self._queue_depth = 0
+        self._lock = threading.Lock()
+
+    @property
+    def input_size(self):
+        return self.levels[self.level][0]
+
+    def observe(self, latency_ms):
+        """Record the detection latency (queue + inference) of one frame."""
+        with self._lock:
+            self._latencies_ms.append(latency_ms)
+
+    def latency_p90(self):
+        with self._lock:
+            latencies = list(self._latencies_ms)
+        return float(np.percentile(latencies, 90)) if latencies else 0.0
+
+    def update(self, queue_depth, now=None):
+        """Re-evaluate the level for the current queue depth; returns the input size to use."""
+        now = time.monotonic() if now is None else now
+        p90 = self.latency_p90()
+
+        with self._lock:
+            self._queue_depth = queue_depth
+            overloaded = queue_depth >= self.queue_high or p90 > self.latency_high_ms
+            calm = queue_depth <= self.queue_low and p90 < self.latency_low_ms
+
+            if overloaded:
+                self._calm_since = None
+                if now - self._last_change >= self.cooldown_s:
+                    if self.level < len(self.levels) - 1:
+                        self._change(self.level + 1, now, queue_depth, p90, 'overloaded')
+                    elif self.levels[-1][1] * self.backoff * 2 <= self.max_interval_ms:
+                        # Nothing left to trade on the server, slow the clients down further
+                        self.backoff *= 2
+                        self._change(self.level, now, queue_depth, p90, 'overloaded, client backoff')
+            elif calm:
+                if self._calm_since is None:
+                    self._calm_since = now
+                elif now - self._calm_since >= self.recover_s and (self.backoff > 1 or self.level > 0):
+                    if self.backoff > 1:
+                        self.backoff //= 2
+                        self._change(self.level, now, queue_depth, p90, 'recovered, less backoff')
+                    else:
+                        self._change(self.level - 1, now, queue_depth, p90, 'recovered')
+                    self._calm_since = now
+            else:
+                self._calm_since = None
+
+            return self.levels[self.level][0]
+
+    def _change(self, level, now, queue_depth, p90, reason):
+        previous = self.levels[self.level][0]
+        self.level = level
+        self._last_change = now
+        # Latencies measured at the old input size say little about the new one
+        self._latencies_ms.clear()
+        self.decisions.append({
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'from_input_size': previous,
+            'to_input_size': self.levels[level][0],
+            'backoff': self.backoff,
+            'queue_depth': queue_depth,
+            'latency_p90_ms': round(p90, 1),
+            'reason': reason
+        })
+
+    def reset(self):
+        """Back to the best-quality level, e.g. when QoS is switched off."""
+        with self._lock:
+            self.level = 0
+            self.backoff = 1
+            self._latencies_ms.clear()
+            self._calm_since = None
+
+    def hints(self):
+        """Suggested next-frame interval and frame width for clients."""
+        with self._lock:
+            input_size, interval_ms, max_width = self.levels[self.level]
+            return {
+                'input_size': input_size,
+                'interval_ms': min(self.max_interval_ms, interval_ms * self.backoff),
+                'max_width': max_width
+            }
+
+    def stats(self):
+        """Current level, the signals behind it and recent decisions for /health."""
+        p90 = self.latency_p90()
+        with self._lock:
+            decisions = list(self.decisions)
+            queue_depth = self._queue_depth
+        return {
+            'level': self.level,
+            'levels': [size for size, _, _ in self.levels],
+            'hints': self.hints(),
+            'queue_depth': queue_depth,
+            'latency_p90_ms': round(p90, 1),
+            'decisions': decisions
+        }
@@ -0,0 +1,216 @@
+"""
+Server-side annotated frames for displays and recorders that cannot run
+the frontend. Each watched stream gets a render thread that draws the
+latest frame's boxes and labels into a reused buffer and JPEG-encodes it
+once; every MJPEG viewer of the stream is sent those same bytes. Viewers
+only ever get the newest frame, and one that cannot keep up is dropped.
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from stream_registry import StreamRegistry
+from streaming import LatestFrameSlot
+
+BOUNDARY = 'frame'
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.5
+LINE_WIDTH = 2
+LABEL_PADDING = 4
+
+
+def draw_detections(canvas, detections, class_colors, scale=(1.0, 1.0), default_color=(0, 255, 0)):
+    """
+    Draw boxes and "Class 87% #track" labels onto a BGR frame in place.
+    Detections are in original-frame pixels; scale maps them to the canvas.
+    class_colors are RGB, like the API's color field.
+    """
+    height, width = canvas.shape[:2]
+    for det in detections:
+        bbox = det['bbox']
+        x1 = int(round(bbox['x1'] * scale[0]))
+        y1 = int(round(bbox['y1'] * scale[1]))
+        x2 = int(round(bbox['x2'] * scale[0]))
+        y2 = int(round(bbox['y2'] * scale[1]))
+        color = tuple(int(c) for c in class_colors.get(det['class'], default_color)[::-1])  # RGB -> BGR
+        cv2.rectangle(canvas, (x1, y1), (x2, y2), color, LINE_WIDTH)
+
+        label = f"{det['class']} {round(det['confidence'] * 100)}%"
+        if 'track_id' in det:
+            label += f" #{det['track_id']}"
+        (text_width, text_height), baseline = cv2.getTextSize(label, FONT, FONT_SCALE, 1)
+        label_height = text_height + baseline + LABEL_PADDING
+        # Above the box, or inside it when the box touches the top edge
+        top = y1 - label_height if y1 >= label_height else y1
+        left = min(max(0, x1), max(0, width - text_width - 2 * LABEL_PADDING))
+        cv2.rectangle(canvas, (left, top), (left + text_width + 2 * LABEL_PADDING, top + label_height), color, cv2.FILLED)
+        cv2.putText(canvas, label, (left + LABEL_PADDING, top + text_height + LABEL_PADDING // 2),
+                    FONT, FONT_SCALE, (0, 0, 0), 1, cv2.LINE_AA)
+    return canvas
+
+
+def mjpeg_part(jpeg):
+    """One multipart/x-mixed-replace part carrying a JPEG frame."""
+    header = f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n'
+    return header.encode('ascii') + jpeg + b'\r\n'
+
+
+class AnnotatedStream:
+    """Render thread and the latest encoded frame of one stream."""
+
+    def __init__(self, stream_id, class_colors, jpeg_quality=80):
+        self.stream_id = stream_id
+        self.class_colors = class_colors
+        self.jpeg_quality = jpeg_quality
+        self.viewers = 0
+        self.viewers_dropped = 0
+        self.frames_rendered = 0
+        self.render_ms = 0.0  # Moving average of draw + encode time
+        self._slot = LatestFrameSlot()
+        self._buffer = None
+        self._jpeg = None
+        self._sequence = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f'render-{stream_id}', daemon=True)
+        self._thread.start()
+
+    def offer(self, image, original_size, detections):
+        """Hand a frame to the render thread; replaces a frame it has not started on."""
+        if self.viewers:
+            self._slot.put(None, (image, original_size, detections))
+
+    def _run(self):
+        while True:
+            frame = self._slot.take()
+            if frame is None:
+                return
+            _, (image, original_size, detections) = frame
+
+            start = time.perf_counter()
+            jpeg = self.render(image, original_size, detections)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if jpeg is None:
+                continue
+
+            with self._condition:
+                self._jpeg = jpeg
+                self._sequence += 1
+                self.frames_rendered += 1
+                self.render_ms = elapsed_ms if self.frames_rendered == 1 else 0.9 * self.render_ms + 0.1 * elapsed_ms
+                self._condition.notify_all()
+
+    def render(self, image, original_size, detections):
+        """Draw onto the reused buffer and encode it; returns the JPEG bytes."""
+        if self._buffer is None or self._buffer.shape != image.shape:
+            self._buffer = np.empty_like(image)
+        np.copyto(self._buffer, image)
+
+        height, width = image.shape[:2]
+        scale = (1.0, 1.0)
+        if original_size is not None:
+            scale = (width / original_size[0], height / original_size[1])
+        draw_detections(self._buffer, detections, self.class_colors, scale)
+
+        ok, encoded = cv2.imencode('.jpg', self._buffer, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return encoded.tobytes() if ok else None
+
+    def latest(self):
+        with self._condition:
+            return self._jpeg
+
+    def frames(self, max_send_s=2.0, keepalive_s=10.0):
+        """
+        MJPEG parts for one viewer: always the newest frame, skipping any it
+        missed. The generator resumes only after the server wrote the previous
+        part, so a viewer whose write took over max_send_s is dropped instead
+        of letting frames pile up in its socket.
+        """
+        with self._condition:
+            self.viewers += 1
+        try:
+            # WSGI servers send the headers with the first chunk; don't hold them until a frame arrives
+            yield b''
+
+            sequence = 0
+            while True:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._sequence != sequence or self._closed, timeout=keepalive_s)
+                    if self._closed:
+                        return
+                    sequence, jpeg = self._sequence, self._jpeg
+                if jpeg is None:
+                    continue
+
+                # On a static stream the last frame is re-sent now and then to keep the connection open
+                sent = time.monotonic()
+                yield mjpeg_part(jpeg)
+                if time.monotonic() - sent > max_send_s:
+                    with self._condition:
+                        self.viewers_dropped += 1
+                    return
+        finally:
+            with self._condition:
+                self.viewers -= 1
+
+    def close(self):
+        self._slot.close()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'viewers': self.viewers,
+                'viewers_dropped': self.viewers_dropped,
+                'frames_rendered': self.frames_rendered,
+                'frames_skipped': self._slot.dropped,
+                'avg_render_ms': round(self.render_ms, 2)
+            }
+
+
+class RendererRegistry:
+    """
+    One AnnotatedStream per watched stream. Only streams that sent a frame
+    within idle_timeout_s can be watched; renderers of streams that stop
+    sending are closed (ending their viewers) and evicted.
+    """
+
+    def __init__(self, class_colors, jpeg_quality=80, idle_timeout_s=60, max_streams=64):
+        self.class_colors = class_colors
+        self.jpeg_quality = jpeg_quality
+        self._producers = StreamRegistry(lambda stream_id: {}, idle_timeout_s, max_streams=1024)
+        self._renderers = StreamRegistry(
+            lambda stream_id: AnnotatedStream(stream_id, self.class_colors, self.jpeg_quality),
+            idle_timeout_s,
+            max_streams,
+            on_evict=lambda renderer: renderer.close()
+        )
+
+    def watch(self, stream_id):
+        """The renderer of an active stream, started on first use; None if the stream is not sending."""
+        self._renderers.evict_idle()
+        self._producers.evict_idle()
+        if self._producers.peek(stream_id) is None:
+            return None
+        return self._renderers.get(stream_id)
+
+    def offer(self, stream_id, image, original_size, detections):
+        """Pass a detected frame on to its stream's viewers; only bookkeeping while nobody watches."""
+        if not stream_id:
+            return
+        self._producers.get(stream_id)
+        renderer = self._renderers.get(stream_id, create=False)
+        if renderer is not None:
+            renderer.offer(image, original_size, detections)
+
+    def viewer_count(self):
+        return sum(renderer.viewers for _, renderer in self._renderers.items())
+
+    def stats(self):
+        self._renderers.evict_idle()
+        return {stream_id: renderer.stats() for stream_id, renderer in self._renderers.items()}
@@ -0,0 +1,94 @@
+"""
+Compact columnar encoding of detection responses.
+The verbose format repeats the class name, a bbox object and the color for
+every box. The compact one sends class names and colors once as a legend
+and the boxes as parallel arrays, optionally with the coordinates as
+base64 of little-endian float32, or as raw bytes in MessagePack.
+"""
+
+import base64
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMATS = ('verbose', 'compact')
+BOX_ENCODINGS = ('array', 'base64')
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+BOX_FIELDS = ('x1', 'y1', 'x2', 'y2')
+
+
+def negotiate(accept, requested=None):
+    """
+    Pick the response encoding from an explicit format ('verbose' or
+    'compact') and the Accept header. Returns (format, use_msgpack);
+    MessagePack is always compact and falls back to compact JSON when
+    msgpack is not installed.
+    """
+    accept = (accept or '').lower()
+    if msgpack is not None and any(mime in accept for mime in MSGPACK_TYPES):
+        return 'compact', True
+    if requested in FORMATS:
+        return requested, False
+    if any(mime in accept for mime in MSGPACK_TYPES):
+        return 'compact', False
+    return 'verbose', False
+
+
+def compact_detections(detections, class_names, class_colors, box_encoding='array', default_color=(0, 255, 0)):
+    """
+    Columnar form of a verbose detection list. Class ids index the legend,
+    which starts with class_names so ids stay stable from frame to frame.
+    """
+    legend = list(class_names)
+    index = {name: i for i, name in enumerate(legend)}
+    class_ids = []
+    for det in detections:
+        name = det['class']
+        if name not in index:
+            index[name] = len(legend)
+            legend.append(name)
+        class_ids.append(index[name])
+
+    boxes = np.array([[det['bbox'][field] for field in BOX_FIELDS] for det in detections],
+                     dtype=np.float32).reshape(-1, 4)
+    if box_encoding == 'bytes':
+        encoded_boxes = boxes.astype('<f4').tobytes()
+    elif box_encoding == 'base64':
+        encoded_boxes = base64.b64encode(boxes.astype('<f4').tobytes()).decode('ascii')
+    else:
+        box_encoding = 'array'
+        encoded_boxes = [round(value, 2) for value in boxes.ravel().tolist()]
+
+    compact = {
+        'count': len(detections),
+        'legend': {
+            'classes': legend,
+            'colors': [class_colors.get(name, default_color) for name in legend]
+        },
+        'box_fields': list(BOX_FIELDS),
+        'box_encoding': box_encoding,
+        'boxes': encoded_boxes,
+        'class_ids': class_ids,
+        'confidences': [det['confidence'] for det in detections]
+    }
+    # Untracked (tentative) boxes never reach the response, so ids are all or nothing
+    if detections and 'track_id' in detections[0]:
+        compact['track_ids'] = [det.get('track_id', -1) for det in detections]
+    return compact
+
+
+def _msgpack_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f'Cannot serialize {type(value).__name__}')
+
+
+def pack(message):
+    """MessagePack bytes of a response dict (requires msgpack)."""
+    return msgpack.packb(message, use_bin_type=True, default=_msgpack_default)
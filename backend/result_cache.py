@@ -0,0 +1,84 @@
+"""
+Content-addressed cache of detection results.
+Byte-identical images submitted again (retries, QA tools) are answered from
+memory instead of being decoded and inferred a second time.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(payload, *settings):
+    """
+    Hash of the encoded image plus every setting that changes the result.
+    BLAKE2b is in the standard library and hashes faster than SHA-256.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode('ascii', 'ignore')
+    digest = hashlib.blake2b(payload, digest_size=16)
+    digest.update(repr(settings).encode())
+    return digest.digest()
+
+
+class ResultCache:
+    """Thread-safe LRU of results with a size bound and per-entry TTL."""
+
+    def __init__(self, max_entries=256, ttl_s=60.0):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()  # key -> (stored_at, value), oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Cached value for key, or None on a miss or expired entry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] > self.ttl_s:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. after the model or thresholds change."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_s': self.ttl_s,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,133 @@
+"""
+Per-stream regions of interest.
+Each stream can have rectangles and polygons (in pixels or as 0-1 fractions
+of the frame). Frames of such a stream are cropped to the regions, pixels
+outside a polygon are masked, the crops run through the model as one batch
+and detections whose center lies outside every region are rejected.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+from geometry import box_centers, points_in_polygon
+
+MASK_VALUE = 114  # Letterbox gray, what the model sees as padding
+
+
+def parse_region(region):
+    """{"rect": [x1, y1, x2, y2]} or {"polygon": [[x, y], ...]} -> (M, 2) polygon."""
+    if not isinstance(region, dict):
+        raise ValueError("Each region must be an object with 'rect' or 'polygon'")
+    if 'rect' in region:
+        rect = np.asarray(region['rect'], dtype=np.float64)
+        if rect.shape != (4,) or rect[2] <= rect[0] or rect[3] <= rect[1]:
+            raise ValueError("'rect' must be [x1, y1, x2, y2] with x2 > x1 and y2 > y1")
+        x1, y1, x2, y2 = rect
+        return np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]]), True
+    if 'polygon' in region:
+        polygon = np.asarray(region['polygon'], dtype=np.float64)
+        if polygon.ndim != 2 or polygon.shape[1] != 2 or len(polygon) < 3:
+            raise ValueError("'polygon' must have at least three [x, y] points")
+        return polygon, False
+    raise ValueError("Each region must have 'rect' or 'polygon'")
+
+
+class RegionSet:
+    """The regions of interest of one stream."""
+
+    def __init__(self, regions, normalized=False, mask=True, padding=0):
+        if not regions:
+            raise ValueError("'regions' must list at least one rect or polygon")
+        parsed = [parse_region(region) for region in regions]
+        self.polygons = [polygon for polygon, _ in parsed]
+        self.is_rect = [is_rect for _, is_rect in parsed]
+        self.regions = regions
+        self.normalized = normalized
+        self.mask = mask
+        self.padding = padding
+        self.signature = repr((regions, normalized, mask, padding))  # Part of the result cache key
+
+    def frame_polygons(self, frame_size):
+        """Polygons in pixel coordinates of a (width, height) frame."""
+        if not self.normalized:
+            return self.polygons
+        scale = np.array(frame_size, dtype=np.float64)
+        return [polygon * scale for polygon in self.polygons]
+
+    def crops(self, image, original_size):
+        """
+        Cut one crop per region from a decoded frame.
+        Returns [(crop, crop_original_size, (offset_x, offset_y))], where
+        crop_original_size and the offset are in original-frame pixels.
+        """
+        height, width = image.shape[:2]
+        scale_x, scale_y = original_size[0] / width, original_size[1] / height
+
+        crops = []
+        for polygon, is_rect in zip(self.frame_polygons(original_size), self.is_rect):
+            # Polygon in decoded-image pixels, bounding box padded and clipped
+            points = polygon / [scale_x, scale_y]
+            x1 = int(max(0, np.floor(points[:, 0].min()) - self.padding))
+            y1 = int(max(0, np.floor(points[:, 1].min()) - self.padding))
+            x2 = int(min(width, np.ceil(points[:, 0].max()) + self.padding))
+            y2 = int(min(height, np.ceil(points[:, 1].max()) + self.padding))
+            if x2 - x1 < 2 or y2 - y1 < 2:
+                continue
+
+            crop = image[y1:y2, x1:x2]
+            if self.mask and not is_rect:
+                outside = np.ones(crop.shape[:2], dtype=np.uint8)
+                cv2.fillPoly(outside, [np.round(points - [x1, y1]).astype(np.int32)], 0)
+                crop = crop.copy()
+                crop[outside.astype(bool)] = MASK_VALUE
+
+            crops.append((crop, ((x2 - x1) * scale_x, (y2 - y1) * scale_y), (x1 * scale_x, y1 * scale_y)))
+        return crops
+
+    def inside(self, boxes, frame_size):
+        """Mask of (N, 4) frame-pixel boxes whose center lies in any region."""
+        centers = box_centers(boxes)
+        keep = np.zeros(len(centers), dtype=bool)
+        for polygon in self.frame_polygons(frame_size):
+            keep |= points_in_polygon(centers, polygon)
+        return keep
+
+    def describe(self):
+        return {
+            'regions': self.regions,
+            'normalized': self.normalized,
+            'mask': self.mask,
+            'padding': self.padding
+        }
+
+
+class RegionRegistry:
+    """One RegionSet per configured stream."""
+
+    def __init__(self):
+        self._regions = {}
+        self._lock = threading.Lock()
+
+    def configure(self, stream_id, **options):
+        regions = RegionSet(**options)
+        with self._lock:
+            self._regions[stream_id] = regions
+        return regions
+
+    def remove(self, stream_id):
+        with self._lock:
+            return self._regions.pop(stream_id, None) is not None
+
+    def get(self, stream_id):
+        if not stream_id:
+            return None
+        return self._regions.get(stream_id)
+
+    def snapshot(self, stream_id=None):
+        with self._lock:
+            entries = dict(self._regions)
+        if stream_id is not None:
+            entries = {stream_id: entries[stream_id]} if stream_id in entries else {}
+        return {sid: regions.describe() for sid, regions in entries.items()}
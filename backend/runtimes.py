@@ -0,0 +1,147 @@
+"""
+Inference runtimes for the detection API.
+Exports best.pt to ONNX or OpenVINO IR on first use, caches the export next
+to the .pt file, and tunes the runtime's CPU thread pool.
+
+All runtimes are loaded through Ultralytics' YOLO class, so letterboxing,
+NMS and box scaling are shared and run_detection() post-processing is the
+same whichever runtime does the forward pass.
+"""
+
+import glob
+import hashlib
+import json
+import os
+
+RUNTIMES = ('pytorch', 'onnx', 'openvino', 'onnx_int8')
+
+
+def export_path(pt_path, runtime):
+    """Where the cached export for a runtime lives."""
+    base = os.path.splitext(pt_path)[0]
+    if runtime == 'onnx':
+        return base + '.onnx'
+    if runtime == 'openvino':
+        return base + '_openvino_model'
+    if runtime == 'onnx_int8':
+        return base + '.int8.onnx'
+    return pt_path
+
+
+def gate_report_path(pt_path):
+    """Accuracy gate report written by quantize_model.py next to the INT8 model."""
+    return os.path.splitext(pt_path)[0] + '.int8.json'
+
+
+def file_sha256(path):
+    """SHA-256 of a model file, used to tie an INT8 model to its source .pt."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def check_int8_gate(pt_path):
+    """
+    Return the INT8 model path if it passed the accuracy gate for this exact
+    best.pt, otherwise raise RuntimeError explaining why it may not be loaded.
+    """
+    model_file = export_path(pt_path, 'onnx_int8')
+    report_file = gate_report_path(pt_path)
+    hint = "Run: python quantize_model.py --calib <images> --val <images>"
+
+    if not os.path.exists(model_file) or not os.path.exists(report_file):
+        raise RuntimeError(f"No quantized model at {model_file}. {hint}")
+
+    with open(report_file) as f:
+        report = json.load(f)
+
+    if report.get('source_sha256') != file_sha256(pt_path):
+        raise RuntimeError(f"INT8 model was built from a different best.pt. {hint}")
+
+    if report.get('int8_sha256') != file_sha256(model_file):
+        raise RuntimeError(f"INT8 model changed since its accuracy gate ran. {hint}")
+
+    if not report.get('passed'):
+        raise RuntimeError(
+            f"INT8 model failed its accuracy gate (recall {report.get('recall')}, "
+            f"mAP50 {report.get('map50')}). {hint}"
+        )
+
+    print(f"✅ INT8 accuracy gate passed (recall {report['recall']:.3f}, mAP50 {report['map50']:.3f})")
+    return model_file
+
+
+def export_model(pt_path, runtime, imgsz):
+    """
+    Return a model file for the runtime, exporting best.pt if there is no
+    cached export or the cached one is older than the .pt file.
+    """
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown inference runtime '{runtime}', expected one of {RUNTIMES}")
+
+    if runtime == 'pytorch':
+        return pt_path
+
+    # INT8 models are produced offline by quantize_model.py, never on startup
+    if runtime == 'onnx_int8':
+        return check_int8_gate(pt_path)
+
+    target = export_path(pt_path, runtime)
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(pt_path):
+        print(f"📦 Using cached {runtime} export: {target}")
+        return target
+
+    from ultralytics import YOLO
+
+    print(f"🔄 Exporting {pt_path} to {runtime} (first run only)...")
+    # Dynamic axes so the micro-batcher can send any batch size
+    exported = YOLO(pt_path).export(format=runtime, imgsz=imgsz, dynamic=True)
+    print(f"✅ Export saved to: {exported}")
+    return str(exported)
+
+
+def tune_threads(model, runtime, model_file, threads):
+    """
+    Apply the intra-op thread count for the runtime.
+    ONNX Runtime and OpenVINO sessions are created by Ultralytics when the
+    predictor is set up, so call this after the first (warmup) inference;
+    the session is then rebuilt with tuned options.
+    """
+    if runtime == 'pytorch':
+        import torch
+        torch.set_num_threads(threads)
+        return
+
+    predictor = getattr(model, 'predictor', None)
+    if predictor is None:
+        raise RuntimeError("Run one warmup inference before tuning runtime threads")
+    autobackend = predictor.model
+
+    if runtime in ('onnx', 'onnx_int8'):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        autobackend.session = onnxruntime.InferenceSession(
+            model_file, options, providers=['CPUExecutionProvider']
+        )
+
+    elif runtime == 'openvino':
+        from openvino.runtime import Core, Layout
+
+        xml_file = model_file
+        if os.path.isdir(model_file):
+            xml_file = glob.glob(os.path.join(model_file, '*.xml'))[0]
+
+        core = Core()
+        ov_model = core.read_model(xml_file)
+        if ov_model.get_parameters()[0].get_layout().empty:
+            ov_model.get_parameters()[0].set_layout(Layout('NCHW'))
+        autobackend.ov_compiled_model = core.compile_model(
+            ov_model, 'CPU', {'INFERENCE_NUM_THREADS': threads, 'PERFORMANCE_HINT': 'LATENCY'}
+        )
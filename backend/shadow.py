@@ -0,0 +1,309 @@
+"""
+Shadow inference for candidate models.
+A sampled fraction of live frames is also run through a candidate model and
+its detections are compared with what the serving model returned. The
+candidate lives in its own low-priority process with a single inference
+thread, fed one frame at a time and only while the primary path is idle,
+so shadow work never competes with a response for CPU.
+"""
+
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from tracking import detections_to_arrays, greedy_match, iou_matrix
+
+COUNT_DELTA_CLIP = 5  # Box count deltas beyond +-5 share one histogram bucket
+
+
+def compare_detections(primary, shadow, iou_threshold=0.5):
+    """
+    Class-agnostic IoU matching of the serving model's detections against
+    the candidate's. Matched pairs are (primary class, shadow class,
+    shadow confidence - primary confidence).
+    """
+    boxes_a, conf_a, cls_a = detections_to_arrays(primary)
+    boxes_b, conf_b, cls_b = detections_to_arrays(shadow)
+    pairs = greedy_match(iou_matrix(boxes_a, boxes_b), np.arange(len(primary)), np.arange(len(shadow)), iou_threshold)
+    return {
+        'count_delta': len(shadow) - len(primary),
+        'matched': [(cls_a[i], cls_b[j], float(conf_b[j] - conf_a[i])) for i, j in pairs],
+        'missed': len(primary) - len(pairs),  # Boxes only the serving model found
+        'extra': len(shadow) - len(pairs)     # Boxes only the candidate found
+    }
+
+
+def _shadow_main(path, name, threads, nice, job_queue, result_queue):
+    """Shadow process: build and warm the candidate, then detect one frame per job."""
+    # app reads these at import time
+    os.environ['INFERENCE_THREADS'] = str(threads)
+    os.environ['INFERENCE_WORKERS'] = '0'
+    if hasattr(os, 'nice'):
+        os.nice(nice)
+    import app as detection
+
+    try:
+        candidate = detection.build_model(path)
+        version = detection.model_version_for(path, name)
+    except Exception as e:
+        result_queue.put(('error', str(e)))
+        return
+    result_queue.put(('ready', version))
+
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        job_id, image, original_size, settings = job
+        detection.CONFIDENCE_THRESHOLD, detection.IOU_THRESHOLD, detection.INPUT_SIZE = settings
+        result_queue.put((job_id, *detection.run_detection_batch([image], [original_size], use_model=candidate)[0]))
+
+
+class ShadowProcess:
+    """Parent-side handle of the candidate's process."""
+
+    def __init__(self, path, name, threads=1, nice=10):
+        self.path = path
+        self.name = name
+        self.threads = threads
+        self.nice = nice
+        self._ctx = mp.get_context('spawn')  # Fork is unsafe with torch thread pools
+        self._jobs = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._job_ids = itertools.count()
+        self.process = None
+
+    def start(self, keep_waiting, timeout=600.0):
+        """Spawn the process and wait until the candidate is warm; returns its version."""
+        self.process = self._ctx.Process(
+            target=_shadow_main,
+            args=(self.path, self.name, self.threads, self.nice, self._jobs, self._results),
+            name='shadow-candidate',
+            daemon=True
+        )
+        self.process.start()
+
+        deadline = time.monotonic() + timeout
+        while keep_waiting() and self.process.is_alive() and time.monotonic() < deadline:
+            try:
+                status, detail = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if status == 'error':
+                raise RuntimeError(detail)
+            return detail
+        raise RuntimeError('Candidate process exited or timed out while loading')
+
+    def detect(self, image, original_size, settings, timeout=60.0):
+        """
+        (detections, error) for one frame. Answers to earlier frames that
+        timed out arrive late and are skipped, not taken for this frame's.
+        """
+        job_id = next(self._job_ids)
+        self._jobs.put((job_id, image, original_size, settings))
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                answer_id, detections, error = self._results.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                return None, 'Shadow process did not answer'
+            if answer_id == job_id:
+                return detections, error
+
+    def stop(self, timeout=5.0):
+        if self.process is None:
+            return
+        self._jobs.put(None)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class ShadowRunner:
+    """Bounded queue of sampled frames for one candidate model, built in the background."""
+
+    def __init__(self, path, name, sample_rate=0.1, queue_size=16, iou_threshold=0.5,
+                 busy=None, settings=None, threads=1, nice=10):
+        self.version = name               # Replaced by name@runtime:hash once loaded
+        self.sample_rate = sample_rate
+        self.iou_threshold = iou_threshold
+        self.busy = busy                  # Shed frames while this returns True
+        self.settings = settings          # () -> (confidence, iou, input_size) the primary used
+        self.state = 'loading'            # 'loading', 'running' or 'failed'
+        self.error = None
+        self._process = ShadowProcess(path, name, threads, nice)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self.started = time.time()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.offered = 0
+            self.sampled = 0
+            self.dropped_full = 0
+            self.dropped_busy = 0
+            self.frames = 0
+            self.errors = 0
+            self.count_delta_sum = 0
+            self.count_delta_abs_sum = 0
+            self.count_deltas = {}
+            self.primary_boxes = 0
+            self.shadow_boxes = 0
+            self.matched = 0
+            self.missed = 0
+            self.extra = 0
+            self.class_flips = {}
+            self.drift_sum = 0.0
+            self.drift_abs_sum = 0.0
+            self.drift_by_class = {}
+            self.latencies_ms = deque(maxlen=500)
+
+    def start(self):
+        """Load the candidate and start comparing, both on a background thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='shadow-inference', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        self._process.stop()
+
+    def offer(self, image, original_size, primary_detections):
+        """Queue a frame for the candidate if it is sampled and there is room. Never blocks."""
+        if self.state != 'running':
+            return False
+        with self._lock:
+            self.offered += 1
+        if random.random() >= self.sample_rate:
+            return False
+
+        with self._lock:
+            self.sampled += 1
+            if self.busy is not None and self.busy():
+                self.dropped_busy += 1
+                return False
+        settings = self.settings() if self.settings is not None else None
+        try:
+            self._queue.put_nowait((image, original_size, primary_detections, settings))
+        except queue.Full:
+            with self._lock:
+                self.dropped_full += 1
+            return False
+        return True
+
+    def _run(self):
+        try:
+            self.version = self._process.start(keep_waiting=lambda: self._running)
+        except Exception as e:
+            self.state, self.error = 'failed', str(e)
+            print(f"❌ Shadow candidate failed to load: {e}")
+            return
+        self.started = time.time()
+        self.state = 'running'
+        print(f"👥 Shadowing {self.version} on {self.sample_rate:.0%} of frames")
+
+        while self._running:
+            try:
+                image, original_size, primary, settings = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            # The primary may have become busy since the frame was queued
+            if self.busy is not None and self.busy():
+                with self._lock:
+                    self.dropped_busy += 1
+                continue
+
+            start = time.perf_counter()
+            detections, error = self._process.detect(image, original_size, settings)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            with self._lock:
+                self.latencies_ms.append(elapsed_ms)
+                if error:
+                    self.errors += 1
+                else:
+                    self._record(primary, detections)
+
+    def _record(self, primary, detections):
+        comparison = compare_detections(primary, detections, self.iou_threshold)
+        delta = comparison['count_delta']
+        bucket = max(-COUNT_DELTA_CLIP, min(COUNT_DELTA_CLIP, delta))
+
+        self.frames += 1
+        self.count_delta_sum += delta
+        self.count_delta_abs_sum += abs(delta)
+        self.count_deltas[bucket] = self.count_deltas.get(bucket, 0) + 1
+        self.primary_boxes += len(primary)
+        self.shadow_boxes += len(detections)
+        self.matched += len(comparison['matched'])
+        self.missed += comparison['missed']
+        self.extra += comparison['extra']
+
+        for primary_class, shadow_class, drift in comparison['matched']:
+            if primary_class != shadow_class:
+                flip = f'{primary_class}->{shadow_class}'
+                self.class_flips[flip] = self.class_flips.get(flip, 0) + 1
+            self.drift_sum += drift
+            self.drift_abs_sum += abs(drift)
+            total, count = self.drift_by_class.get(primary_class, (0.0, 0))
+            self.drift_by_class[primary_class] = (total + drift, count + 1)
+
+    def stats(self):
+        """Disagreement statistics for GET /shadow."""
+        with self._lock:
+            latencies = list(self.latencies_ms)
+            flips = sum(self.class_flips.values())
+            return {
+                'candidate_version': self.version,
+                'state': self.state,
+                'error': self.error,
+                'sample_rate': self.sample_rate,
+                'running_s': round(time.time() - self.started, 1),
+                'frames': {
+                    'offered': self.offered,
+                    'sampled': self.sampled,
+                    'compared': self.frames,
+                    'dropped_queue_full': self.dropped_full,
+                    'dropped_busy': self.dropped_busy,
+                    'errors': self.errors,
+                    'queue_depth': self._queue.qsize()
+                },
+                'box_count': {
+                    'primary': self.primary_boxes,
+                    'shadow': self.shadow_boxes,
+                    'mean_delta': round(self.count_delta_sum / self.frames, 3) if self.frames else 0.0,
+                    'mean_abs_delta': round(self.count_delta_abs_sum / self.frames, 3) if self.frames else 0.0,
+                    'delta_histogram': {str(k): v for k, v in sorted(self.count_deltas.items())}
+                },
+                'matching': {
+                    'iou_threshold': self.iou_threshold,
+                    'matched': self.matched,
+                    'missed_by_shadow': self.missed,
+                    'extra_in_shadow': self.extra,
+                    'agreement': round(self.matched / max(1, self.matched + self.missed + self.extra), 4)
+                },
+                'class_flips': {
+                    'total': flips,
+                    'ratio': round(flips / self.matched, 4) if self.matched else 0.0,
+                    'by_pair': dict(self.class_flips)
+                },
+                'confidence_drift': {
+                    'mean': round(self.drift_sum / self.matched, 4) if self.matched else 0.0,
+                    'mean_abs': round(self.drift_abs_sum / self.matched, 4) if self.matched else 0.0,
+                    'by_class': {name: round(total / count, 4) for name, (total, count) in self.drift_by_class.items()}
+                },
+                'avg_frame_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0.0
+            }
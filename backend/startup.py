@@ -0,0 +1,63 @@
+"""
+Startup phase timing for the detection API.
+Records how long imports, model loading, warmup and background services take,
+so cold starts of new instances can be measured and cut down.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """Ordered phase durations plus the phase that is running right now."""
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.finished = None
+        self.current = None
+        self._phases = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._phases[name] = self._phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time the enclosed block as phase name (repeated phases add up).
+        Once finish() was called, e.g. for a later model swap, nothing is recorded.
+        """
+        if self.finished is not None:
+            yield
+            return
+
+        self.current = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+            self.current = None
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def report(self):
+        with self._lock:
+            phases = dict(self._phases)
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return {
+            'done': self.finished is not None,
+            'phase': self.current,
+            'phases_ms': {name: round(seconds * 1000, 1) for name, seconds in phases.items()},
+            'total_ms': round((end - self.started) * 1000, 1)
+        }
+
+    def print_report(self):
+        report = self.report()
+        print("⏱️  Startup time by phase:")
+        for name, ms in report['phases_ms'].items():
+            print(f"   {name:<14} {ms:>9.1f} ms")
+        print(f"   {'total':<14} {report['total_ms']:>9.1f} ms")
@@ -0,0 +1,75 @@
+"""
+Per-stream state keyed by stream id, shared by the tracker, motion gate and
+renderer registries. Streams that have not been seen for idle_timeout_s are
+evicted, and the least recently seen one makes room once max_streams is hit.
+"""
+
+import threading
+import time
+
+
+class StreamRegistry:
+    """Thread-safe map of stream id -> state built by factory(stream_id) on first use."""
+
+    def __init__(self, factory, idle_timeout_s=300, max_streams=256, on_evict=None):
+        self.factory = factory
+        self.idle_timeout_s = idle_timeout_s
+        self.max_streams = max_streams
+        self.on_evict = on_evict  # Called with each evicted or removed value, e.g. to stop its thread
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def get(self, stream_id, create=True):
+        """The stream's state, created if needed (or None when create is False); marks it seen."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._streams.get(stream_id)
+            if entry is None:
+                if not create:
+                    return None
+                self._evict(now)
+                entry = {'value': self.factory(stream_id)}
+                self._streams[stream_id] = entry
+            entry['last_seen'] = now
+            return entry['value']
+
+    def peek(self, stream_id):
+        """The stream's state without creating it or marking it seen."""
+        with self._lock:
+            entry = self._streams.get(stream_id)
+            return entry['value'] if entry is not None else None
+
+    def _evict(self, now):
+        """Drop idle streams, then the least recently seen if still full."""
+        self._evict_idle(now)
+        while len(self._streams) >= self.max_streams:
+            self._drop(min(self._streams, key=lambda s: self._streams[s]['last_seen']))
+
+    def _evict_idle(self, now):
+        for stream_id in [s for s, e in self._streams.items() if now - e['last_seen'] > self.idle_timeout_s]:
+            self._drop(stream_id)
+
+    def _drop(self, stream_id):
+        entry = self._streams.pop(stream_id)
+        if self.on_evict is not None:
+            self.on_evict(entry['value'])
+
+    def evict_idle(self):
+        """Evict idle streams now, without waiting for a new stream to arrive."""
+        with self._lock:
+            self._evict_idle(time.monotonic())
+
+    def remove(self, stream_id=None):
+        """Forget one stream, or every stream."""
+        with self._lock:
+            for sid in list(self._streams) if stream_id is None else [stream_id]:
+                if sid in self._streams:
+                    self._drop(sid)
+
+    def items(self):
+        with self._lock:
+            return [(stream_id, entry['value']) for stream_id, entry in self._streams.items()]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._streams)
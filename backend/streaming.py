@@ -0,0 +1,106 @@
+"""
+WebSocket streaming helpers for continuous camera feeds.
+Clients push binary frames (4-byte big-endian frame id + JPEG bytes) and the
+server pushes back detection messages tagged with that frame id. If inference
+falls behind, only the newest frame is kept (latest-frame-wins).
+"""
+
+import json
+import struct
+import threading
+
+FRAME_HEADER = struct.Struct('>I')
+
+
+def parse_frame_message(message):
+    """Split a binary stream message into (frame_id, jpeg_bytes)."""
+    if not isinstance(message, (bytes, bytearray)) or len(message) <= FRAME_HEADER.size:
+        return None, None
+    (frame_id,) = FRAME_HEADER.unpack_from(message)
+    return frame_id, memoryview(message)[FRAME_HEADER.size:]
+
+
+class LatestFrameSlot:
+    """Single-slot mailbox: a new frame replaces any frame not yet taken."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame = None
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame_id, payload):
+        with self._condition:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = (frame_id, payload)
+            self.received += 1
+            self._condition.notify()
+
+    def take(self):
+        """Block until a frame is available; returns None once closed."""
+        with self._condition:
+            while self._frame is None and not self._closed:
+                self._condition.wait()
+            frame, self._frame = self._frame, None
+            return frame
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+def serve_stream(ws, process_frame):
+    """
+    Run one WebSocket connection until the client disconnects.
+    process_frame(frame_id, jpeg_bytes) returns the dict sent back to the
+    client; it runs on a separate thread so receiving never blocks on
+    inference and stale frames can be dropped.
+    """
+    slot = LatestFrameSlot()
+
+    def worker():
+        while True:
+            frame = slot.take()
+            if frame is None:
+                return
+            frame_id, payload = frame
+            try:
+                message = process_frame(frame_id, payload)
+                message['frames_received'] = slot.received
+                message['frames_dropped'] = slot.dropped
+                text = json.dumps(message)
+            except Exception as e:
+                # Answer the frame so the client does not wait on it forever
+                text = json.dumps({'type': 'error', 'frame_id': frame_id, 'error': f'Frame failed: {e}'})
+            try:
+                ws.send(text)
+            except Exception:
+                # Without a sender, frames would be received but never answered
+                try:
+                    ws.close()
+                except Exception:
+                    pass
+                return
+
+    sender = threading.Thread(target=worker, name='stream-worker', daemon=True)
+    sender.start()
+
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+            frame_id, payload = parse_frame_message(message)
+            if frame_id is None:
+                ws.send(json.dumps({
+                    'type': 'error',
+                    'error': 'Expected binary message: 4-byte frame id + JPEG bytes'
+                }))
+                continue
+            slot.put(frame_id, payload)
+    finally:
+        slot.close()
+        sender.join(timeout=5.0)
@@ -0,0 +1,89 @@
+"""
+Tiled (sliced) inference helpers for high-resolution images.
+The frame is split into overlapping tiles that are detected as one batch;
+tile boxes are shifted back to frame coordinates and duplicates from the
+overlaps are merged with a class-aware NMS or weighted box fusion step.
+"""
+
+import numpy as np
+
+from tracking import iou_matrix
+
+MERGE_METHODS = ('nms', 'wbf')
+
+
+def tile_starts(length, tile, overlap_px):
+    """Start offsets along one axis, spread so the last tile ends at the border."""
+    if length <= tile:
+        return [0]
+    stride = max(1, tile - overlap_px)
+    count = int(np.ceil((length - tile) / stride)) + 1
+    return np.linspace(0, length - tile, count).round().astype(int).tolist()
+
+
+def tile_grid(width, height, tile_size, overlap, max_tiles):
+    """
+    Overlapping (x, y, w, h) tiles covering a width x height frame.
+    The tile size grows until the grid has at most max_tiles tiles, so very
+    large frames cost a bounded number of forward passes.
+    """
+    size = tile_size
+    while True:
+        xs = tile_starts(width, size, int(size * overlap))
+        ys = tile_starts(height, size, int(size * overlap))
+        if len(xs) * len(ys) <= max(1, max_tiles):
+            break
+        size = int(size * 1.25) + 1
+    tile_w, tile_h = min(size, width), min(size, height)
+    return [(x, y, tile_w, tile_h) for y in ys for x in xs]
+
+
+def interior_edge_mask(boxes, tile, frame_size, margin=2.0):
+    """
+    True for (N, 4) tile-local boxes touching a tile edge that is not also a
+    frame edge. Such boxes are usually objects cut by the tile border; the
+    overlapping neighbour tile or the full-frame pass sees them whole.
+    """
+    x, y, w, h = tile
+    width, height = frame_size
+    touches = np.zeros(len(boxes), dtype=bool)
+    if x > 0:
+        touches |= boxes[:, 0] <= margin
+    if y > 0:
+        touches |= boxes[:, 1] <= margin
+    if x + w < width:
+        touches |= boxes[:, 2] >= w - margin
+    if y + h < height:
+        touches |= boxes[:, 3] >= h - margin
+    return touches
+
+
+def merge_boxes(boxes, scores, labels, iou_threshold=0.5, method='wbf'):
+    """
+    Greedy class-aware merge of overlapping boxes, highest score first.
+    'nms' keeps the best box of each cluster, 'wbf' replaces it with the
+    score-weighted average of the cluster. Returns (kept indices, boxes).
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4))
+
+    overlaps = iou_matrix(boxes, boxes) >= iou_threshold
+    overlaps &= labels[:, None] == labels[None, :]
+
+    merged = np.zeros(len(boxes), dtype=bool)
+    keep = []
+    fused = []
+    for index in np.argsort(-scores, kind='stable'):
+        if merged[index]:
+            continue
+        cluster = overlaps[index] & ~merged
+        cluster[index] = True
+        merged |= cluster
+        keep.append(index)
+        if method == 'wbf':
+            weights = scores[cluster]
+            fused.append((boxes[cluster] * weights[:, None]).sum(axis=0) / weights.sum())
+        else:
+            fused.append(boxes[index])
+
+    return np.array(keep, dtype=np.int64), np.array(fused).reshape(-1, 4)
@@ -0,0 +1,202 @@
+"""
+Server-side multi-object tracking for the detection API.
+IoU association in the style of ByteTrack: high-confidence detections are
+matched to tracks first, then low-confidence ones extend the leftover tracks.
+Tracks get persistent IDs and are only reported once confirmed.
+"""
+
+import threading
+
+import numpy as np
+
+from stream_registry import StreamRegistry
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy arrays."""
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = np.clip(boxes_a[:, 2:] - boxes_a[:, :2], 0, None).prod(axis=1)
+    area_b = np.clip(boxes_b[:, 2:] - boxes_b[:, :2], 0, None).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def greedy_match(cost, rows, cols, threshold):
+    """
+    Greedily pair rows with cols by descending score in cost[rows][:, cols].
+    Returns a list of (row, col) pairs with score >= threshold.
+    """
+    if len(rows) == 0 or len(cols) == 0:
+        return []
+
+    scores = cost[np.ix_(rows, cols)]
+    flat_order = np.argsort(-scores, axis=None)
+    candidates = np.column_stack(np.unravel_index(flat_order, scores.shape))
+
+    pairs = []
+    used_rows = set()
+    used_cols = set()
+    for r, c in candidates:
+        if scores[r, c] < threshold:
+            break
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        pairs.append((rows[r], cols[c]))
+    return pairs
+
+
+def detections_to_arrays(detections):
+    """API detection dicts -> (boxes, confidences, class names) arrays."""
+    boxes = np.array(
+        [[d['bbox']['x1'], d['bbox']['y1'], d['bbox']['x2'], d['bbox']['y2']] for d in detections],
+        dtype=np.float64
+    ).reshape(-1, 4)
+    confidences = np.array([d['confidence'] for d in detections], dtype=np.float64)
+    classes = np.array([d['class'] for d in detections], dtype=object)
+    return boxes, confidences, classes
+
+
+class StreamTracker:
+    """IoU tracker for one camera stream with constant-velocity prediction."""
+
+    def __init__(self, min_hits=2, max_age=5, iou_threshold=0.3, high_confidence=0.5):
+        self.min_hits = min_hits
+        self.max_age = max_age
+        self.iou_threshold = iou_threshold
+        self.high_confidence = high_confidence
+
+        self.boxes = np.zeros((0, 4))
+        self.velocity = np.zeros((0, 4))
+        self.classes = np.zeros(0, dtype=object)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.misses = np.zeros(0, dtype=np.int64)
+        self._next_id = 1
+        self.frames = 0
+
+    def update(self, detections):
+        """
+        Associate a frame's detections with tracks.
+        Returns (confirmed detections with 'track_id', number of tentative ones).
+        """
+        self.frames += 1
+        det_boxes, det_conf, det_classes = detections_to_arrays(detections)
+
+        # Predict where each track moved to since the last frame
+        predicted = self.boxes + self.velocity
+
+        # Cost matrix: IoU, zeroed where classes differ
+        cost = iou_matrix(predicted, det_boxes)
+        cost[self.classes[:, None] != det_classes[None, :]] = 0.0
+
+        all_tracks = np.arange(len(self.ids))
+        high = np.flatnonzero(det_conf >= self.high_confidence)
+        low = np.flatnonzero(det_conf < self.high_confidence)
+
+        # Stage 1: high-confidence detections against every track
+        matches = greedy_match(cost, all_tracks, high, self.iou_threshold)
+        matched_tracks = {t for t, _ in matches}
+
+        # Stage 2: low-confidence detections only extend leftover tracks
+        leftover = np.array([t for t in all_tracks if t not in matched_tracks], dtype=np.int64)
+        matches += greedy_match(cost, leftover, low, self.iou_threshold)
+
+        track_for_det = np.full(len(detections), -1, dtype=np.int64)
+        if matches:
+            track_idx, det_idx = map(np.array, zip(*matches))
+            self.velocity[track_idx] = 0.5 * self.velocity[track_idx] + 0.5 * (det_boxes[det_idx] - self.boxes[track_idx])
+            self.boxes[track_idx] = det_boxes[det_idx]
+            self.hits[track_idx] += 1
+            self.misses[track_idx] = -1  # Reset to 0 below
+            track_for_det[det_idx] = track_idx
+
+        # Unmatched tracks coast along their predicted path
+        self.misses += 1
+        coasting = self.misses > 0
+        self.boxes[coasting] = predicted[coasting]
+
+        # New tentative tracks from unmatched high-confidence detections
+        new_dets = np.array([d for d in high if track_for_det[d] < 0], dtype=np.int64)
+        if len(new_dets):
+            first = len(self.ids)
+            count = len(new_dets)
+            self.boxes = np.vstack([self.boxes, det_boxes[new_dets]])
+            self.velocity = np.vstack([self.velocity, np.zeros((count, 4))])
+            self.classes = np.concatenate([self.classes, det_classes[new_dets]])
+            self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + count)])
+            self.hits = np.concatenate([self.hits, np.ones(count, dtype=np.int64)])
+            self.misses = np.concatenate([self.misses, np.zeros(count, dtype=np.int64)])
+            track_for_det[new_dets] = np.arange(first, first + count)
+            self._next_id += count
+
+        # Report detections on confirmed tracks, in the original order
+        confirmed = []
+        tentative = 0
+        for det, track in zip(detections, track_for_det.tolist()):
+            if track < 0:
+                continue
+            if self.hits[track] >= self.min_hits:
+                confirmed.append({**det, 'track_id': int(self.ids[track])})
+            else:
+                tentative += 1
+
+        # Drop tracks that have been missing for too long
+        alive = self.misses <= self.max_age
+        if not alive.all():
+            self.boxes = self.boxes[alive]
+            self.velocity = self.velocity[alive]
+            self.classes = self.classes[alive]
+            self.ids = self.ids[alive]
+            self.hits = self.hits[alive]
+            self.misses = self.misses[alive]
+
+        return confirmed, tentative
+
+    def active_tracks(self):
+        """Number of confirmed tracks currently alive."""
+        return int((self.hits >= self.min_hits).sum())
+
+
+class TrackerRegistry:
+    """
+    One StreamTracker per stream id, evicting streams that go idle.
+    on_reset(stream_id) is called whenever a stream's tracker is dropped
+    (reset or evicted); its next tracker starts again at track id 1.
+    """
+
+    def __init__(self, idle_timeout_s=300, max_streams=256, on_reset=None, **tracker_options):
+        self.on_reset = on_reset
+        self._streams = StreamRegistry(
+            lambda stream_id: {'stream_id': stream_id, 'tracker': StreamTracker(**tracker_options), 'lock': threading.Lock()},
+            idle_timeout_s=idle_timeout_s,
+            max_streams=max_streams,
+            on_evict=self._dropped
+        )
+
+    def _dropped(self, entry):
+        if self.on_reset is not None:
+            self.on_reset(entry['stream_id'])
+
+    def update(self, stream_id, detections):
+        """Track one frame for a stream; returns (detections, tracking summary)."""
+        entry = self._streams.get(stream_id)
+        with entry['lock']:
+            tracker = entry['tracker']
+            confirmed, tentative = tracker.update(detections)
+            summary = {
+                'stream_id': stream_id,
+                'active_tracks': tracker.active_tracks(),
+                'tentative': tentative,
+                'frame': tracker.frames
+            }
+        return confirmed, summary
+
+    def reset(self, stream_id=None):
+        """Forget one stream's tracks, or every stream's."""
+        self._streams.remove(stream_id)
+
+    def stream_count(self):
+        return len(self._streams)
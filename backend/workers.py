@@ -0,0 +1,361 @@
+"""
+Multi-process inference worker pool for the detection API.
+Each worker process holds its own model, is pinned to its own core set, and
+receives decoded frames through a shared-memory ring of frame slots instead
+of pickled arrays. Only small job descriptors travel over the queues.
+"""
+
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+
+def split_cores(num_workers):
+    """Split the cores this process may use into one contiguous set per worker."""
+    if hasattr(os, 'sched_getaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+
+    per_worker = max(1, len(cores) // num_workers)
+    return [
+        cores[(i * per_worker) % len(cores):(i * per_worker) % len(cores) + per_worker]
+        for i in range(num_workers)
+    ]
+
+
+def _worker_main(worker_id, shm_name, slot_bytes, cores, max_batch_size, job_queue, result_queue):
+    """Worker process: load the model once, then serve frames from shared memory."""
+    if cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+
+    # app reads these at import time
+    os.environ['INFERENCE_THREADS'] = str(max(1, len(cores)))
+    os.environ['INFERENCE_WORKERS'] = '0'
+    import app as detection
+
+    ready = detection.load_model()
+    result_queue.put(('ready', worker_id, ready, os.getpid(), detection.model_version))
+
+    shm = SharedMemory(name=shm_name)
+    staged = None  # (model, device, version) loaded by a 'load' command, awaiting 'commit'
+    try:
+        while True:
+            job = job_queue.get()
+            if job is None:
+                break
+
+            # Drain frames that are already waiting into the same forward pass;
+            # a model command ends the batch and runs right after it
+            jobs = [job] if 'command' not in job else []
+            command = job if 'command' in job else None
+            while command is None and len(jobs) < max_batch_size:
+                try:
+                    extra = job_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if extra is None:
+                    job_queue.put(None)
+                    break
+                if 'command' in extra:
+                    command = extra
+                    break
+                jobs.append(extra)
+
+            # Frames submitted under different /config settings run separately
+            jobs.sort(key=lambda j: j['settings'])
+            for settings, group in itertools.groupby(jobs, key=lambda j: j['settings']):
+                group = list(group)
+                detection.CONFIDENCE_THRESHOLD, detection.IOU_THRESHOLD, detection.INPUT_SIZE = settings
+
+                images = [
+                    np.ndarray(j['shape'], dtype=np.uint8, buffer=shm.buf, offset=j['slot'] * slot_bytes)
+                    for j in group
+                ]
+                timings = [{} for _ in group]
+                started = time.perf_counter()
+                results = detection.run_detection_batch(images, [j['original_size'] for j in group], timings)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+
+                # Drop the views before the parent reuses the slots
+                del images
+                for j, (detections, error), job_timings in zip(group, results, timings):
+                    result_queue.put(('result', worker_id, j['job_id'], detections, error, elapsed_ms, job_timings))
+
+            if command is not None:
+                ok, staged = _run_model_command(detection, command, staged)
+                result_queue.put(('command', worker_id, ok, detection.model_version))
+    finally:
+        shm.close()
+
+
+def _run_model_command(detection, command, staged):
+    """
+    Model swap step inside a worker: 'load' builds and warms a model next to
+    the serving one, 'commit' or 'discard' finish a load, 'rollback' swaps
+    the previous model back in. Returns (ok, staged).
+    """
+    name = command['command']
+    try:
+        if name == 'load':
+            candidate, device = detection.build_model(command['path'])
+            return True, (candidate, device, detection.model_version_for(command['path'], command['name']))
+        if name == 'commit' and staged is not None:
+            detection.publish_model(*staged)
+            return True, None
+        if name == 'discard':
+            return True, None
+        if name == 'rollback':
+            return detection.rollback_model(), staged
+    except Exception as e:
+        print(f"❌ Model command '{name}' failed: {e}")
+    return False, staged
+
+
+class _Worker:
+    """Parent-side bookkeeping for one worker process and its frame slots."""
+
+    def __init__(self, worker_id, slots, slot_bytes, cores):
+        self.worker_id = worker_id
+        self.cores = cores
+        self.slot_bytes = slot_bytes
+        self.shm = SharedMemory(create=True, size=slots * slot_bytes)
+        self.job_queue = None
+        self.process = None
+        self.pid = None
+        self.ready = False
+        self.free_slots = deque(range(slots))
+        self.slot_available = threading.Semaphore(slots)
+        self.pending = {}
+        self.processed = 0
+        self.errors = 0
+        self.latencies_ms = deque(maxlen=200)
+        self.model_version = None
+        self.swapping = False  # Running a model command; new frames go to other workers
+        self.command_ok = False
+        self.command_done = threading.Event()
+
+
+class WorkerPool:
+    """Dispatch frames to N inference worker processes through shared memory."""
+
+    def __init__(self, num_workers, slots_per_worker=4, max_frame_shape=(1080, 1920, 3), max_batch_size=8):
+        self.num_workers = num_workers
+        self.slots_per_worker = slots_per_worker
+        self.slot_bytes = int(np.prod(max_frame_shape))
+        self.max_batch_size = max_batch_size
+
+        self._ctx = mp.get_context('spawn')  # Fork is unsafe with torch thread pools
+        self._result_queue = self._ctx.Queue()
+        self._workers = []
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._collector = None
+        self._running = False
+
+    def start(self, ready_timeout=300.0):
+        """Spawn the workers and wait until each has loaded its model."""
+        for worker_id, cores in enumerate(split_cores(self.num_workers)):
+            worker = _Worker(worker_id, self.slots_per_worker, self.slot_bytes, cores)
+            worker.job_queue = self._ctx.Queue()
+            worker.process = self._ctx.Process(
+                target=_worker_main,
+                args=(worker_id, worker.shm.name, self.slot_bytes, cores,
+                      self.max_batch_size, worker.job_queue, self._result_queue),
+                name=f'inference-worker-{worker_id}',
+                daemon=True
+            )
+            worker.process.start()
+            self._workers.append(worker)
+
+        self._running = True
+        deadline = time.monotonic() + ready_timeout
+        waiting = len(self._workers)
+        while waiting and time.monotonic() < deadline:
+            try:
+                message = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if message[0] == 'ready':
+                _, worker_id, ready, pid, version = message
+                self._workers[worker_id].ready = ready
+                self._workers[worker_id].pid = pid
+                self._workers[worker_id].model_version = version
+                waiting -= 1
+
+        self._collector = threading.Thread(target=self._collect, name='worker-results', daemon=True)
+        self._collector.start()
+        return self.ready_count()
+
+    def ready_count(self):
+        """Live workers that have loaded their model."""
+        return sum(1 for w in self._workers if w.ready and w.process.is_alive())
+
+    def stop(self, timeout=10.0):
+        """Stop workers, fail anything still pending and release shared memory."""
+        self._running = False
+        for worker in self._workers:
+            worker.job_queue.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            self._fail_pending(worker, 'Worker pool stopped')
+            worker.shm.close()
+            worker.shm.unlink()
+        self._workers = []
+
+    def fits(self, image):
+        """Whether a frame fits in one shared-memory slot."""
+        return image.dtype == np.uint8 and image.nbytes <= self.slot_bytes
+
+    def submit(self, image, original_size, settings, timings=None):
+        """
+        Copy a frame into a free slot of the least-loaded worker and queue it.
+        settings is (confidence, iou, input_size) at submit time; the
+        worker's stage durations are added to the timings dict if given.
+        Returns a Future resolving to (detections, error).
+        """
+        worker = self._pick_worker()
+        if worker is None:
+            future = Future()
+            future.set_result((None, 'No inference workers available'))
+            return future
+
+        worker.slot_available.acquire()
+        with self._lock:
+            slot = worker.free_slots.popleft()
+
+        offset = slot * self.slot_bytes
+        view = np.ndarray(image.shape, dtype=np.uint8, buffer=worker.shm.buf, offset=offset)
+        view[...] = image
+        del view
+
+        future = Future()
+        job_id = next(self._job_ids)
+        with self._lock:
+            worker.pending[job_id] = (future, slot, timings)
+
+        worker.job_queue.put({
+            'job_id': job_id,
+            'slot': slot,
+            'shape': image.shape,
+            'original_size': original_size,
+            'settings': tuple(settings)
+        })
+        return future
+
+    def run_command(self, command, worker_ids=None, timeout=600.0):
+        """
+        Send a model command (see _run_model_command) to the workers one at a
+        time and wait for each. Frames already queued to a worker finish
+        before its command runs. Returns [(worker_id, ok, model_version)].
+        """
+        results = []
+        for worker in self._workers:
+            if worker_ids is not None and worker.worker_id not in worker_ids:
+                continue
+            if not worker.process.is_alive():
+                results.append((worker.worker_id, False, worker.model_version))
+                continue
+
+            worker.command_done.clear()
+            worker.swapping = True
+            worker.job_queue.put(command)
+            done = worker.command_done.wait(timeout)
+            worker.swapping = False
+            results.append((worker.worker_id, done and worker.command_ok, worker.model_version))
+        return results
+
+    def _pick_worker(self):
+        with self._lock:
+            alive = [w for w in self._workers if w.ready and w.process.is_alive()]
+            if not alive:
+                return None
+            # A worker busy with a model command only gets frames if it is the last one
+            candidates = [w for w in alive if not w.swapping] or alive
+            return min(candidates, key=lambda w: len(w.pending))
+
+    def _release(self, worker, job_id, job_timings=None):
+        with self._lock:
+            future, slot, timings = worker.pending.pop(job_id)
+            worker.free_slots.append(slot)
+        worker.slot_available.release()
+        if timings is not None and job_timings:
+            for stage, seconds in job_timings.items():
+                timings[stage] = timings.get(stage, 0.0) + seconds
+        return future
+
+    def _fail_pending(self, worker, error):
+        for job_id in list(worker.pending):
+            self._release(worker, job_id).set_result((None, error))
+
+    def _collect(self):
+        """Resolve futures from worker results and watch for dead workers."""
+        while self._running:
+            try:
+                message = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                for worker in self._workers:
+                    if worker.pending and not worker.process.is_alive():
+                        worker.ready = False
+                        self._fail_pending(worker, f'Inference worker {worker.worker_id} died')
+                continue
+
+            if message[0] == 'ready':
+                # A worker that loaded its model after start() stopped waiting
+                _, worker_id, ready, pid, version = message
+                self._workers[worker_id].ready = ready
+                self._workers[worker_id].pid = pid
+                self._workers[worker_id].model_version = version
+                continue
+
+            if message[0] == 'command':
+                _, worker_id, ok, version = message
+                worker = self._workers[worker_id]
+                worker.command_ok = ok
+                worker.model_version = version
+                worker.command_done.set()
+                continue
+
+            _, worker_id, job_id, detections, error, elapsed_ms, job_timings = message
+            worker = self._workers[worker_id]
+            worker.processed += 1
+            worker.latencies_ms.append(elapsed_ms)
+            if error:
+                worker.errors += 1
+            self._release(worker, job_id, job_timings).set_result((detections, error))
+
+    def status(self):
+        """Per-worker status and queue depth for /health."""
+        workers = []
+        for worker in self._workers:
+            latencies = list(worker.latencies_ms)
+            workers.append({
+                'id': worker.worker_id,
+                'pid': worker.pid,
+                'alive': worker.process.is_alive(),
+                'ready': worker.ready,
+                'model_version': worker.model_version,
+                'cores': worker.cores,
+                'queue_depth': len(worker.pending),
+                'free_slots': len(worker.free_slots),
+                'processed': worker.processed,
+                'errors': worker.errors,
+                'avg_batch_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0.0
+            })
+
+        return {
+            'num_workers': self.num_workers,
+            'slots_per_worker': self.slots_per_worker,
+            'queue_depth': sum(w['queue_depth'] for w in workers),
+            'workers': workers
+        }
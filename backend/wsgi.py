@@ -0,0 +1,21 @@
+"""
+Production entry point for the detection API (instead of python app.py,
+which runs Flask's debug server):
+
+    cd backend
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Runs the same startup() as python app.py, in the background by default so
+/health and /ready answer while the model loads and warms up.
+"""
+
+import threading
+
+from app import STARTUP_IN_BACKGROUND, app, startup
+
+if STARTUP_IN_BACKGROUND:
+    threading.Thread(target=startup, name='startup', daemon=True).start()
+else:
+    startup()
+
+__all__ = ['app']
@@ -0,0 +1,76 @@
+"""
+Decode Benchmark - Compares the JSON/base64 + PIL path with the raw binary path
+"""
+
+import base64
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from app import decode_image, decode_image_bytes, pick_reduction_factor  # noqa: E402
+
+FRAME_SIZES = [(640, 480), (1280, 720), (1920, 1080), (3840, 2160)]
+ITERATIONS = 50
+
+
+def make_jpeg(width, height):
+    """Encode a synthetic camera-like frame as JPEG."""
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[:] = np.linspace(0, 255, width, dtype=np.uint8)[None, :, None]
+    noise = np.random.randint(0, 40, (height, width, 3), dtype=np.uint8)
+    frame = cv2.add(frame, noise)
+    ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return encoded.tobytes()
+
+
+def measure(decode, payload):
+    """Return (average ms per frame, peak traced memory in MB) for one decoder."""
+    decode(payload)  # Warmup
+
+    times = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        decode(payload)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    decode(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return sum(times) / len(times) * 1000, peak / (1024 ** 2)
+
+
+def benchmark_decode():
+    print("=" * 60)
+    print("🖼️  DECODE BENCHMARK: base64 + PIL vs raw binary + cv2.imdecode")
+    print("=" * 60)
+
+    for width, height in FRAME_SIZES:
+        jpeg_bytes = make_jpeg(width, height)
+        data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg_bytes).decode('ascii')
+
+        # The JSON path also pays for base64 decoding inside decode_image()
+        b64_ms, b64_mb = measure(lambda p: decode_image(p, reduced=False), data_url)
+        raw_ms, raw_mb = measure(lambda p: decode_image_bytes(p, reduced=False), jpeg_bytes)
+        reduced_ms, reduced_mb = measure(lambda p: decode_image_bytes(p, reduced=True), jpeg_bytes)
+        factor = pick_reduction_factor(width, height)
+
+        print(f"\n📐 {width}x{height}")
+        print("-" * 40)
+        print(f"   Payload:  base64 {len(data_url) / 1024:.0f} KB | raw {len(jpeg_bytes) / 1024:.0f} KB")
+        print(f"   base64:   {b64_ms:.2f} ms/frame, peak {b64_mb:.1f} MB")
+        print(f"   raw:      {raw_ms:.2f} ms/frame, peak {raw_mb:.1f} MB")
+        print(f"   reduced:  {reduced_ms:.2f} ms/frame, peak {reduced_mb:.1f} MB (1/{factor} scale)")
+        print(f"   Speedup:  raw {b64_ms / raw_ms:.2f}x | reduced {b64_ms / reduced_ms:.2f}x")
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    benchmark_decode()
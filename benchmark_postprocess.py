@@ -0,0 +1,141 @@
+"""
+Post-processing Benchmark - Per-box Python loop vs vectorized NumPy filter stage
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+try:
+    import torch  # Per-box tensor indexing is what the old loop really paid for
+except ImportError:
+    torch = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+import app  # noqa: E402
+
+BOX_COUNTS = [10, 100, 1000]
+IMAGE_SIZE = (1920, 1080)
+ITERATIONS = 50
+
+
+def make_boxes(count, seed=0):
+    """Random boxes covering the filter edge cases (tiny, huge, unknown class)."""
+    rng = np.random.default_rng(seed)
+    width, height = IMAGE_SIZE
+    x1 = rng.uniform(0, width - 10, count)
+    y1 = rng.uniform(0, height - 10, count)
+    w = rng.choice([2.0, 30.0, 120.0, 900.0], count) * rng.uniform(0.5, 1.5, count)
+    h = rng.choice([2.0, 30.0, 120.0, 900.0], count) * rng.uniform(0.5, 1.5, count)
+    xyxy = np.stack([x1, y1, x1 + w, y1 + h], axis=1).astype(np.float32)
+    conf = rng.uniform(0.5, 1.0, count).astype(np.float32)
+    cls = rng.choice([0, 1, 1, 2], count).astype(np.float32)
+    return xyxy, conf, cls
+
+
+def legacy_filter(xyxy, conf, cls, image_size):
+    """The previous per-box loop from run_detection(), kept as the reference."""
+    detections = []
+    for index in range(len(conf)):
+        x1, y1, x2, y2 = xyxy[index].tolist()
+
+        box_width = x2 - x1
+        box_height = y2 - y1
+        box_area = box_width * box_height
+        img_width, img_height = image_size
+        img_area = img_width * img_height
+
+        if box_width > app.MAX_BOX_SIZE or box_height > app.MAX_BOX_SIZE:
+            print(f"⚠️ Skipping: Box too large ({box_width:.0f}x{box_height:.0f} > {app.MAX_BOX_SIZE})")
+            continue
+
+        if box_width < app.MIN_BOX_SIZE or box_height < app.MIN_BOX_SIZE:
+            print(f"⚠️ Skipping: Box too small ({box_width:.0f}x{box_height:.0f} < {app.MIN_BOX_SIZE})")
+            continue
+
+        box_ratio = box_area / img_area
+        if box_ratio > app.MAX_BOX_RATIO:
+            print(f"⚠️ Skipping: Box ratio too large ({box_ratio:.2f} > {app.MAX_BOX_RATIO})")
+            continue
+
+        confidence = float(conf[index])
+        class_id = int(cls[index])
+
+        if class_id < len(app.CLASS_NAMES):
+            class_name = app.CLASS_NAMES[class_id]
+        else:
+            class_name = f'class_{class_id}'
+
+        color = app.CLASS_COLORS.get(class_name, (0, 255, 0))
+
+        detections.append({
+            'class': class_name,
+            'confidence': round(confidence, 3),
+            'bbox': {
+                'x1': round(x1, 2),
+                'y1': round(y1, 2),
+                'x2': round(x2, 2),
+                'y2': round(y2, 2)
+            },
+            'color': color
+        })
+
+    return detections
+
+
+def vectorized_filter(xyxy, conf, cls, image_size):
+    """The new filter stage, including the tensor to NumPy conversion."""
+    if torch is not None:
+        xyxy, conf, cls = xyxy.cpu().numpy(), conf.cpu().numpy(), cls.cpu().numpy()
+    return app.filter_detections(xyxy, conf, cls, image_size)
+
+
+def time_call(func, *args):
+    """Average ms per call with debug prints discarded."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args)  # Warmup
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            func(*args)
+        elapsed = time.perf_counter() - start
+    return elapsed / ITERATIONS * 1000
+
+
+def benchmark_postprocess():
+    print("=" * 60)
+    print("📦 POST-PROCESSING BENCHMARK: per-box loop vs vectorized")
+    print("=" * 60)
+    print(f"   Box arrays: {'torch tensors' if torch is not None else 'NumPy (torch not installed)'}")
+
+    # Tighten the filters so every branch is exercised
+    app.MAX_BOX_SIZE = 1000
+    app.MAX_BOX_RATIO = 0.25
+
+    for count in BOX_COUNTS:
+        boxes = make_boxes(count)
+        if torch is not None:
+            boxes = tuple(torch.from_numpy(array) for array in boxes)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = legacy_filter(*boxes, IMAGE_SIZE)
+            actual = vectorized_filter(*boxes, IMAGE_SIZE)
+
+        loop_ms = time_call(legacy_filter, *boxes, IMAGE_SIZE)
+        vector_ms = time_call(vectorized_filter, *boxes, IMAGE_SIZE)
+
+        print(f"\n📋 {count} boxes ({len(expected)} kept)")
+        print("-" * 40)
+        print(f"   Identical output: {'✅ yes' if actual == expected else '❌ NO'}")
+        print(f"   Loop:       {loop_ms:.3f} ms")
+        print(f"   Vectorized: {vector_ms:.3f} ms")
+        print(f"   Speedup:    {loop_ms / vector_ms:.1f}x")
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    benchmark_postprocess()
@@ -0,0 +1,117 @@
+"""
+CPU Runtime Benchmark - PyTorch vs ONNX Runtime vs OpenVINO
+Compares inference runtimes on CPU: times each one and
+checks that run_detection() returns the same detections on all of them.
+
+Usage:
+    python benchmark_runtimes.py [image_dir]
+"""
+
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+import app  # noqa: E402
+from runtimes import RUNTIMES, export_model, tune_threads  # noqa: E402
+
+ITERATIONS = 20
+BATCH_SIZES = [1, 4]
+BOX_TOLERANCE_PX = 2.0
+
+
+def load_images(image_dir):
+    """Sample images from a folder, or synthetic frames when none is given."""
+    if image_dir:
+        paths = sorted(glob.glob(os.path.join(image_dir, '*.jpg')) + glob.glob(os.path.join(image_dir, '*.png')))
+        images = [cv2.imread(path) for path in paths[:8]]
+        if images:
+            return images
+        print(f"⚠️ No images found in {image_dir}, using synthetic frames")
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(4)]
+
+
+def load_runtime(runtime):
+    """Load best.pt through a runtime with the same settings as the server."""
+    from ultralytics import YOLO
+
+    model_file = export_model(app.MODEL_PATH, runtime, app.INPUT_SIZE)
+    model = YOLO(model_file, task='detect')
+    dummy = np.zeros((app.INPUT_SIZE, app.INPUT_SIZE, 3), dtype=np.uint8)
+    model(dummy, imgsz=app.INPUT_SIZE, verbose=False)
+    tune_threads(model, runtime, model_file, app.INFERENCE_THREADS)
+    return model
+
+
+def detections_match(reference, candidate):
+    """Same classes in the same order with boxes within BOX_TOLERANCE_PX."""
+    if len(reference) != len(candidate):
+        return False
+    for ref, det in zip(reference, candidate):
+        if ref['class'] != det['class']:
+            return False
+        if any(abs(ref['bbox'][k] - det['bbox'][k]) > BOX_TOLERANCE_PX for k in ref['bbox']):
+            return False
+    return True
+
+
+def benchmark_runtimes(image_dir=None):
+    print("=" * 60)
+    print("🚀 CPU INFERENCE RUNTIME BENCHMARK")
+    print("=" * 60)
+    print(f"   Threads: {app.INFERENCE_THREADS} | Input size: {app.INPUT_SIZE}")
+
+    images = load_images(image_dir)
+    reference = None
+    summary = []
+
+    for runtime in RUNTIMES:
+        print(f"\n⏱️  {runtime}")
+        print("-" * 40)
+        try:
+            app.model = load_runtime(runtime)
+        except Exception as e:
+            print(f"   ⚠️ Skipped: {e}")
+            continue
+
+        detections = [app.run_detection(image)[0] for image in images]
+        if reference is None:
+            reference = detections
+            print("   Reference detections recorded")
+        else:
+            same = all(detections_match(r, d) for r, d in zip(reference, detections))
+            print(f"   Detections match pytorch: {'✅ yes' if same else '❌ NO'}")
+
+        for batch_size in BATCH_SIZES:
+            batch = [images[i % len(images)] for i in range(batch_size)]
+            app.run_detection_batch(batch)  # Warmup for this batch shape
+
+            times = []
+            for _ in range(ITERATIONS):
+                start = time.perf_counter()
+                app.run_detection_batch(batch)
+                times.append(time.perf_counter() - start)
+
+            per_frame = sum(times) / len(times) / batch_size * 1000
+            print(f"   Batch {batch_size}: {per_frame:.1f}ms per frame, {1000 / per_frame:.1f} FPS")
+            summary.append((runtime, batch_size, per_frame))
+
+    if summary:
+        print("\n" + "=" * 60)
+        print("📊 FASTEST PER BATCH SIZE")
+        print("=" * 60)
+        for batch_size in BATCH_SIZES:
+            rows = [row for row in summary if row[1] == batch_size]
+            if rows:
+                runtime, _, per_frame = min(rows, key=lambda row: row[2])
+                print(f"   Batch {batch_size}: {runtime} ({per_frame:.1f}ms per frame)")
+        print("\n💡 Start the server with INFERENCE_RUNTIME=<runtime> to use it")
+
+
+if __name__ == "__main__":
+    benchmark_runtimes(sys.argv[1] if len(sys.argv) > 1 else None)
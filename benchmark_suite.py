@@ -0,0 +1,361 @@
+"""
+Benchmark Suite - Reproducible CPU benchmarks for the detection pipeline
+Replaces test_gpu.py. Runs on a GPU-less Linux box and measures:
+
+1. Decode: JSON/base64 + PIL vs raw binary + cv2.imdecode
+2. Inference: run_detection_batch() at several INPUT_SIZE values and batch sizes
+3. Post-processing: filter_detections() with varying box counts
+4. HTTP: full /detect round-trips at concurrency levels from 1 to 64
+
+Every case reports p50/p95/p99 latency and throughput; HTTP cases also
+report how many requests were shed (429/503) or failed. Results are saved as
+JSON and compared with a stored baseline; a regression beyond the tolerance
+makes the run exit with status 1.
+
+Inputs are synthetic and seeded, and the environment (CPU, threads, library
+versions, runtime, model version) is recorded next to the numbers.
+
+Usage:
+    python benchmark_suite.py --save-baseline benchmarks/baseline.json
+    python benchmark_suite.py --baseline benchmarks/baseline.json
+    python benchmark_suite.py --sections http --url http://localhost:5000
+"""
+
+import argparse
+import base64
+import contextlib
+import http.client
+import io
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+import app  # noqa: E402
+from benchmark_decode import make_jpeg  # noqa: E402
+from benchmark_postprocess import make_boxes  # noqa: E402
+
+SECTIONS = ('decode', 'inference', 'postprocess', 'http')  # Run order
+DECODE_SIZES = [(640, 480), (1280, 720), (1920, 1080)]
+BOX_COUNTS = [10, 100, 1000]
+HTTP_FRAME_SIZE = (1280, 720)
+SHED_STATUSES = (429, 503)  # Turned away by admission control, not failed
+WARMUP = 3
+
+
+def summarize(latencies_s, items_per_call=1, wall_s=None):
+    """p50/p95/p99 in ms plus throughput in items per second."""
+    latencies_ms = np.asarray(latencies_s) * 1000
+    wall_s = wall_s if wall_s is not None else float(np.sum(latencies_s))
+    return {
+        'n': len(latencies_ms),
+        'mean_ms': round(float(latencies_ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+        'throughput': round(len(latencies_ms) * items_per_call / wall_s, 2) if wall_s else 0.0
+    }
+
+
+def time_calls(func, iterations):
+    """Latencies in seconds of iterations calls, after a warmup, with debug prints discarded."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(WARMUP):
+            func()
+        latencies = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def environment():
+    """Where the numbers came from, so runs on different boxes are not compared blindly."""
+    info = {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'runtime': app.INFERENCE_RUNTIME,
+        'inference_threads': app.INFERENCE_THREADS,
+        'model_version': app.model_version
+    }
+    for module in ('cv2', 'torch', 'ultralytics'):
+        try:
+            info[module] = getattr(__import__(module), '__version__', None)
+        except ImportError:
+            info[module] = None
+    return info
+
+
+def bench_decode(results, args):
+    for width, height in DECODE_SIZES:
+        jpeg_bytes = make_jpeg(width, height)
+        data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg_bytes).decode('ascii')
+        results[f'decode/base64/{width}x{height}'] = summarize(time_calls(lambda: app.decode_image(data_url), args.iterations))
+        results[f'decode/binary/{width}x{height}'] = summarize(time_calls(lambda: app.decode_image_bytes(jpeg_bytes), args.iterations))
+
+
+def bench_inference(results, args):
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8) for _ in range(max(args.batches))]
+    input_size = app.INPUT_SIZE
+    try:
+        for size in args.sizes:
+            app.INPUT_SIZE = size
+            for batch_size in args.batches:
+                batch = frames[:batch_size]
+                latencies = time_calls(lambda: app.run_detection_batch(batch), args.iterations)
+                results[f'inference/{size}/b{batch_size}'] = summarize(latencies, items_per_call=batch_size)
+    finally:
+        app.INPUT_SIZE = input_size
+
+
+def bench_postprocess(results, args):
+    image_size = (1920, 1080)
+    for count in BOX_COUNTS:
+        xyxy, conf, cls = make_boxes(count)
+        latencies = time_calls(lambda: app.filter_detections(xyxy, conf, cls, image_size), args.iterations)
+        results[f'postprocess/{count}'] = summarize(latencies)
+
+
+def start_local_server():
+    """Serve the backend in-process on a free port, set up like `python backend/app.py`."""
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # No per-request access log
+    if app.start_worker_pool() is None:
+        app.start_batcher()
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='benchmark-server', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def request_json(url, method, path, body=None):
+    """One JSON request to the server; returns the decoded response body."""
+    target = urllib.parse.urlparse(url)
+    connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+    try:
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        return json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+
+def pin_server_config(url):
+    """
+    Switch QoS off through /config so every request runs at the same input
+    size instead of one picked from the load. Returns (the previous
+    qos_enabled, the input size used for the run).
+    """
+    previous = request_json(url, 'GET', '/config').get('qos_enabled', False)
+    request_json(url, 'POST', '/config', {'qos_enabled': False})
+    return previous, request_json(url, 'GET', '/config')['input_size']
+
+
+def http_round_trips(url, payload, concurrency, total):
+    """
+    Closed loop: concurrency clients, each on its own keep-alive connection,
+    send /detect requests back to back until total requests are done.
+    Returns (latencies in seconds of successful requests, shed (429/503),
+    errors, wall time in seconds).
+    """
+    target = urllib.parse.urlparse(url)
+    headers = {'Content-Type': 'image/jpeg', 'Cache-Control': 'no-cache'}
+    remaining = [total]
+    latencies, shed, errors = [], [0], [0]
+    lock = threading.Lock()
+
+    def client():
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                connection.request('POST', '/detect', body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                status = None
+            elapsed = time.perf_counter() - start
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed)
+                elif status in SHED_STATUSES:
+                    shed[0] += 1
+                else:
+                    errors[0] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, shed[0], errors[0], time.perf_counter() - started
+
+
+def bench_http(results, args):
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_local_server()
+    qos_enabled, input_size = pin_server_config(url)
+    print(f"   Target: {url} (QoS off, input size {input_size})")
+
+    payload = make_jpeg(*HTTP_FRAME_SIZE)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            http_round_trips(url, payload, 1, WARMUP)
+
+            for concurrency in args.concurrency:
+                total = max(args.http_requests, concurrency * 4)
+                latencies, shed, errors, wall_s = http_round_trips(url, payload, concurrency, total)
+                # A case where everything was shed still reports its rates
+                stats = summarize(latencies, wall_s=wall_s) if latencies else {'n': 0}
+                results[f'http/c{concurrency}'] = {
+                    **stats,
+                    'shed': shed,
+                    'errors': errors,
+                    'shed_rate': round(shed / total, 4),
+                    'error_rate': round(errors / total, 4)
+                }
+    finally:
+        if qos_enabled:
+            request_json(url, 'POST', '/config', {'qos_enabled': True})
+        if server is not None:
+            server.shutdown()
+
+
+BENCHMARKS = {
+    'decode': bench_decode,
+    'inference': bench_inference,
+    'postprocess': bench_postprocess,
+    'http': bench_http
+}
+
+
+def compare(results, baseline, tolerance, rate_tolerance):
+    """
+    Cases whose p50 grew or throughput fell by more than tolerance vs the
+    baseline, or whose shed/error rate rose by more than rate_tolerance.
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for rate in ('shed_rate', 'error_rate'):
+            if current.get(rate, 0.0) > previous.get(rate, 0.0) + rate_tolerance:
+                regressions.append(f"{key}: {rate} {previous.get(rate, 0.0):.1%} -> {current[rate]:.1%}")
+        if not current['n'] or not previous['n']:
+            if current['n'] < previous['n']:
+                regressions.append(f"{key}: no successful requests")
+            continue
+        if current['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+            regressions.append(f"{key}: p50 {previous['p50_ms']:.2f} -> {current['p50_ms']:.2f} ms")
+        if current['throughput'] < previous['throughput'] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {previous['throughput']:.1f} -> {current['throughput']:.1f}/s")
+    return regressions
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reproducible CPU benchmarks for the detection pipeline')
+    parser.add_argument('--sections', default=','.join(SECTIONS), help=f"Comma-separated subset of {','.join(SECTIONS)}")
+    parser.add_argument('--iterations', type=int, default=30, help='Timed calls per decode/inference/postprocess case')
+    parser.add_argument('--sizes', type=int_list, default=[320, 480, 640], help='INPUT_SIZE values')
+    parser.add_argument('--batches', type=int_list, default=[1, 4, 8], help='Batch sizes')
+    parser.add_argument('--concurrency', type=int_list, default=[1, 2, 4, 8, 16, 32, 64], help='HTTP client counts')
+    parser.add_argument('--http-requests', type=int, default=100, help='Requests per concurrency level (at least 4 per client)')
+    parser.add_argument('--url', help='Benchmark a running server instead of starting one in-process')
+    parser.add_argument('--output', default='benchmark_results.json', help='Where to write the results')
+    parser.add_argument('--baseline', help='Baseline JSON to compare against')
+    parser.add_argument('--save-baseline', help='Also write the results to this baseline path')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed p50/throughput regression (0.15 = 15%%)')
+    parser.add_argument('--rate-tolerance', type=float, default=0.01,
+                        help='Allowed rise of the HTTP shed/error rate (0.01 = 1 point)')
+    args = parser.parse_args()
+
+    sections = [s for s in args.sections.split(',') if s in SECTIONS]
+    np.random.seed(0)  # make_jpeg() noise
+
+    print("=" * 60)
+    print("📏 DETECTION BENCHMARK SUITE")
+    print("=" * 60)
+
+    needs_model = 'inference' in sections or ('http' in sections and args.url is None)
+    if needs_model and not app.load_model():
+        print("⚠️ Model not loaded - skipping inference and in-process HTTP benchmarks")
+        sections = [s for s in sections if s != 'inference' and not (s == 'http' and args.url is None)]
+
+    results = {}
+    for section in sections:
+        print(f"\n⏱️  {section}")
+        print("-" * 60)
+        section_results = {}
+        BENCHMARKS[section](section_results, args)
+        for key, stats in section_results.items():
+            line = f"   {key:<28} "
+            if stats['n']:
+                line += (f"p50 {stats['p50_ms']:>9.2f}  p95 {stats['p95_ms']:>9.2f}  "
+                         f"p99 {stats['p99_ms']:>9.2f} ms  {stats['throughput']:>9.1f}/s")
+            else:
+                line += "no successful requests"
+            if 'shed_rate' in stats:
+                line += f"  shed {stats['shed_rate']:.1%}  errors {stats['error_rate']:.1%}"
+            print(line)
+        results.update(section_results)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': environment(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline', 'save_baseline')},
+        'results': results
+    }
+    for path in filter(None, [args.output, args.save_baseline]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Saved {path}")
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('environment', {}).get('cpu_count') != report['environment']['cpu_count']:
+        print("⚠️ Baseline was recorded on a machine with a different CPU count")
+
+    regressions = compare(results, baseline.get('results', {}), args.tolerance, args.rate_tolerance)
+    print("\n" + "=" * 60)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+    print(f"✅ No regressions beyond {args.tolerance:.0%} vs {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
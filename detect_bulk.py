@@ -0,0 +1,354 @@
+"""
+Bulk Detection - Runs the detection model over a folder, a glob or a video file
+
+Images are decoded on a thread pool, batched through the server's
+run_detection_batch() (same post-processing and class mapping as /detect)
+and streamed to JSONL or Parquet. The queues between reader, model and
+writer are bounded, so memory stays flat however large the input is.
+
+Progress is checkpointed next to the output after every write; running the
+same command again resumes after the last written image (by file name, so
+files added or removed in between do not shift the position).
+
+Usage:
+    python detect_bulk.py path/to/images -o results.jsonl
+    python detect_bulk.py "data/**/*.png" -o results.parquet
+    python detect_bulk.py line3.mp4 -o line3.jsonl --batch-size 16
+"""
+
+import argparse
+import bisect
+import glob
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+import app  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v')
+DONE = None  # Queue sentinel
+REPORT_EVERY_S = 5.0
+
+
+def list_images(source):
+    """Sorted image paths for a directory (recursive) or a glob pattern."""
+    if os.path.isdir(source):
+        paths = [os.path.join(root, name) for root, _, files in os.walk(source) for name in files]
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def completed(value):
+    """A Future that already holds value (video frames are decoded in order)."""
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def decode_file(path):
+    """
+    Read and decode one image with the server's decoder. A file that cannot
+    be read (deleted mid-run, dangling symlink) gets image None, so it ends
+    up as an error record instead of aborting the run.
+    """
+    try:
+        with open(path, 'rb') as f:
+            image, original_size = app.decode_image_bytes(f.read())
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Cannot read {path}: {e}")
+        return path, None, None
+    return path, image, original_size
+
+
+def read_images(paths, frames, workers):
+    """
+    Reader thread for image files: decode on a thread pool and queue the
+    Futures in input order. frames is bounded, so decoding stays at most
+    its maxsize images ahead of the model.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='decode') as pool:
+        for path in paths:
+            frames.put(pool.submit(decode_file, path))
+    frames.put(DONE)
+
+
+def read_video(path, frames, start):
+    """Reader thread for a video: frames are decoded in order, skipping the first start."""
+    capture = cv2.VideoCapture(path)
+    index = 0
+    while index < start and capture.grab():
+        index += 1
+
+    while True:
+        ok, image = capture.read()
+        if not ok:
+            break
+        frames.put(completed((f'{path}#{index}', image, (image.shape[1], image.shape[0]))))
+        index += 1
+
+    capture.release()
+    frames.put(DONE)
+
+
+def detect_batch(batch, first_index):
+    """Run one batch of decoded frames through the model; returns result records."""
+    decoded = [(name, image, size) for name, image, size in batch if image is not None]
+    results = iter(app.run_detection_batch(
+        [image for _, image, _ in decoded],
+        [size for _, _, size in decoded]
+    ) if decoded else [])
+
+    records = []
+    for offset, (name, image, size) in enumerate(batch):
+        record = {'index': first_index + offset, 'source': name}
+        if image is None:
+            records.append({**record, 'width': None, 'height': None, 'detections': [], 'total': 0,
+                            'error': 'Failed to decode image'})
+            continue
+
+        detections, error = next(results)
+        records.append({
+            **record,
+            'width': size[0],
+            'height': size[1],
+            'detections': detections or [],
+            'total': len(detections or []),
+            'error': error
+        })
+    return records
+
+
+class JsonlWriter:
+    """One JSON object per line; resumes by truncating to the checkpointed offset."""
+
+    def __init__(self, path, checkpoint):
+        self.file = open(path, 'r+b' if checkpoint and os.path.exists(path) else 'wb')
+        self.file.truncate(checkpoint['offset'] if checkpoint else 0)
+        self.file.seek(0, os.SEEK_END)
+
+    def write(self, records):
+        """Append records; returns the checkpoint state once they are flushed."""
+        for record in records:
+            self.file.write(json.dumps(record).encode() + b'\n')
+        self.file.flush()
+        return {'completed': records[-1]['index'] + 1, 'last_source': records[-1]['source'], 'offset': self.file.tell()}
+
+    def close(self):
+        self.file.close()
+        return None
+
+
+class ParquetWriter:
+    """
+    Directory of Parquet part files, one per flush_rows records. Only whole
+    parts are checkpointed; parts past the checkpoint are removed on resume.
+    """
+
+    def __init__(self, path, checkpoint, flush_rows=2000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ Parquet output needs pyarrow. Run: pip install pyarrow")
+
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.flush_rows = flush_rows
+        self.buffer = []
+
+        box = pa.struct([
+            ('class', pa.string()), ('confidence', pa.float64()),
+            ('x1', pa.float64()), ('y1', pa.float64()), ('x2', pa.float64()), ('y2', pa.float64())
+        ])
+        self.schema = pa.schema([
+            ('index', pa.int64()), ('source', pa.string()),
+            ('width', pa.int32()), ('height', pa.int32()),
+            ('total', pa.int32()), ('error', pa.string()),
+            ('detections', pa.list_(box))
+        ])
+
+        os.makedirs(path, exist_ok=True)
+        start = checkpoint['completed'] if checkpoint else 0
+        for part in glob.glob(os.path.join(path, 'part-*.parquet')):
+            if int(os.path.basename(part)[5:13]) >= start:
+                os.remove(part)
+
+    def write(self, records):
+        self.buffer.extend(records)
+        if len(self.buffer) >= self.flush_rows:
+            return self._flush()
+        return None
+
+    def _flush(self):
+        if not self.buffer:
+            return None
+        rows = [
+            {**r, 'detections': [{'class': d['class'], 'confidence': d['confidence'], **d['bbox']}
+                                  for d in r['detections']]}
+            for r in self.buffer
+        ]
+        table = self.pa.Table.from_pylist(rows, schema=self.schema)
+        self.pq.write_table(table, os.path.join(self.path, f"part-{rows[0]['index']:08d}.parquet"))
+        self.buffer = []
+        return {'completed': rows[-1]['index'] + 1, 'last_source': rows[-1]['source']}
+
+    def close(self):
+        return self._flush()
+
+
+def load_checkpoint(path, job):
+    """Checkpoint state if it belongs to this job, None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('job') != job:
+        raise SystemExit(f"❌ {path} belongs to a different source or settings. Use --restart to start over.")
+    return checkpoint
+
+
+def save_checkpoint(path, job, state):
+    """Write the checkpoint atomically so a crash never leaves it half written."""
+    temp = path + '.tmp'
+    with open(temp, 'w') as f:
+        json.dump({'job': job, **state}, f)
+    os.replace(temp, path)
+
+
+def write_results(writer, results, checkpoint_path, job, progress):
+    """Writer thread: drain result batches, write them and advance the checkpoint."""
+    while True:
+        records = results.get()
+        if records is DONE:
+            break
+        state = writer.write(records)
+        if state:
+            save_checkpoint(checkpoint_path, job, state)
+        progress['written'] += len(records)
+
+    state = writer.close()
+    if state:
+        save_checkpoint(checkpoint_path, job, state)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run nut & bolt detection over many images or a video')
+    parser.add_argument('source', help='Image folder, glob pattern (quote it) or video file')
+    parser.add_argument('-o', '--output', required=True, help='Output .jsonl file or .parquet directory')
+    parser.add_argument('--format', choices=('jsonl', 'parquet'), help='Output format (default: from extension)')
+    parser.add_argument('--batch-size', type=int, default=app.BATCH_MAX_SIZE, help='Frames per forward pass')
+    parser.add_argument('--decode-workers', type=int, default=os.cpu_count() or 1, help='Image decode threads')
+    parser.add_argument('--queue-size', type=int, default=0, help='Max decoded frames waiting (default: 4 batches)')
+    parser.add_argument('--conf', type=float, default=app.CONFIDENCE_THRESHOLD, help='Confidence threshold')
+    parser.add_argument('--iou', type=float, default=app.IOU_THRESHOLD, help='NMS IoU threshold')
+    parser.add_argument('--imgsz', type=int, default=app.INPUT_SIZE, help='Model input size')
+    parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("📦 BULK DETECTION")
+    print("=" * 60)
+
+    app.CONFIDENCE_THRESHOLD = args.conf
+    app.IOU_THRESHOLD = args.iou
+    app.INPUT_SIZE = args.imgsz
+    if not app.load_model():
+        return 1
+
+    output_format = args.format or ('parquet' if args.output.endswith('.parquet') else 'jsonl')
+    is_video = args.source.lower().endswith(VIDEO_EXTENSIONS) and os.path.isfile(args.source)
+    paths = [] if is_video else list_images(args.source)
+    if not is_video and not paths:
+        print(f"❌ No images found for: {args.source}")
+        return 1
+
+    job = {
+        'source': os.path.abspath(args.source),
+        'format': output_format,
+        'settings': [args.conf, args.iou, args.imgsz, app.REDUCED_DECODE, app.model_version]
+    }
+    checkpoint_path = args.output.rstrip('/\\') + '.ckpt'
+    checkpoint = None if args.restart else load_checkpoint(checkpoint_path, job)
+    start = checkpoint['completed'] if checkpoint else 0
+    # Image runs resume after the last written file name rather than its
+    # position, which moves when files are added or removed in between
+    path_start = start
+    if checkpoint and not is_video and 'last_source' in checkpoint:
+        path_start = bisect.bisect_right(paths, checkpoint['last_source'])
+    if start:
+        print(f"⏩ Resuming after {start} image(s) from {checkpoint_path}")
+
+    if output_format == 'parquet':
+        writer = ParquetWriter(args.output, checkpoint)
+    else:
+        writer = JsonlWriter(args.output, checkpoint)
+
+    # Bounded hand-offs: reader -> model -> writer
+    frames = queue.Queue(maxsize=args.queue_size or 4 * args.batch_size)
+    results = queue.Queue(maxsize=4)
+    progress = {'written': 0}
+
+    if is_video:
+        reader = threading.Thread(target=read_video, args=(args.source, frames, start), daemon=True)
+    else:
+        reader = threading.Thread(target=read_images, args=(paths[path_start:], frames, args.decode_workers), daemon=True)
+    writer_thread = threading.Thread(target=write_results, args=(writer, results, checkpoint_path, job, progress))
+    reader.start()
+    writer_thread.start()
+
+    print(f"🚀 {'Video' if is_video else f'{len(paths) - path_start} image(s)'} -> {args.output} ({output_format}), "
+          f"batch {args.batch_size}, {args.decode_workers} decode thread(s)")
+
+    started = time.perf_counter()
+    last_report = started
+    index = start
+    processed = 0
+    failed = 0
+    batch = []
+
+    try:
+        while True:
+            item = frames.get()
+            if item is not DONE:
+                batch.append(item.result())
+            if batch and (item is DONE or len(batch) >= args.batch_size):
+                records = detect_batch(batch, index)
+                failed += sum(1 for r in records if r['error'])
+                results.put(records)
+                index += len(batch)
+                processed += len(batch)
+                batch = []
+
+                now = time.perf_counter()
+                if now - last_report >= REPORT_EVERY_S:
+                    print(f"📊 {processed} processed, {progress['written']} written, "
+                          f"{processed / (now - started):.1f} images/sec")
+                    last_report = now
+            if item is DONE:
+                break
+    finally:
+        # Let the writer flush and checkpoint what it has, even when the loop failed
+        results.put(DONE)
+        writer_thread.join()
+    elapsed = time.perf_counter() - started
+
+    print("\n" + "=" * 60)
+    print(f"✅ {processed} image(s) in {elapsed:.1f}s - {processed / max(elapsed, 1e-9):.1f} images/sec")
+    if failed:
+        print(f"⚠️ {failed} image(s) failed to decode or detect (see 'error' in the output)")
+    print(f"📁 Results: {args.output}")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
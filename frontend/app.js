@@ -8,6 +8,10 @@
 // ============================================
 const CONFIG = {
     API_URL: 'http://localhost:5000',
+    WS_URL: 'ws://localhost:5000/stream',
+    USE_WEBSOCKET: true,       // Stream frames over WebSocket when the server supports it
+    MAX_FRAMES_IN_FLIGHT: 2,   // Skip capturing while this many frames await results
+    COMPACT_RESULTS: true,     // Ask for columnar detections (smaller, cheaper to serialize)
     DETECTION_INTERVAL: 300,  // ms between detections (slower = more stable)
     MAX_CANVAS_WIDTH: 640,    // Resize frames for faster processing
     CONFIDENCE_THRESHOLD: 0.5,  // Balanced threshold
@@ -36,7 +40,15 @@ const state = {
     showLabels: true,
     showConfidence: true,
     detectionHistory: [],  // Store recent detections for stabilization
-    stableDetections: []   // Filtered stable detections
+    stableDetections: [],  // Filtered stable detections
+    streamingAvailable: false,  // Server has the WebSocket /stream endpoint
+    ws: null,
+    nextFrameId: 0,
+    framesInFlight: 0,
+    framesDropped: 0,
+    hints: null,  // Server QoS hints: { interval_ms, max_width, input_size }
+    // Identifies this camera session for server-side tracking
+    streamId: `web-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 8)}`
 };
 
 // ============================================
@@ -98,7 +110,12 @@ async function checkAPIHealth() {
         const data = await response.json();
 
         if (data.status === 'online') {
-            updateAPIStatus(true, data.model_loaded ? 'Model Ready' : 'Model Not Loaded');
+            state.streamingAvailable = Boolean(data.streaming);
+            let label = data.model_loaded ? 'Model Ready' : 'Model Not Loaded';
+            if (!data.ready && data.startup && !data.startup.done) {
+                label = 'Warming Up...';  // Model still loading in the background
+            }
+            updateAPIStatus(true, label);
             return true;
         }
     } catch (error) {
@@ -118,10 +135,20 @@ async function detectObjects(imageData) {
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({ image: imageData })
+            body: JSON.stringify({
+                image: imageData,
+                stream_id: state.streamId,
+                format: CONFIG.COMPACT_RESULTS ? 'compact' : 'verbose'
+            })
         });
 
         const data = await response.json();
+
+        // Shed by the server's admission control: wait as long as it asks
+        const retryAfter = parseFloat(response.headers.get('Retry-After'));
+        if (!response.ok && retryAfter > 0) {
+            data.hints = { interval_ms: retryAfter * 1000 };
+        }
         return data;
     } catch (error) {
         console.error('Detection API error:', error);
@@ -204,10 +231,7 @@ async function startCamera() {
 function stopCamera() {
     // Stop detection loop
     state.isRunning = false;
-    if (state.detectionLoop) {
-        clearInterval(state.detectionLoop);
-        state.detectionLoop = null;
-    }
+    stopDetectionLoop();
 
     // Stop all tracks
     if (state.stream) {
@@ -245,24 +269,189 @@ function setupCanvas() {
 // ============================================
 
 /**
- * Start the detection loop
+ * Interval before the next frame: the user's setting, or longer if the server asks
+ */
+function currentInterval() {
+    const hinted = state.hints ? state.hints.interval_ms : 0;
+    return Math.max(CONFIG.DETECTION_INTERVAL, hinted || 0);
+}
+
+/**
+ * Width frames are resized to: the configured max, or smaller if the server asks
+ */
+function currentMaxWidth() {
+    const hinted = state.hints ? state.hints.max_width : 0;
+    return hinted ? Math.min(CONFIG.MAX_CANVAS_WIDTH, hinted) : CONFIG.MAX_CANVAS_WIDTH;
+}
+
+/**
+ * Start the detection loop, streaming over WebSocket when available
  */
 function startDetectionLoop() {
-    state.detectionLoop = setInterval(async () => {
+    if (CONFIG.USE_WEBSOCKET && state.streamingAvailable && 'WebSocket' in window) {
+        startStreamLoop();
+    } else {
+        startPollingLoop();
+    }
+}
+
+/**
+ * Stop whichever detection loop is running
+ */
+function stopDetectionLoop() {
+    if (state.detectionLoop) {
+        clearTimeout(state.detectionLoop);
+        state.detectionLoop = null;
+    }
+
+    if (state.ws) {
+        state.ws.onclose = null;
+        state.ws.close();
+        state.ws = null;
+    }
+    state.framesInFlight = 0;
+}
+
+/**
+ * Poll /detect with one HTTP request per frame.
+ * The next frame is scheduled after the result arrives, so a slow server
+ * never has more than one request from this client.
+ */
+function startPollingLoop() {
+    const tick = async () => {
         if (!state.isRunning) return;
+        const started = Date.now();
 
         // Capture frame
         const imageData = captureFrame();
-        if (!imageData) return;
+        if (imageData) {
+            // Send to API
+            const result = await detectObjects(imageData);
+            handleDetectionResult(result);
+        }
+
+        if (state.isRunning && !state.ws) {
+            state.detectionLoop = setTimeout(tick, Math.max(0, currentInterval() - (Date.now() - started)));
+        }
+    };
+    state.detectionLoop = setTimeout(tick, 0);
+}
+
+/**
+ * Push binary JPEG frames over a persistent WebSocket.
+ * Each frame is a 4-byte big-endian frame id followed by the JPEG bytes.
+ * The server drops stale frames, so results may skip frame ids.
+ */
+function startStreamLoop() {
+    const format = CONFIG.COMPACT_RESULTS ? '&format=compact' : '';
+    const ws = new WebSocket(`${CONFIG.WS_URL}?stream_id=${encodeURIComponent(state.streamId)}${format}`);
+    ws.binaryType = 'arraybuffer';
+    state.ws = ws;
+    state.framesInFlight = 0;
+    state.framesDropped = 0;
+
+    ws.onmessage = (event) => {
+        const result = JSON.parse(event.data);
+        if (result.type !== 'detections') {
+            console.warn('Stream message:', result);
+            // A frame that failed on the server is still answered, free its slot
+            if (result.frame_id !== undefined) {
+                state.framesInFlight = Math.max(0, state.framesInFlight - 1);
+            }
+            return;
+        }
+        // Each result acknowledges its own frame plus any the server dropped
+        const newlyDropped = (result.frames_dropped || 0) - state.framesDropped;
+        state.framesDropped = result.frames_dropped || 0;
+        state.framesInFlight = Math.max(0, state.framesInFlight - 1 - newlyDropped);
+        handleDetectionResult(result);
+    };
+
+    ws.onclose = () => {
+        // Fall back to HTTP polling if the stream goes away mid-session
+        console.warn('Detection stream closed, falling back to HTTP polling');
+        state.ws = null;
+        if (state.detectionLoop) {
+            clearTimeout(state.detectionLoop);
+            state.detectionLoop = null;
+        }
+        if (state.isRunning) {
+            startPollingLoop();
+        }
+    };
+
+    // Re-armed on every tick so interval hints from the server apply right away
+    const tick = async () => {
+        if (state.ws !== ws) return;
+        state.detectionLoop = setTimeout(tick, currentInterval());
+
+        if (!state.isRunning || ws.readyState !== WebSocket.OPEN) return;
+        if (state.framesInFlight >= CONFIG.MAX_FRAMES_IN_FLIGHT) return;
+
+        const blob = await captureFrameBlob();
+        if (!blob || ws.readyState !== WebSocket.OPEN) return;
+
+        const jpeg = await blob.arrayBuffer();
+        const message = new Uint8Array(4 + jpeg.byteLength);
+        new DataView(message.buffer).setUint32(0, state.nextFrameId++);
+        message.set(new Uint8Array(jpeg), 4);
+
+        state.framesInFlight++;
+        ws.send(message.buffer);
+    };
+    state.detectionLoop = setTimeout(tick, currentInterval());
+}
+
+/**
+ * Expand columnar detections ("format": "compact") back into detection objects
+ */
+function expandDetections(columns) {
+    let boxes = columns.boxes;
+    if (columns.box_encoding === 'base64') {
+        const bytes = Uint8Array.from(atob(boxes), c => c.charCodeAt(0));
+        boxes = new Float32Array(bytes.buffer);
+    }
+
+    const { classes, colors } = columns.legend;
+    const detections = [];
+    for (let i = 0; i < columns.count; i++) {
+        const classId = columns.class_ids[i];
+        const det = {
+            class: classes[classId],
+            confidence: columns.confidences[i],
+            bbox: { x1: boxes[4 * i], y1: boxes[4 * i + 1], x2: boxes[4 * i + 2], y2: boxes[4 * i + 3] },
+            color: colors[classId]
+        };
+        if (columns.track_ids) {
+            det.track_id = columns.track_ids[i];
+        }
+        detections.push(det);
+    }
+    return detections;
+}
 
-        // Send to API
-        const result = await detectObjects(imageData);
+/**
+ * Process a detection result from either transport
+ */
+function handleDetectionResult(result) {
+    if (result.format === 'compact') {
+        result.detections = expandDetections(result.detections);
+    }
 
-        // Update FPS
-        updateFPS();
+    // Update FPS
+    updateFPS();
 
-        // Process results
-        if (result.success) {
+    // Server load hints (next-frame interval, frame width) apply to the next capture
+    state.hints = result.hints || null;
+
+    // Process results
+    if (result.success) {
+        let stableDetections;
+
+        if (result.tracking) {
+            // Server tracker already applied the MIN_DETECTION_FRAMES rule
+            stableDetections = result.detections;
+        } else {
             // Add to detection history for stabilization
             state.detectionHistory.push(result.detections);
             if (state.detectionHistory.length > CONFIG.DETECTION_MEMORY) {
@@ -270,20 +459,20 @@ function startDetectionLoop() {
             }
 
             // Get stable detections (appear in multiple frames)
-            const stableDetections = getStableDetections();
-
-            drawDetections(stableDetections);
-            updateStats({ ...result, detections: stableDetections, total: stableDetections.length });
-            updateDetectionsList(stableDetections);
-            state.framesProcessed++;
-            elements.framesProcessed.textContent = state.framesProcessed;
+            stableDetections = getStableDetections();
         }
 
-    }, CONFIG.DETECTION_INTERVAL);
+        drawDetections(stableDetections, result.image_size);
+        updateStats({ ...result, detections: stableDetections, total: stableDetections.length });
+        updateDetectionsList(stableDetections);
+        state.framesProcessed++;
+        elements.framesProcessed.textContent = state.framesProcessed;
+    }
 }
 
 /**
  * Get stable detections that appear consistently across frames
+ * (fallback for servers without tracking)
  */
 function getStableDetections() {
     if (state.detectionHistory.length < CONFIG.MIN_DETECTION_FRAMES) {
@@ -328,9 +517,9 @@ function isSimilarBox(box1, box2) {
 }
 
 /**
- * Capture current video frame as base64
+ * Draw the current video frame onto a resized capture canvas
  */
-function captureFrame() {
+function drawCaptureCanvas() {
     const video = elements.webcam;
 
     if (video.readyState !== video.HAVE_ENOUGH_DATA) {
@@ -345,9 +534,10 @@ function captureFrame() {
     let width = video.videoWidth;
     let height = video.videoHeight;
 
-    if (width > CONFIG.MAX_CANVAS_WIDTH) {
-        const ratio = CONFIG.MAX_CANVAS_WIDTH / width;
-        width = CONFIG.MAX_CANVAS_WIDTH;
+    const maxWidth = currentMaxWidth();
+    if (width > maxWidth) {
+        const ratio = maxWidth / width;
+        width = maxWidth;
         height = Math.round(height * ratio);
     }
 
@@ -357,14 +547,34 @@ function captureFrame() {
     // Draw video frame
     tempCtx.drawImage(video, 0, 0, width, height);
 
+    return tempCanvas;
+}
+
+/**
+ * Capture current video frame as base64
+ */
+function captureFrame() {
+    const tempCanvas = drawCaptureCanvas();
+    if (!tempCanvas) return null;
+
     // Convert to base64
     return tempCanvas.toDataURL('image/jpeg', 0.8);
 }
 
+/**
+ * Capture current video frame as a binary JPEG blob
+ */
+function captureFrameBlob() {
+    const tempCanvas = drawCaptureCanvas();
+    if (!tempCanvas) return Promise.resolve(null);
+
+    return new Promise((resolve) => tempCanvas.toBlob(resolve, 'image/jpeg', 0.8));
+}
+
 /**
  * Draw detection boxes on canvas
  */
-function drawDetections(detections) {
+function drawDetections(detections, imageSize) {
     // Clear previous drawings
     ctx.clearRect(0, 0, elements.canvas.width, elements.canvas.height);
 
@@ -375,11 +585,14 @@ function drawDetections(detections) {
     // Debug: log detections
     console.log('Drawing detections:', detections.length, detections);
 
-    // Calculate the actual size that was sent to the API
+    // The size that was sent to the API (frame width can follow server hints)
     let apiWidth = video.videoWidth;
     let apiHeight = video.videoHeight;
 
-    if (apiWidth > CONFIG.MAX_CANVAS_WIDTH) {
+    if (imageSize) {
+        apiWidth = imageSize.width;
+        apiHeight = imageSize.height;
+    } else if (apiWidth > CONFIG.MAX_CANVAS_WIDTH) {
         const ratio = CONFIG.MAX_CANVAS_WIDTH / apiWidth;
         apiWidth = CONFIG.MAX_CANVAS_WIDTH;
         apiHeight = Math.round(video.videoHeight * ratio);
@@ -587,8 +800,8 @@ elements.detectionInterval.addEventListener('input', (e) => {
     elements.intervalValue.textContent = CONFIG.DETECTION_INTERVAL;
 
     // Restart detection loop with new interval
-    if (state.isRunning && state.detectionLoop) {
-        clearInterval(state.detectionLoop);
+    if (state.isRunning) {
+        stopDetectionLoop();
         startDetectionLoop();
     }
 });
@@ -0,0 +1,339 @@
+"""
+Load Test - Simulates many camera stations against one detection backend
+
+Each virtual camera replays a JPEG sequence (a folder of recorded frames or
+synthetic frames with moving parts) at a fixed FPS, the way frontend/app.js
+drives one camera:
+- /detect mode: one request at a time per camera; ticks that pass while a
+  request is still running are dropped frames.
+- stream mode: frames go over the /stream WebSocket with at most
+  --max-in-flight unanswered; the server's own latest-frame-wins drops are
+  counted as well.
+
+The number of cameras ramps up step by step while /metrics is sampled for
+server-side queue buildup. The saturation point is the last step that
+still delivers the offered FPS within the latency SLO.
+
+Usage:
+    python load_test.py --url http://localhost:5000 --fps 5 --max-clients 64
+    python load_test.py --mode stream --frames recordings/station3 --fps 10
+"""
+
+import argparse
+import glob
+import http.client
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import cv2
+import numpy as np
+
+FRAME_HEADER = struct.Struct('>I')  # Same framing as backend/streaming.py
+SYNTHETIC_FRAMES = 60
+
+
+def load_frames(folder, width, height):
+    """Encoded JPEG frames from a folder, or a synthetic conveyor sequence."""
+    if folder:
+        paths = sorted(glob.glob(os.path.join(folder, '*.jpg')) + glob.glob(os.path.join(folder, '*.jpeg')))
+        if not paths:
+            raise SystemExit(f"❌ No .jpg frames found in {folder}")
+        frames = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                frames.append(f.read())
+        return frames
+
+    # Gray belt with dark parts moving across it, so change gating and
+    # tracking see realistic motion
+    rng = np.random.default_rng(0)
+    background = np.full((height, width, 3), 150, dtype=np.uint8)
+    background = cv2.add(background, rng.integers(0, 20, (height, width, 3), dtype=np.uint8))
+    parts = rng.uniform([0, 0.2], [1, 0.8], (6, 2)) * [width, height]
+    frames = []
+    for index in range(SYNTHETIC_FRAMES):
+        frame = background.copy()
+        for x, y in parts:
+            cx = int((x + index * width / SYNTHETIC_FRAMES) % width)
+            cv2.circle(frame, (cx, int(y)), max(8, height // 40), (40, 40, 40), -1)
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        frames.append(encoded.tobytes())
+    return frames
+
+
+class CameraStats:
+    """Per-camera counters for one ramp step."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.completed = 0
+        self.errors = 0
+        self.dropped = 0          # Ticks skipped on the client because results were late
+        self.server_dropped = 0   # Frames the server replaced with newer ones (stream mode)
+        self.latencies_ms = []
+
+
+def run_http_camera(camera_id, args, frames, stats, stop):
+    """One /detect camera: send, wait for the result, drop ticks missed meanwhile."""
+    target = urllib.parse.urlparse(args.url)
+    connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+    # Real cameras never repeat byte-identical frames, so skip the result cache
+    headers = {'Content-Type': 'image/jpeg', 'Cache-Control': 'no-cache', 'X-Stream-Id': f'loadtest-{camera_id}'}
+    interval = 1.0 / args.fps
+    index = camera_id * 7  # Cameras start at different points of the sequence
+    next_tick = time.perf_counter() + interval * (1 + (camera_id % 10) / 10)
+
+    while not stop.is_set():
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        next_tick += interval
+
+        payload = frames[index % len(frames)]
+        index += 1
+        start = time.perf_counter()
+        try:
+            connection.request('POST', '/detect', body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            ok = False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        # Ticks that passed while waiting are frames this camera never sent
+        missed = max(0, int((time.perf_counter() - next_tick) / interval))
+        next_tick += missed * interval
+
+        with stats.lock:
+            stats.sent += 1
+            stats.dropped += missed
+            if ok:
+                stats.completed += 1
+                stats.latencies_ms.append(elapsed_ms)
+            else:
+                stats.errors += 1
+
+    connection.close()
+
+
+def run_stream_camera(camera_id, args, frames, stats, stop):
+    """One /stream camera: pipelined frames over a WebSocket, latency per frame id."""
+    try:
+        from simple_websocket import Client  # Installed with flask-sock
+    except ImportError:
+        raise SystemExit("❌ Stream mode needs simple-websocket. Run: pip install flask-sock")
+
+    ws_url = args.url.replace('http', 'ws', 1).rstrip('/') + f'/stream?stream_id=loadtest-{camera_id}'
+    ws = Client.connect(ws_url)
+    sent_at = {}
+    interval = 1.0 / args.fps
+
+    def receive():
+        while not stop.is_set():
+            try:
+                message = ws.receive(timeout=0.5)
+            except Exception:
+                return
+            if message is None:
+                continue
+            result = json.loads(message)
+            now = time.perf_counter()
+            with stats.lock:
+                started = sent_at.pop(result.get('frame_id'), None)
+                stats.server_dropped = result.get('frames_dropped', stats.server_dropped)
+                if started is None:
+                    continue
+                if result.get('success'):
+                    stats.completed += 1
+                    stats.latencies_ms.append((now - started) * 1000)
+                else:
+                    stats.errors += 1
+                # Frames sent before this one were replaced on the server
+                for frame_id in [f for f in sent_at if f < result.get('frame_id', 0)]:
+                    del sent_at[frame_id]
+
+    receiver = threading.Thread(target=receive, daemon=True)
+    receiver.start()
+
+    frame_id = 0
+    index = camera_id * 7
+    next_tick = time.perf_counter() + interval
+    while not stop.is_set():
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        next_tick += interval
+
+        with stats.lock:
+            if len(sent_at) >= args.max_in_flight:
+                stats.dropped += 1
+                continue
+            frame_id += 1
+            sent_at[frame_id] = time.perf_counter()
+            stats.sent += 1
+        try:
+            ws.send(FRAME_HEADER.pack(frame_id) + frames[index % len(frames)])
+        except Exception:
+            with stats.lock:
+                stats.errors += 1
+            break
+        index += 1
+
+    ws.close()
+    receiver.join(timeout=2)
+
+
+def sample_server(url, samples, stop, period_s=0.5):
+    """Poll /metrics for the server's queue depth and in-flight requests."""
+    while not stop.is_set():
+        try:
+            with urllib.request.urlopen(url.rstrip('/') + '/metrics', timeout=2) as response:
+                text = response.read().decode()
+            values = {}
+            for line in text.splitlines():
+                if line.startswith('detection_queue_depth '):
+                    values['queue_depth'] = float(line.split()[-1])
+                elif line.startswith('detection_in_flight{'):
+                    values['in_flight'] = values.get('in_flight', 0.0) + float(line.split()[-1])
+            samples.append(values)
+        except (OSError, ValueError):
+            pass
+        stop.wait(period_s)
+
+
+def run_step(clients, args, frames):
+    """Run `clients` cameras for one step; returns the step summary."""
+    stop = threading.Event()
+    cameras = [CameraStats() for _ in range(clients)]
+    target = run_stream_camera if args.mode == 'stream' else run_http_camera
+    threads = [
+        threading.Thread(target=target, args=(i, args, frames, cameras[i], stop), daemon=True)
+        for i in range(clients)
+    ]
+    samples = []
+    sampler = threading.Thread(target=sample_server, args=(args.url, samples, stop), daemon=True)
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    sampler.start()
+    time.sleep(args.step_duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=35)
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array([ms for c in cameras for ms in c.latencies_ms]) if any(c.latencies_ms for c in cameras) else np.zeros(1)
+    completed = sum(c.completed for c in cameras)
+    offered = args.fps * clients
+    queue = [s['queue_depth'] for s in samples if 'queue_depth' in s]
+    per_client_p95 = [float(np.percentile(c.latencies_ms, 95)) for c in cameras if c.latencies_ms]
+
+    return {
+        'clients': clients,
+        'offered_fps': offered,
+        'achieved_fps': round(completed / elapsed, 2),
+        'delivery_ratio': round(completed / elapsed / offered, 3),
+        'sent': sum(c.sent for c in cameras),
+        'completed': completed,
+        'errors': sum(c.errors for c in cameras),
+        'client_dropped': sum(c.dropped for c in cameras),
+        'server_dropped': sum(c.server_dropped for c in cameras),
+        'latency_ms': {
+            'p50': round(float(np.percentile(latencies, 50)), 1),
+            'p95': round(float(np.percentile(latencies, 95)), 1),
+            'p99': round(float(np.percentile(latencies, 99)), 1),
+            'worst_client_p95': round(max(per_client_p95), 1) if per_client_p95 else None
+        },
+        'server_queue_depth': {
+            'mean': round(float(np.mean(queue)), 2) if queue else None,
+            'max': max(queue) if queue else None
+        }
+    }
+
+
+def saturated(step, args):
+    """Why a step missed its targets, or None if it kept up."""
+    if step['errors']:
+        return f"{step['errors']} error(s)"
+    if step['delivery_ratio'] < args.min_delivery:
+        return f"delivered {step['delivery_ratio']:.0%} of offered FPS"
+    if step['latency_ms']['p95'] > args.slo_ms:
+        return f"p95 {step['latency_ms']['p95']:.0f}ms > SLO {args.slo_ms:.0f}ms"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ramp virtual cameras against the detection API')
+    parser.add_argument('--url', default='http://localhost:5000', help='Backend base URL')
+    parser.add_argument('--mode', choices=('detect', 'stream'), default='detect', help='POST /detect or WebSocket /stream')
+    parser.add_argument('--frames', help='Folder of recorded .jpg frames (default: synthetic)')
+    parser.add_argument('--width', type=int, default=640, help='Synthetic frame width')
+    parser.add_argument('--height', type=int, default=480, help='Synthetic frame height')
+    parser.add_argument('--fps', type=float, default=3.3, help='Frames per second per camera (app.js default ~3.3)')
+    parser.add_argument('--max-in-flight', type=int, default=2, help='Unanswered frames per stream camera')
+    parser.add_argument('--start-clients', type=int, default=1, help='Cameras in the first step')
+    parser.add_argument('--max-clients', type=int, default=64, help='Stop ramping after this many cameras')
+    parser.add_argument('--growth', type=float, default=2.0, help='Camera count multiplier per step')
+    parser.add_argument('--step-duration', type=float, default=20.0, help='Seconds per step')
+    parser.add_argument('--slo-ms', type=float, default=1000.0, help='p95 latency target')
+    parser.add_argument('--min-delivery', type=float, default=0.95, help='Min fraction of offered FPS delivered')
+    parser.add_argument('--output', default='load_test_results.json', help='Where to write per-step results')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🎥 CAMERA LOAD TEST")
+    print("=" * 60)
+
+    frames = load_frames(args.frames, args.width, args.height)
+    print(f"   Target: {args.url} ({args.mode}) | {len(frames)} frame(s) | {args.fps} FPS per camera")
+
+    steps = []
+    saturation = None
+    clients = args.start_clients
+    while clients <= args.max_clients:
+        print(f"\n⏱️  {clients} camera(s), {args.fps * clients:.1f} FPS offered")
+        step = run_step(clients, args, frames)
+        reason = saturated(step, args)
+        step['saturated'] = reason
+        steps.append(step)
+
+        latency = step['latency_ms']
+        print(f"   Delivered {step['achieved_fps']:.1f} FPS ({step['delivery_ratio']:.0%}) | "
+              f"p50 {latency['p50']:.0f}ms p95 {latency['p95']:.0f}ms | "
+              f"dropped {step['client_dropped']} client / {step['server_dropped']} server | "
+              f"queue max {step['server_queue_depth']['max']}")
+
+        if reason:
+            print(f"   ⚠️ Saturated: {reason}")
+            break
+        saturation = step
+        clients = max(clients + 1, int(round(clients * args.growth)))
+
+    with open(args.output, 'w') as f:
+        json.dump({'config': vars(args), 'steps': steps, 'saturation': saturation}, f, indent=2)
+
+    print("\n" + "=" * 60)
+    if saturation is None:
+        print("❌ Even the first step missed its targets")
+    elif steps[-1]['saturated']:
+        print(f"✅ Saturation point: {saturation['clients']} camera(s) at {args.fps} FPS "
+              f"({saturation['achieved_fps']:.1f} FPS, p95 {saturation['latency_ms']['p95']:.0f}ms)")
+    else:
+        print(f"✅ Not saturated up to {saturation['clients']} camera(s); raise --max-clients to go further")
+    print(f"💾 Saved {args.output}")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,11 @@ Model Diagnostic Script - Evaluates your Nut & Bolt Detection Model
 from ultralytics import YOLO
 import torch
 import os
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from runtimes import gate_report_path  # noqa: E402
 
 def diagnose_model():
     print("=" * 60)
@@ -60,6 +65,19 @@ def diagnose_model():
         variant = "YOLOv8x (Extra Large)"
     print(f"  Estimated Variant: {variant}")
 
+    # INT8 quantization status (written by quantize_model.py)
+    print("\n⚡ INT8 QUANTIZED MODEL:")
+    print("-" * 40)
+    report_path = gate_report_path(model_path)
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            report = json.load(f)
+        status = "✅ PASSED" if report.get('passed') else "❌ FAILED"
+        print(f"  Accuracy Gate: {status} (recall {report.get('recall')}, mAP50 {report.get('map50')})")
+        print(f"  Latency: FP32 {report.get('fp32_latency_ms')}ms | INT8 {report.get('int8_latency_ms')}ms")
+    else:
+        print("  Not built - run: python quantize_model.py --calib <images> --val <images>")
+
     # Issues and Recommendations
     print("\n" + "=" * 60)
     print("📋 MODEL RATING & ANALYSIS")
@@ -0,0 +1,251 @@
+"""
+INT8 Quantization Script - Builds an INT8 ONNX model from best.pt and gates it on accuracy
+
+1. Exports best.pt to FP32 ONNX (cached, same export the server uses)
+2. Calibrates ONNX Runtime static quantization on a folder of sample images
+3. Runs FP32 and INT8 through the server's run_detection() on held-out images
+4. Writes model/best.int8.onnx plus model/best.int8.json with the gate result
+
+The server only loads the INT8 model (INFERENCE_RUNTIME=onnx_int8) when the
+report says it passed for the current best.pt.
+
+Usage:
+    python quantize_model.py --calib path/to/calib_images --val path/to/val_images
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+import app  # noqa: E402
+from runtimes import export_model, export_path, file_sha256, gate_report_path  # noqa: E402
+from tracking import detections_to_arrays, iou_matrix  # noqa: E402
+
+IMAGE_PATTERNS = ('*.jpg', '*.jpeg', '*.png', '*.bmp')
+
+
+def list_images(folder, limit):
+    """Sorted image paths in a folder, capped at limit."""
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(folder, pattern)))
+    return sorted(paths)[:limit]
+
+
+def letterbox(image, size):
+    """Resize keeping aspect ratio and pad to size x size, like Ultralytics does for ONNX."""
+    height, width = image.shape[:2]
+    ratio = min(size / height, size / width)
+    new_w, new_h = int(round(width * ratio)), int(round(height * ratio))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top = (size - new_h) // 2
+    left = (size - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+
+    # BGR HWC uint8 -> RGB CHW float32 in [0, 1] with a batch axis
+    tensor = canvas[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(tensor, dtype=np.float32)[None] / 255.0
+
+
+class CalibrationReader:
+    """Feeds letterboxed calibration images to ONNX Runtime's quantizer."""
+
+    def __init__(self, paths, input_name, size):
+        self.paths = list(paths)
+        self.input_name = input_name
+        self.size = size
+        self.index = 0
+
+    def get_next(self):
+        while self.index < len(self.paths):
+            image = cv2.imread(self.paths[self.index])
+            self.index += 1
+            if image is not None:
+                return {self.input_name: letterbox(image, self.size)}
+        return None
+
+    def rewind(self):
+        self.index = 0
+
+
+def quantize(fp32_file, int8_file, calib_paths, size):
+    """Run ONNX Runtime static (QDQ) quantization on the FP32 export."""
+    import onnx
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    input_name = onnxruntime.InferenceSession(fp32_file, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    reader = CalibrationReader(calib_paths, input_name, size)
+
+    quantize_static(
+        fp32_file,
+        int8_file,
+        reader,
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        weight_type=QuantType.QInt8,
+        activation_type=QuantType.QUInt8,
+        calibrate_method=CalibrationMethod.MinMax
+    )
+
+    # Ultralytics reads class names, stride and imgsz from the ONNX metadata
+    fp32_model = onnx.load(fp32_file)
+    int8_model = onnx.load(int8_file)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, int8_file)
+
+
+def compare(reference_frames, candidate_frames, iou_threshold=0.5):
+    """
+    Score INT8 detections against the FP32 detections as pseudo ground truth.
+    Returns (recall, mAP50) over all classes the FP32 model found.
+    """
+    per_class = {}
+    total_reference = 0
+    total_matched = 0
+
+    for reference, candidate in zip(reference_frames, candidate_frames):
+        ref_boxes, _, ref_classes = detections_to_arrays(reference)
+        cand_boxes, cand_conf, cand_classes = detections_to_arrays(candidate)
+        total_reference += len(ref_classes)
+
+        for class_name in set(ref_classes) | set(cand_classes):
+            ref_idx = [i for i, c in enumerate(ref_classes) if c == class_name]
+            cand_idx = [i for i, c in enumerate(cand_classes) if c == class_name]
+            stats = per_class.setdefault(class_name, {'scores': [], 'hits': [], 'positives': 0})
+            stats['positives'] += len(ref_idx)
+
+            # Greedy matching in confidence order, as in standard mAP
+            order = sorted(cand_idx, key=lambda i: -cand_conf[i])
+            ious = iou_matrix(cand_boxes[order], ref_boxes[ref_idx]) if ref_idx and order else None
+            taken = set()
+            for row, i in enumerate(order):
+                hit = False
+                if ious is not None:
+                    for col in np.argsort(-ious[row]):
+                        if ious[row, col] < iou_threshold:
+                            break
+                        if col not in taken:
+                            taken.add(col)
+                            hit = True
+                            break
+                stats['scores'].append(cand_conf[i])
+                stats['hits'].append(hit)
+            total_matched += len(taken)
+
+    aps = []
+    for stats in per_class.values():
+        if stats['positives'] == 0:
+            continue
+        order = np.argsort(-np.array(stats['scores']))
+        hits = np.array(stats['hits'], dtype=np.float64)[order]
+        tp = np.cumsum(hits)
+        recall_curve = tp / stats['positives']
+        precision_curve = tp / np.arange(1, len(hits) + 1)
+        # All-point interpolated AP
+        recall_points = np.concatenate([[0.0], recall_curve, [1.0]])
+        precision_points = np.concatenate([[1.0], precision_curve, [0.0]])
+        precision_points = np.maximum.accumulate(precision_points[::-1])[::-1]
+        aps.append(float(np.sum((recall_points[1:] - recall_points[:-1]) * precision_points[1:])))
+
+    recall = total_matched / total_reference if total_reference else 1.0
+    map50 = float(np.mean(aps)) if aps else 1.0
+    return recall, map50
+
+
+def run_frames(model_file, images):
+    """Detections and average latency for a model file through the server's pipeline."""
+    from ultralytics import YOLO
+
+    app.model = YOLO(model_file, task='detect')
+    app.run_detection(images[0])  # Warmup
+
+    detections = []
+    start = time.perf_counter()
+    for image in images:
+        result, error = app.run_detection(image)
+        if error:
+            raise RuntimeError(error)
+        detections.append(result)
+    latency_ms = (time.perf_counter() - start) / len(images) * 1000
+    return detections, latency_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quantize best.pt to INT8 ONNX with an accuracy gate')
+    parser.add_argument('--model', default=app.MODEL_PATH, help='Path to best.pt')
+    parser.add_argument('--calib', required=True, help='Folder of calibration images')
+    parser.add_argument('--val', required=True, help='Folder of held-out images for the accuracy gate')
+    parser.add_argument('--max-calib', type=int, default=200, help='Max calibration images')
+    parser.add_argument('--max-val', type=int, default=500, help='Max held-out images')
+    parser.add_argument('--min-recall', type=float, default=0.95, help='Min recall of FP32 detections')
+    parser.add_argument('--max-map-drop', type=float, default=0.05, help='Max mAP50 drop vs FP32 (1.0)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🧮 INT8 QUANTIZATION WITH ACCURACY GATE")
+    print("=" * 60)
+
+    calib_paths = list_images(args.calib, args.max_calib)
+    val_paths = list_images(args.val, args.max_val)
+    if not calib_paths or not val_paths:
+        print("❌ Need at least one calibration and one held-out image")
+        return 1
+
+    fp32_file = export_model(args.model, 'onnx', app.INPUT_SIZE)
+    int8_file = export_path(args.model, 'onnx_int8')
+
+    print(f"\n📋 Calibrating on {len(calib_paths)} image(s)...")
+    quantize(fp32_file, int8_file, calib_paths, app.INPUT_SIZE)
+    print(f"   Saved: {int8_file}")
+
+    print(f"\n📋 Checking accuracy on {len(val_paths)} held-out image(s)...")
+    images = [image for image in (cv2.imread(path) for path in val_paths) if image is not None]
+    fp32_detections, fp32_ms = run_frames(fp32_file, images)
+    int8_detections, int8_ms = run_frames(int8_file, images)
+    recall, map50 = compare(fp32_detections, int8_detections)
+
+    passed = recall >= args.min_recall and (1.0 - map50) <= args.max_map_drop
+
+    report = {
+        'passed': passed,
+        'recall': round(recall, 4),
+        'map50': round(map50, 4),
+        'min_recall': args.min_recall,
+        'max_map_drop': args.max_map_drop,
+        'fp32_latency_ms': round(fp32_ms, 2),
+        'int8_latency_ms': round(int8_ms, 2),
+        'calibration_images': len(calib_paths),
+        'validation_images': len(images),
+        'source_sha256': file_sha256(args.model),
+        'int8_sha256': file_sha256(int8_file),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    with open(gate_report_path(args.model), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n   Recall vs FP32: {recall:.3f} (min {args.min_recall})")
+    print(f"   mAP50 vs FP32:  {map50:.3f} (max drop {args.max_map_drop})")
+    print(f"   Latency:        FP32 {fp32_ms:.1f}ms | INT8 {int8_ms:.1f}ms ({fp32_ms / int8_ms:.2f}x)")
+
+    print("\n" + "=" * 60)
+    if passed:
+        print("✅ GATE PASSED - start the server with INFERENCE_RUNTIME=onnx_int8")
+    else:
+        print("❌ GATE FAILED - the server will refuse to load this INT8 model")
+    print("=" * 60)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())